@@ -14,6 +14,10 @@ from src.connectors.hbase import HBaseConnector
 from src.llm.provider import LLMProvider
 from src.rag.store import SimpleRAGStore
 from src.pipeline.smart import SmartPipeline
+from src.optimization.cost_guard import QueryCostGuard
+from src.optimization.rewriter import TextMatchRewriter
+from src.optimization.workload import WorkloadLog
+from src.optimization.views import connect_views
 
 def get_connector(db_type: str):
     if db_type == "mongo":
@@ -35,6 +39,11 @@ def main():
     parser.add_argument("--query", required=True, help="Natural Language Query")
     parser.add_argument("--unsafe", action="store_true", help="Allow write operations")
     parser.add_argument("--details", action="store_true", help="Show execution trace/IR")
+    parser.add_argument("--page-size", type=int, default=None, help="Stream results in pages of this size")
+    parser.add_argument("--cost-budget", type=int, default=None, help="Explain reads first; bound or reject plans examining more docs/rows than this")
+    parser.add_argument("--rewrite-text", action="store_true", help="Rewrite regex/CONTAINS matching to use text/full-text indexes")
+    parser.add_argument("--no-views", action="store_true", help="Do not answer aggregates from the Redis materialized views")
+    parser.add_argument("--cost-action", choices=["rewrite", "reject"], default="rewrite", help="What to do with over-budget plans")
     
     args = parser.parse_args()
     
@@ -46,18 +55,34 @@ def main():
         llm = LLMProvider()
         rag = SimpleRAGStore()
         
-        pipeline = SmartPipeline(connector, llm, rag)
+        cost_guard = QueryCostGuard(args.cost_budget, action=args.cost_action) if args.cost_budget else None
+        rewriter = TextMatchRewriter() if args.rewrite_text else None
+        views = None if args.no_views or os.getenv("MATERIALIZED_VIEWS", "1") != "1" else connect_views()
+        pipeline = SmartPipeline(connector, llm, rag, cost_guard=cost_guard, rewriter=rewriter,
+                                 workload_log=WorkloadLog(), views=views)
         pipeline.set_safety(args.unsafe)
         
         # 2. Run
         print(f"Query: {args.query}")
-        result = pipeline.run(args.query)
+        result = pipeline.run(args.query, page_size=args.page_size)
         
         # 3. Output
         if result["success"]:
             print("\n✅ Execution Success!")
             print("Result Payload:")
             print(json.dumps(result["final_result"], indent=2, default=str))
+
+            # Fetch further pages on demand
+            token = result.get("continuation")
+            while token and sys.stdin.isatty():
+                if input("\nMore results available. Fetch next page? [y/N] ").strip().lower() != "y":
+                    break
+                page = pipeline.fetch_more(token, page_size=args.page_size)
+                if page.status != "success":
+                    print(f"Error: {page.error_message}")
+                    break
+                print(json.dumps(page.payload, indent=2, default=str))
+                token = page.continuation
         else:
             print("\n❌ Execution Failed.")
             print(f"Error: {result.get('error')}")
@@ -72,6 +97,9 @@ def main():
                     print(f"  Exec Status: {step['execution'].status}")
                     if step['execution'].error_message:
                         print(f"  Error: {step['execution'].error_message}")
+            metrics = connector.get_metrics()
+            if metrics:
+                print(f"\nConnector Metrics: {json.dumps(metrics, indent=2)}")
 
     except Exception as e:
         print(f"\nExample Usage: python src/cli.py --db mongo --query 'Find movies directed by Nolan'")
@@ -1,3 +1,8 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
 from abc import ABC, abstractmethod
 from typing import Any, Dict, List, Optional
 from dataclasses import dataclass
@@ -9,6 +14,42 @@ class ExecutionResult:
     raw_response: Any  # Original DB cursor/response
     error_message: Optional[str] = None
     execution_time_ms: float = 0.0
+    truncated: bool = False  # True if a limit cut the result short (payload is not the full answer)
+    continuation: Optional[str] = None  # Opaque token for the next page (execute_page), None when exhausted
+
+@dataclass
+class PlanEstimate:
+    """Summary of a database query plan, as returned by BaseConnector.explain()."""
+    examined: Optional[int]  # Estimated documents/rows/keys examined (None if unknown)
+    stages: List[str]        # Plan operators, e.g. ["COLLSCAN"] or ["NodeByLabelScan", "Filter"]
+    full_scan: bool = False  # True if the plan scans a whole collection, label or index
+    index: Optional[str] = None  # Index the plan uses, if any
+
+    def summary(self) -> str:
+        examined = f"~{self.examined:,} examined" if self.examined is not None else "examined unknown"
+        scan = ", full scan" if self.full_scan else ""
+        return f"{' > '.join(self.stages) or 'no plan'} ({examined}{scan})"
+
+# Tokens carry the query to resume, so they are HMAC-signed: a client cannot
+# forge one. The key is per process unless CONTINUATION_SECRET is shared.
+_TOKEN_KEY = os.getenv("CONTINUATION_SECRET", "").encode() or os.urandom(32)
+
+def _sign(payload: str) -> str:
+    return hmac.new(_TOKEN_KEY, payload.encode(), hashlib.sha256).hexdigest()
+
+def encode_token(state: Dict[str, Any]) -> str:
+    """Pack connector-specific paging state into an opaque, URL-safe, signed token."""
+    payload = base64.urlsafe_b64encode(json.dumps(state, default=str).encode()).decode()
+    return f"{payload}.{_sign(payload)}"
+
+def decode_token(token: str) -> Dict[str, Any]:
+    payload, _, signature = str(token).rpartition(".")
+    if not payload or not hmac.compare_digest(signature, _sign(payload)):
+        raise ValueError("Invalid continuation token")
+    try:
+        return json.loads(base64.urlsafe_b64decode(payload.encode()).decode())
+    except Exception:
+        raise ValueError("Invalid continuation token")
 
 @dataclass
 class DatabaseMetadata:
@@ -22,6 +63,10 @@ class BaseConnector(ABC):
     Enforces a unified interface for the 'Polyglot Persistence' architecture.
     """
 
+    # Stores that cannot group/count/sum natively get QueryIR.aggregations
+    # evaluated client-side by src/engine/aggregate.py.
+    supports_aggregation = True
+
     def __init__(self, uri: str, **kwargs):
         self.uri = uri
         self.config = kwargs
@@ -47,6 +92,67 @@ class BaseConnector(ABC):
         """
         pass
 
+    def explain(self, query: str) -> Optional[PlanEstimate]:
+        """Plan a query without executing it. None if the store has no planner."""
+        return None
+
+    def bound_query(self, query: str, plan: PlanEstimate, limit: int) -> Optional[str]:
+        """
+        Rewrite an over-budget query into a cheaper form (row limit, index hint).
+        None if no safe rewrite exists.
+        """
+        return None
+
+    def answer_locally(self, query: str, ir: Any) -> Optional[ExecutionResult]:
+        """
+        Answer a read from an in-process cache instead of the database, or
+        return None to execute normally (default: never answered locally).
+        """
+        return None
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Connector configuration and runtime counters (empty if not tracked)."""
+        return {}
+
+    def sample_ids(self, query: str, limit: int, ids: Optional[List[Any]] = None,
+                   key: Optional[str] = None) -> Optional[List[Any]]:
+        """
+        Ids of at most `limit` records a read query matches, only among `ids`
+        when given (used to check rewrites for containment on a sample).
+        `key` names the matched variable for stores that need one. None if unsupported.
+        """
+        return None
+
+    def push_down(self, query: str, ir: Any) -> str:
+        """
+        Rewrite a generated query with hints from the validated QueryIR
+        (e.g. projection) before execution. Default: unchanged.
+        """
+        return query
+
+    def execute_page(self, query: Optional[str], page_size: int = 100, continuation: Optional[str] = None,
+                     operation_type: str = "read") -> ExecutionResult:
+        """
+        Execute a query and return one page of results.
+        The returned ExecutionResult carries a `continuation` token while more
+        rows remain; pass it back (query may then be None) to fetch the next page.
+
+        Default: run the full query and slice by offset. Connectors override this
+        with native paging (cursors, SKIP/LIMIT, row ranges) to keep memory flat.
+        """
+        state = decode_token(continuation) if continuation else {"q": query, "offset": 0}
+        result = self.execute(state["q"], operation_type=operation_type)
+        if result.status != "success" or not isinstance(result.payload, list):
+            return result
+
+        offset = state["offset"]
+        page = result.payload[offset:offset + page_size]
+        has_more = len(result.payload) > offset + page_size
+        result.payload = page
+        result.raw_response = None
+        result.continuation = encode_token({"q": state["q"], "offset": offset + page_size}) if has_more else None
+        return result
+
     @abstractmethod
     def close(self):
         """Close the connection."""
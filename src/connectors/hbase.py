@@ -1,50 +1,133 @@
+import json
+import os
 import time
-from typing import Any, Dict, List
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 try:
     import happybase
 except ImportError:
     happybase = None
 
-from .base import BaseConnector, DatabaseMetadata, ExecutionResult
+from .base import BaseConnector, DatabaseMetadata, ExecutionResult, encode_token, decode_token
+from .hbase_index import (DEFAULT_INDEXES, SEP, SecondaryIndex, apply_mutations, index_mutations, is_built,
+                          match_index, row_key_of)
+
+# Row keys per Table.rows call when resolving index hits
+MULTI_GET_CHUNK = 1000
+
+def _encode(value: Optional[str]) -> Optional[bytes]:
+    return value.encode('utf-8') if isinstance(value, str) else value
+
+def prefix_range(prefix) -> Tuple[bytes, Optional[bytes]]:
+    """Row range covering a key prefix: [prefix, prefix with its last byte incremented)."""
+    start = _encode(prefix)
+    stop = start.rstrip(b'\xff')
+    return start, (stop[:-1] + bytes([stop[-1] + 1])) if stop else None
+
+def scan_kwargs(args: Dict[str, Any], row_start: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Map instruction args onto happybase Table.scan arguments:
+      row_start / row_stop  row key range (stop exclusive)
+      row_prefix            keys starting with a prefix (turned into a range so paging can resume)
+      columns               ["info:title", "credits"] projection (families or family:qualifier)
+      filter                HBase filter string, e.g. "SingleColumnValueFilter('info', 'genre', =, 'binary:Sci-Fi')"
+      batch_size            rows per Thrift round trip
+    `row_start` overrides the start key (used to resume a paged scan).
+    """
+    kwargs: Dict[str, Any] = {}
+    if args.get("row_prefix"):
+        if args.get("row_start") or args.get("row_stop"):
+            raise ValueError("row_prefix cannot be combined with row_start/row_stop")
+        kwargs["row_start"], kwargs["row_stop"] = prefix_range(args["row_prefix"])
+    else:
+        kwargs["row_start"], kwargs["row_stop"] = _encode(args.get("row_start")), _encode(args.get("row_stop"))
+    if row_start:
+        kwargs["row_start"] = _encode(row_start)
+    columns = args.get("columns")
+    if isinstance(columns, str):
+        columns = [columns]
+    if columns:
+        kwargs["columns"] = [_encode(c) for c in columns]
+    if args.get("filter"):
+        kwargs["filter"] = _encode(args["filter"])
+    if args.get("batch_size"):
+        kwargs["batch_size"] = int(args["batch_size"])
+    return {k: v for k, v in kwargs.items() if v is not None}
+
+def _wanted(column: bytes, columns: Optional[List[bytes]]) -> bool:
+    return not columns or any(column == c or (b':' not in c and column.startswith(c + b':')) for c in columns)
+
+def decode_row(key: bytes, cells: Dict[bytes, bytes], columns: Optional[List[bytes]] = None) -> Dict[str, Any]:
+    """Decode one row, only the cells of the requested columns (all if none requested)."""
+    row = {"row_key": key.decode('utf-8')}
+    for col, val in cells.items():
+        if _wanted(col, columns):
+            row[col.decode('utf-8')] = val.decode('utf-8')
+    return row
+
+def decode_rows(rows: Iterable[Tuple[bytes, Dict[bytes, bytes]]],
+                columns: Optional[List[bytes]] = None) -> Iterator[Dict[str, Any]]:
+    """Decode scanner rows one at a time as they are consumed."""
+    for key, cells in rows:
+        yield decode_row(key, cells, columns)
 
 class HBaseConnector(BaseConnector):
+    supports_aggregation = False
+
     def __init__(self, host: str = "localhost", port: int = 9090, **kwargs):
         super().__init__(f"{host}:{port}", **kwargs)
         self.host = host
         self.port = port
-        self.connection = None
+        # Thrift connections are not thread-safe: each operation borrows one from the pool
+        self.pool_size = int(kwargs.get("pool_size", os.getenv("HBASE_POOL_SIZE", 10)))
+        self.pool_timeout = float(kwargs.get("pool_timeout", os.getenv("HBASE_POOL_TIMEOUT", 10)))  # wait for a free connection, seconds
+        self.socket_timeout = int(kwargs.get("socket_timeout", os.getenv("HBASE_SOCKET_TIMEOUT", 30000)))  # Thrift calls, ms
+        self.pool = None
+        # Index tables maintained on put and used to answer single-column filters
+        self.secondary_indexes: List[SecondaryIndex] = list(kwargs.get("secondary_indexes", DEFAULT_INDEXES))
+        self._tables: Optional[set] = None
+        self._built: set = set()  # Index tables seen with their BUILT_MARKER
 
     def connect(self):
         if not happybase:
             raise ImportError("happybase library not installed. Cannot connect to HBase.")
         
         try:
-            self.connection = happybase.Connection(self.host, port=self.port)
-            self.connection.open()
+            self.pool = happybase.ConnectionPool(self.pool_size, host=self.host, port=self.port,
+                                                 timeout=self.socket_timeout)
+            with self._connection() as connection:
+                self._tables = {t.decode('utf-8') for t in connection.tables()}
             self.connected = True
-            print(f"Connected to HBase at {self.host}:{self.port}")
+            print(f"Connected to HBase at {self.host}:{self.port} (pool of {self.pool_size})")
         except Exception as e:
             print(f"Failed to connect to HBase: {e}")
             self.connected = False
             raise e
 
+    @contextmanager
+    def _connection(self):
+        """Borrow a pooled connection; happybase reopens it if the socket failed."""
+        with self.pool.connection(timeout=self.pool_timeout) as connection:
+            yield connection
+
     def get_metadata(self) -> DatabaseMetadata:
         if not self.connected:
             self.connect()
         
         summary = {"tables": {}}
         try:
-            tables = self.connection.tables()
-            for t_name_bytes in tables:
-                t_name = t_name_bytes.decode('utf-8')
-                # Get column families
-                table = self.connection.table(t_name)
-                # families is a dict
-                families = table.families() 
-                # {b'info': {'max_versions': 3, ...}}
-                summary["tables"][t_name] = {
-                    "families": [f.decode('utf-8') if isinstance(f, bytes) else f for f in families.keys()]
-                }
+            with self._connection() as connection:
+                tables = connection.tables()
+                for t_name_bytes in tables:
+                    t_name = t_name_bytes.decode('utf-8')
+                    # Get column families
+                    table = connection.table(t_name)
+                    # families is a dict
+                    families = table.families() 
+                    # {b'info': {'max_versions': 3, ...}}
+                    summary["tables"][t_name] = {
+                        "families": [f.decode('utf-8') if isinstance(f, bytes) else f for f in families.keys()]
+                    }
         except Exception as e:
             print(f"Error fetching HBase metadata: {e}")
 
@@ -54,74 +137,123 @@ class HBaseConnector(BaseConnector):
             version="happybase"
         )
 
+    def _indexes(self, connection, table: str, built: bool = False) -> List[SecondaryIndex]:
+        """
+        Secondary indexes on `table` whose index table exists. Puts maintain all
+        of them; with built=True only backfilled ones (see ensure_index_tables),
+        which alone can answer scans.
+        """
+        if self._tables is None:
+            self._tables = {t.decode('utf-8') for t in connection.tables()}
+        indexes = [ix for ix in self.secondary_indexes if ix.table == table and ix.name in self._tables]
+        if built:
+            # Only positive checks are cached, so a later backfill is picked up
+            self._built.update(ix.name for ix in indexes if ix.name not in self._built and is_built(connection, ix))
+            indexes = [ix for ix in indexes if ix.name in self._built]
+        return indexes
+
+    def _index_scan(self, connection, table: str, index: SecondaryIndex, value: str, exact: bool,
+                    args: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], bool]:
+        """Scan the index range for `value`, then fetch the primary rows with batched multi-gets."""
+        limit = args.get("limit", 10)
+        kwargs = scan_kwargs({k: args[k] for k in ("columns", "batch_size") if k in args})
+        row_start, row_stop = prefix_range(index.prefix(value, exact))
+        keys = [row_key_of(key) for key, _ in connection.table(index.name).scan(
+            row_start=row_start, row_stop=row_stop, limit=limit, batch_size=kwargs.get("batch_size", 1000)) if SEP in key]
+        primary = connection.table(table)
+        data = []
+        for i in range(0, len(keys), MULTI_GET_CHUNK):
+            rows = primary.rows(keys[i:i + MULTI_GET_CHUNK], columns=kwargs.get("columns"))
+            data.extend(decode_rows(rows, kwargs.get("columns")))
+        return data, bool(limit) and len(keys) >= limit
+
+    def _put(self, connection, table: str, row_key: bytes, data: Dict[bytes, bytes]):
+        """Primary put plus index maintenance, each table's mutations sent as one batch."""
+        indexes = self._indexes(connection, table)
+        primary = connection.table(table)
+        if not indexes:
+            primary.put(row_key, data)
+            return
+        indexed = [ix.column.encode('utf-8') for ix in indexes if ix.column.encode('utf-8') in data]
+        previous = primary.row(row_key, columns=indexed) if indexed else {}
+        batches = {table: primary.batch()}
+        batches[table].put(row_key, data)
+        apply_mutations(connection, index_mutations(indexes, table, row_key, data, previous), batches)
+        for batch in batches.values():
+            batch.send()
+
+    def _run(self, connection, t_name: str, op: str, args: Dict[str, Any], operation_type: str) -> Tuple[Any, bool]:
+        """Run one instruction on a borrowed connection. Returns (payload, truncated)."""
+        table = connection.table(t_name)
+        if op == "scan":
+            limit = args.get("limit", 10)
+            if args.get("filter") and not any(args.get(k) for k in ("row_start", "row_stop", "row_prefix")):
+                matched = match_index(self._indexes(connection, t_name, built=True), t_name, args.get("filter"))
+                if matched:
+                    return self._index_scan(connection, t_name, *matched, args)
+            # No usable index: the filter runs server-side over the scanned range
+            kwargs = scan_kwargs(args)
+            data = list(decode_rows(table.scan(limit=limit, **kwargs), kwargs.get("columns")))
+            return data, bool(limit) and len(data) >= limit
+
+        if op in ("get", "rows"):
+            columns = scan_kwargs({"columns": args.get("columns")}).get("columns")
+            if op == "get":
+                row_key = args.get("row_key")
+                if not row_key:
+                    raise ValueError("get require row_key")
+                return decode_row(row_key.encode('utf-8'), table.row(row_key.encode('utf-8'), columns=columns), columns), False
+            row_keys = args.get("row_keys")
+            if not row_keys:
+                raise ValueError("rows require row_keys")
+            # One Thrift call for all keys; missing rows are omitted
+            return [decode_row(key, cells, columns) for key, cells in
+                    table.rows([str(k).encode('utf-8') for k in row_keys], columns=columns)], False
+
+        if op == "put":
+            if operation_type != "write":
+                raise PermissionError("Write not allowed")
+            row_key = args.get("row_key")
+            data = args.get("data", {})  # {"cf:col": "val"}
+            self._put(connection, t_name, row_key.encode('utf-8'),
+                      {k.encode('utf-8'): str(v).encode('utf-8') for k, v in data.items()})
+            return "Success", False
+
+        raise NotImplementedError(f"HBase Op {op} unknown")
+
     def execute(self, query: str, operation_type: str = "read") -> ExecutionResult:
         """
         Executes an HBase operation.
         Query Format (JSON):
         {
             "table": "movies",
-            "operation": "scan" | "get" | "put",
+            "operation": "scan" | "get" | "rows" | "put",
             "args": { ... }
         }
+        scan args: limit, row_start, row_stop, row_prefix, columns, filter,
+        batch_size (see scan_kwargs); get args: row_key, columns;
+        rows args: row_keys (list), columns.
         """
         if not self.connected:
             self.connect()
             
         start_time = time.time()
         try:
-            import json
             cmd = json.loads(query)
             t_name = cmd.get("table")
             op = cmd.get("operation")
             args = cmd.get("args", {})
             
-            table = self.connection.table(t_name)
-            result_data = None
-            
-            if op == "scan":
-                # args: limit, filter? Happybase scan is simple
-                # Scan returns generator (key, data_dict)
-                limit = args.get("limit", 10)
-                gen = table.scan(limit=limit) 
-                # Convert bytes to strings for display
-                data = []
-                for key, val_dict in gen:
-                    row = {"row_key": key.decode('utf-8')}
-                    for col, val in val_dict.items():
-                         row[col.decode('utf-8')] = val.decode('utf-8')
-                    data.append(row)
-                result_data = data
-                
-            elif op == "get":
-                row_key = args.get("row_key")
-                if not row_key:
-                    raise ValueError("get require row_key")
-                val_dict = table.row(row_key.encode('utf-8'))
-                # Decode
-                row = {"row_key": row_key}
-                for col, val in val_dict.items():
-                        row[col.decode('utf-8')] = val.decode('utf-8')
-                result_data = row
-                
-            elif op == "put":
-                if operation_type != "write":
-                     raise PermissionError("Write not allowed")
-                row_key = args.get("row_key")
-                data = args.get("data", {}) # {"cf:col": "val"}
-                # Encode data
-                batch_data = {k.encode('utf-8'): v.encode('utf-8') for k, v in data.items()}
-                table.put(row_key.encode('utf-8'), batch_data)
-                result_data = "Success"
-                
-            else:
-                 raise NotImplementedError(f"HBase Op {op} unknown")
+            with self._connection() as connection:
+                result_data, truncated = self._run(connection, t_name, op, args, operation_type)
 
             duration = (time.time() - start_time) * 1000
             return ExecutionResult(
                 status="success",
                 payload=result_data,
                 raw_response=None,
-                execution_time_ms=duration
+                execution_time_ms=duration,
+                truncated=truncated
             )
 
         except Exception as e:
@@ -133,6 +265,90 @@ class HBaseConnector(BaseConnector):
                 execution_time_ms=(time.time() - start_time) * 1000
             )
 
+    def push_down(self, query: str, ir) -> str:
+        """
+        Aggregations are computed client-side over the scanned rows: drop the
+        implicit 10-row scan limit so they see the whole range, not a sample.
+        """
+        if not ir or not ir.aggregations:
+            return query
+        try:
+            command = json.loads(query)
+        except (TypeError, ValueError):
+            return query
+        if not isinstance(command, dict) or command.get("operation") != "scan":
+            return query
+        args = command.setdefault("args", {})
+        if "limit" in args:
+            return query
+        args["limit"] = None
+        return json.dumps(command)
+
+    def execute_page(self, query: Optional[str], page_size: int = 100, continuation: Optional[str] = None,
+                     operation_type: str = "read") -> ExecutionResult:
+        """
+        Page a scan by row range: each page resumes at the row key following
+        the last one returned (carried in the token as row_start).
+        """
+        state = decode_token(continuation) if continuation else {"q": query, "row_start": None, "returned": 0}
+        try:
+            cmd = json.loads(state["q"])
+        except (TypeError, ValueError):
+            return super().execute_page(query, page_size, continuation, operation_type)
+        if cmd.get("operation") != "scan" or operation_type == "write":
+            return super().execute_page(query, page_size, continuation, operation_type)
+
+        if not self.connected:
+            self.connect()
+
+        start_time = time.time()
+        try:
+            args = cmd.get("args", {})
+            # An explicit limit caps the whole paged scan, not each page
+            total = args.get("limit")
+            fetch = page_size if total is None else min(page_size, total - state["returned"])
+            kwargs = scan_kwargs(args, row_start=state["row_start"])
+
+            data = []
+            next_start = None
+            if fetch <= 0:
+                return ExecutionResult(status="success", payload=[], raw_response=None,
+                                       execution_time_ms=(time.time() - start_time) * 1000)
+            with self._connection() as connection:
+                for key, cells in connection.table(cmd.get("table")).scan(limit=fetch + 1, **kwargs):
+                    if len(data) == fetch:
+                        next_start = key.decode('utf-8')
+                        break
+                    data.append(decode_row(key, cells, kwargs.get("columns")))
+
+            token = None
+            returned = state["returned"] + len(data)
+            if next_start is not None and (total is None or returned < total):
+                token = encode_token({"q": state["q"], "row_start": next_start, "returned": returned})
+            return ExecutionResult(
+                status="success",
+                payload=data,
+                raw_response=None,
+                execution_time_ms=(time.time() - start_time) * 1000,
+                truncated=token is not None,
+                continuation=token
+            )
+        except Exception as e:
+            return ExecutionResult(
+                status="error",
+                payload=None,
+                raw_response=None,
+                error_message=str(e),
+                execution_time_ms=(time.time() - start_time) * 1000
+            )
+
     def close(self):
-        if self.connection:
-            self.connection.close()
+        # happybase pools have no close(): drain the idle connections and close their sockets
+        pool, self.pool = self.pool, None
+        idle = getattr(pool, "_queue", None)
+        while idle is not None and not idle.empty():
+            try:
+                idle.get_nowait().close()
+            except Exception as e:
+                print(f"⚠️ HBase connection close failed: {e}")
+        self.connected = False
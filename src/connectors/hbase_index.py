@@ -0,0 +1,131 @@
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Separates the indexed value from the primary row key in an index row key.
+# Values never contain NUL, so value + SEP is an exact-match prefix.
+SEP = b"\x00"
+INDEX_FAMILY = "ref"
+# Row recording that an index table was backfilled: without SEP, it is never an index entry
+BUILT_MARKER = b"\xff__built__"
+
+SINGLE_COLUMN_FILTER = re.compile(
+    r"^\s*SingleColumnValueFilter\s*\(\s*'(?P<family>[^']+)'\s*,\s*'(?P<qualifier>[^']+)'\s*,\s*(?P<op>==?)\s*,"
+    r"\s*'(?P<comparator>binary|binaryprefix):(?P<value>(?:[^']|'')*)'\s*(?:,\s*(?P<if_missing>\w+)\s*,\s*(?P<latest>\w+)\s*)?\)\s*$",
+    re.IGNORECASE,
+)
+
+
+@dataclass(frozen=True)
+class SecondaryIndex:
+    """Index table `name` over `column` ("family:qualifier") of primary `table`."""
+    name: str
+    table: str
+    column: str
+
+    def key(self, value: str, row_key: bytes) -> bytes:
+        return value.encode('utf-8') + SEP + row_key
+
+    def prefix(self, value: str, exact: bool = True) -> bytes:
+        return value.encode('utf-8') + (SEP if exact else b"")
+
+
+# Columns the movie questions filter on (see lecture.py for the table layout)
+DEFAULT_INDEXES = [
+    SecondaryIndex("movies_by_director", "movies", "credits:director"),
+    SecondaryIndex("movies_by_genre", "movies", "info:genre"),
+    SecondaryIndex("movies_by_year", "movies", "info:year"),
+]
+
+
+def row_key_of(index_key: bytes) -> bytes:
+    return index_key.rsplit(SEP, 1)[1]
+
+
+def index_mutations(indexes: Iterable[SecondaryIndex], table: str, row_key: bytes,
+                    data: Dict[bytes, bytes], previous: Optional[Dict[bytes, bytes]] = None
+                    ) -> List[Tuple[str, str, bytes]]:
+    """
+    Index rows to write for a primary put, as (index_table, "put" | "delete", index_key).
+    `previous` holds the row's indexed cells before the put, so entries for
+    changed values are removed.
+    """
+    mutations = []
+    for index in indexes:
+        if index.table != table:
+            continue
+        column = index.column.encode('utf-8')
+        if column not in data:
+            continue
+        new = data[column].decode('utf-8')
+        old = (previous or {}).get(column)
+        if old is not None and old.decode('utf-8') != new:
+            mutations.append((index.name, "delete", index.key(old.decode('utf-8'), row_key)))
+        mutations.append((index.name, "put", index.key(new, row_key)))
+    return mutations
+
+
+def apply_mutations(connection, mutations: List[Tuple[str, str, bytes]], batches: Optional[Dict[str, Any]] = None):
+    """Queue index mutations on per-table happybase batches (created on `connection` as needed)."""
+    batches = {} if batches is None else batches
+    for name, kind, key in mutations:
+        batch = batches.get(name)
+        if batch is None:
+            batch = batches[name] = connection.table(name).batch()
+        if kind == "put":
+            batch.put(key, {f"{INDEX_FAMILY}:".encode('utf-8'): b""})
+        else:
+            batch.delete(key)
+    return batches
+
+
+def backfill_index(connection, index: SecondaryIndex, batch_size: int = 1000) -> int:
+    """Index every row of the primary table, then write BUILT_MARKER. Returns the rows indexed."""
+    column = index.column.encode('utf-8')
+    batch = connection.table(index.name).batch(batch_size=batch_size)
+    rows = 0
+    for row_key, data in connection.table(index.table).scan(columns=[column], batch_size=batch_size):
+        if column in data:
+            batch.put(index.key(data[column].decode('utf-8'), row_key), {f"{INDEX_FAMILY}:".encode('utf-8'): b""})
+            rows += 1
+    # Sent last: the index is only used once every existing row is in it
+    batch.put(BUILT_MARKER, {f"{INDEX_FAMILY}:".encode('utf-8'): b""})
+    batch.send()
+    return rows
+
+
+def is_built(connection, index: SecondaryIndex) -> bool:
+    return bool(connection.table(index.name).row(BUILT_MARKER))
+
+
+def ensure_index_tables(connection, indexes: Iterable[SecondaryIndex] = DEFAULT_INDEXES):
+    """Create missing index tables and backfill those not marked built (e.g. created over existing rows)."""
+    existing = {t.decode('utf-8') if isinstance(t, bytes) else t for t in connection.tables()}
+    for index in indexes:
+        if index.name not in existing:
+            connection.create_table(index.name, {INDEX_FAMILY: dict(max_versions=1)})
+            print(f"✅ Created HBase index table {index.name} on {index.table}.{index.column}")
+        if index.table in existing and not is_built(connection, index):
+            rows = backfill_index(connection, index)
+            print(f"✅ Backfilled HBase index {index.name} ({rows} rows)")
+
+
+def match_index(indexes: Iterable[SecondaryIndex], table: str, filter_string: Optional[str]
+                ) -> Optional[Tuple[SecondaryIndex, str, bool]]:
+    """
+    (index, value, exact) if the scan filter is a single SingleColumnValueFilter
+    equality (binary:) or prefix (binaryprefix:) match on an indexed column.
+    Only with filterIfMissing and latestVersionOnly both true: otherwise HBase
+    also returns rows lacking the column, or matching an older cell version,
+    which the index (latest values only) does not hold.
+    """
+    if not filter_string:
+        return None
+    found = SINGLE_COLUMN_FILTER.match(filter_string)
+    if not found or (found.group("if_missing") or "").lower() != "true" or found.group("latest").lower() != "true":
+        return None
+    column = f"{found.group('family')}:{found.group('qualifier')}"
+    index = next((ix for ix in indexes if ix.table == table and ix.column == column), None)
+    if index is None:
+        return None
+    return index, found.group("value").replace("''", "'"), found.group("comparator").lower() == "binary"
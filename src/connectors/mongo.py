@@ -1,8 +1,14 @@
 import json
 import time
-from typing import Any, Dict
+import uuid
+from collections import OrderedDict
+from itertools import islice
+from typing import Any, Dict, List, Optional
 from pymongo import MongoClient
-from .base import BaseConnector, DatabaseMetadata, ExecutionResult
+from .base import BaseConnector, DatabaseMetadata, ExecutionResult, PlanEstimate, encode_token, decode_token
+
+# Index bounds meaning "every key" (e.g. unanchored or case-insensitive $regex)
+FULL_BOUNDS = ('[MinKey, MaxKey]', '["", {})')
 
 class MongoConnector(BaseConnector):
     def __init__(self, uri: str = "mongodb://localhost:27017/", db_name: str = "movie_db", **kwargs):
@@ -10,6 +16,15 @@ class MongoConnector(BaseConnector):
         self.db_name = db_name
         self.client = None
         self.db = None
+        # Live cursors backing continuation tokens: cursor_id -> (cursor, lookahead docs)
+        self._cursors = OrderedDict()
+        self.max_open_cursors = kwargs.get("max_open_cursors", 32)
+        # Result path tuning
+        self.batch_size = kwargs.get("batch_size", 500)            # documents per getMore round trip
+        self.aggregate_limit = kwargs.get("aggregate_limit", 1000)  # default $limit for pipelines without one
+        self.debug = kwargs.get("debug", False)                    # keep an unsanitized copy as raw_response
+        self._fields = {}  # collection -> known top-level fields (from get_metadata)
+        self.explain_verbosity = kwargs.get("explain_verbosity", "queryPlanner")  # "executionStats" runs the query
 
     def connect(self):
         try:
@@ -41,6 +56,7 @@ class MongoConnector(BaseConnector):
                 one_doc = self.db[col].find_one()
                 fields = list(one_doc.keys()) if one_doc else []
                 summary["collections"][col] = {"fields": fields, "sample": str(one_doc)}
+                self._fields[col] = set(fields)
         except Exception as e:
             print(f"Error fetching metadata: {e}")
         
@@ -79,6 +95,8 @@ class MongoConnector(BaseConnector):
             # Simple dispatch (Safe-mode should catch writes before this, but basic logic here)
             result_data = None
             raw_cursor = None
+            raw_docs = None
+            truncated = False
 
             if op == "find":
                 # args might contain 'filter', 'projection', 'limit'
@@ -86,18 +104,24 @@ class MongoConnector(BaseConnector):
                 proj = args.get("projection")
                 limit = args.get("limit", 10)
                 
-                cursor = collection.find(filter_, proj).limit(limit)
-                result_data = list(cursor)
+                cursor = collection.find(filter_, proj, **self._options(args)).limit(limit).batch_size(self.batch_size)
+                result_data, raw_docs = self._drain(cursor)
                 raw_cursor = "Cursor consumed"
+                truncated = bool(limit) and len(result_data) >= limit
             
             elif op == "aggregate":
-                pipeline = args.get("pipeline", [])
-                cursor = collection.aggregate(pipeline)
-                result_data = list(cursor)
+                pipeline = list(args.get("pipeline", []))
+                # Bound pipelines that do not limit themselves
+                capped = self.aggregate_limit and not any("$limit" in stage for stage in pipeline)
+                if capped:
+                    pipeline.append({"$limit": self.aggregate_limit})
+                cursor = collection.aggregate(pipeline, batchSize=self.batch_size, **self._options(args))
+                result_data, raw_docs = self._drain(cursor)
+                truncated = bool(capped) and len(result_data) >= self.aggregate_limit
                 
             elif op == "count_documents":
                  filter_ = args.get("filter", {})
-                 result_data = collection.count_documents(filter_)
+                 result_data = collection.count_documents(filter_, **self._options(args))
 
             else:
                 # MVP Safety fall-through
@@ -112,34 +136,279 @@ class MongoConnector(BaseConnector):
                     raise NotImplementedError(f"Mongo Operation {op} not implemented in connector")
 
             duration = (time.time() - start_time) * 1000
-            # Convert ObjectId to string for JSON serialization
-            original_result_data = result_data # Store original for raw_response if needed
-            sanitized_payload = []
-            if isinstance(result_data, list):
-                for doc in result_data:
-                    # Create a copy to avoid modifying the original object in place if it's used elsewhere
-                    # and to ensure _id is handled correctly if it's a BSON ObjectId
-                    if isinstance(doc, dict):
-                        new_doc = doc.copy()
-                        if "_id" in new_doc:
-                            new_doc["_id"] = str(new_doc["_id"])
-                        sanitized_payload.append(new_doc)
-                    else:
-                        sanitized_payload.append(doc) # Append non-dict items as is
-            elif isinstance(result_data, dict):
-                sanitized_payload = result_data.copy()
-                if "_id" in sanitized_payload:
-                    sanitized_payload["_id"] = str(sanitized_payload["_id"])
-            else:
-                sanitized_payload = result_data
-
+            # ObjectIds were stringified while draining the cursor (no second copy);
+            # unsanitized documents are only kept when debugging
             return ExecutionResult(
                 status="success", 
-                payload=sanitized_payload,
-                raw_response=original_result_data, 
-                execution_time_ms=duration
+                payload=result_data,
+                raw_response=raw_docs if self.debug else raw_cursor, 
+                execution_time_ms=duration,
+                truncated=truncated
+            )
+
+        except Exception as e:
+            return ExecutionResult(
+                status="error",
+                payload=None,
+                raw_response=None,
+                error_message=str(e),
+                execution_time_ms=(time.time() - start_time) * 1000
             )
 
+    @staticmethod
+    def _sanitize_doc(doc):
+        # Stringify ObjectId in place so payloads are JSON serializable
+        if isinstance(doc, dict) and "_id" in doc:
+            doc["_id"] = str(doc["_id"])
+        return doc
+
+    def _drain(self, cursor):
+        """
+        Consume a cursor in one pass, stringifying ObjectIds as documents arrive.
+        Returns (docs, raw); raw holds unsanitized copies only in debug mode.
+        """
+        if not self.debug:
+            return [self._sanitize_doc(doc) for doc in cursor], None
+        docs, raw = [], []
+        for doc in cursor:
+            raw.append(dict(doc))
+            docs.append(self._sanitize_doc(doc))
+        return docs, raw
+
+    @staticmethod
+    def _options(args: Dict[str, Any]) -> Dict[str, Any]:
+        """Cursor options passed through from the instruction args (index hint, collation)."""
+        return {key: args[key] for key in ("hint", "collation") if args.get(key)}
+
+    def index_information(self, collection: str) -> Dict[str, Dict[str, Any]]:
+        """pymongo index_information(): name -> {"key": [...], "collation"/"weights": ...}."""
+        if not self.connected:
+            self.connect()
+        return self.db[collection].index_information()
+
+    def sample_ids(self, query: str, limit: int, ids: Optional[List[Any]] = None,
+                   key: Optional[str] = None) -> Optional[List[Any]]:
+        """_ids matched by a find/count/leading-$match filter (among `ids` if given), at most `limit`."""
+        if not self.connected:
+            self.connect()
+        if not self.connected:
+            return None
+        if limit <= 0:
+            return []
+        command = json.loads(query)
+        args = command.get("args", {})
+        if command.get("operation") == "aggregate":
+            pipeline = args.get("pipeline") or [{}]
+            filter_ = pipeline[0].get("$match", {})
+        else:
+            filter_ = args.get("filter", {})
+        if ids is not None:
+            # Restricted by the _id index: cheap even when the filter itself is not indexed
+            filter_ = dict(filter_, _id={"$in": ids}) if "_id" not in filter_ else {"$and": [filter_, {"_id": {"$in": ids}}]}
+        cursor = self.db[command["collection"]].find(filter_, {"_id": 1}, **self._options(args)).limit(limit)
+        return [doc["_id"] for doc in cursor]
+
+    @staticmethod
+    def _plan_nodes(node):
+        """Yield every plan stage inside the winning plan(s) of an explain document."""
+        if isinstance(node, dict):
+            if "stage" in node:
+                yield node
+            for key, value in node.items():
+                if key != "rejectedPlans":
+                    yield from MongoConnector._plan_nodes(value)
+        elif isinstance(node, list):
+            for item in node:
+                yield from MongoConnector._plan_nodes(item)
+
+    @staticmethod
+    def _find_counter(node, name: str) -> int:
+        if isinstance(node, dict):
+            return max([node.get(name, 0) if isinstance(node.get(name), int) else 0] +
+                       [MongoConnector._find_counter(v, name) for v in node.values()])
+        if isinstance(node, list):
+            return max([0] + [MongoConnector._find_counter(v, name) for v in node])
+        return 0
+
+    def explain(self, query: str) -> Optional[PlanEstimate]:
+        """
+        Run the `explain` command (queryPlanner verbosity by default: nothing executes).
+        COLLSCANs and index scans over full bounds are costed at the collection size
+        (capped at the limit for unsorted finds); with executionStats verbosity the server's examined counters are used.
+        """
+        if not self.connected:
+            self.connect()
+        if not self.connected:
+            return None
+        command = json.loads(query)
+        col_name, op, args = command.get("collection"), command.get("operation"), command.get("args", {})
+        if op == "find":
+            cmd = {"find": col_name, "filter": args.get("filter", {})}
+            for key in ("projection", "limit", "hint", "collation"):
+                if args.get(key):
+                    cmd[key] = args[key]
+        elif op == "aggregate":
+            cmd = {"aggregate": col_name, "pipeline": args.get("pipeline", []), "cursor": {}}
+        elif op == "count_documents":
+            cmd = {"count": col_name, "query": args.get("filter", {})}
+        else:
+            return None
+        if op != "find":
+            cmd.update(self._options(args))
+
+        doc = self.db.command("explain", cmd, verbosity=self.explain_verbosity)
+        nodes = list(self._plan_nodes(doc))
+        stages = [n["stage"] for n in nodes]
+        index = next((n.get("indexName") for n in nodes if n.get("indexName")), None)
+        full_scan = "COLLSCAN" in stages or any(
+            bound in FULL_BOUNDS
+            for n in nodes if n.get("stage") == "IXSCAN"
+            for bounds in (n.get("indexBounds") or {}).values()
+            for bound in bounds
+        )
+
+        examined = None
+        if self.explain_verbosity != "queryPlanner":
+            examined = max(self._find_counter(doc, "totalDocsExamined"), self._find_counter(doc, "totalKeysExamined"))
+        elif full_scan:
+            examined = self.db[col_name].estimated_document_count()
+            if op == "find":
+                # A limited find stops scanning once it has `limit` matches (the implicit one is 10)
+                limit = args.get("limit", 10)
+                if limit and not args.get("sort"):
+                    examined = min(examined, limit)
+        return PlanEstimate(examined=examined, stages=stages, full_scan=full_scan, index=index)
+
+    def bound_query(self, query: str, plan: PlanEstimate, limit: int) -> Optional[str]:
+        """
+        Hint an index whose leading field is filtered on (for full scans, never
+        next to $text), and cap find results at `limit`. Aggregates and counts
+        are only hinted, as a limit would change their answer.
+        """
+        command = json.loads(query)
+        op, args = command.get("operation"), command.setdefault("args", {})
+        rewritten = False
+
+        filter_ = args.get("filter", {})
+        if op == "aggregate":
+            first = (args.get("pipeline") or [{}])[0]
+            filter_ = first.get("$match", {})
+        # $text picks its own text index: the server rejects it with a hint
+        if plan.full_scan and not args.get("hint") and "$text" not in filter_:
+            fields = {k for k in filter_ if not k.startswith("$")}
+            for name, info in self.index_information(command["collection"]).items():
+                key = info["key"]
+                # A collated index is only usable by queries with the same collation
+                index_collation = info.get("collation") or {}
+                query_collation = args.get("collation") or {}
+                if any(index_collation.get(k) != query_collation.get(k) for k in ("locale", "strength")):
+                    continue
+                if name != "_id_" and key and key[0][0] in fields and key[0][1] != "text":
+                    args["hint"] = name
+                    rewritten = True
+                    break
+
+        # Only tighten: a find without a limit already stops at execute()'s implicit 10 rows
+        effective = args.get("limit", 10)
+        if op == "find" and (not effective or effective > limit):
+            args["limit"] = limit
+            rewritten = True
+
+        return json.dumps(command) if rewritten else None
+
+    def push_down(self, query: str, ir) -> str:
+        """
+        Push QueryIR.return_fields into a find projection when the generated
+        query has none. Only fields known from the collection's metadata are
+        pushed, so an LLM naming mismatch cannot blank out the documents.
+        """
+        if not ir or not ir.return_fields:
+            return query
+        try:
+            command = json.loads(query)
+        except (TypeError, ValueError):
+            return query
+        if command.get("operation") != "find":
+            return query
+        args = command.setdefault("args", {})
+        known = self._fields.get(command.get("collection"))
+        fields = [f.split(".")[0] for f in ir.return_fields]
+        if args.get("projection") or not known or not all(f in known for f in fields):
+            return query
+        projection = {f: 1 for f in ir.return_fields}
+        if "_id" not in fields:
+            projection["_id"] = 0
+        args["projection"] = projection
+        return json.dumps(command)
+
+    def _open_cursor(self, command: Dict[str, Any], page_size: int, skip: int):
+        collection = self.db[command["collection"]]
+        args = command.get("args", {})
+        if command["operation"] == "find":
+            cursor = collection.find(args.get("filter", {}), args.get("projection"), **self._options(args))
+            limit = args.get("limit")
+            if limit:
+                if limit <= skip:
+                    return iter(())
+                cursor = cursor.limit(limit - skip)
+            return cursor.skip(skip).batch_size(min(page_size, self.batch_size))
+        pipeline = list(args.get("pipeline", []))
+        if skip:
+            pipeline.append({"$skip": skip})
+        return collection.aggregate(pipeline, batchSize=min(page_size, self.batch_size), **self._options(args))
+
+    def _park_cursor(self, cursor, lookahead) -> str:
+        cursor_id = uuid.uuid4().hex
+        self._cursors[cursor_id] = (cursor, lookahead)
+        while len(self._cursors) > self.max_open_cursors:
+            _, (old_cursor, _) = self._cursors.popitem(last=False)
+            if hasattr(old_cursor, "close"):
+                old_cursor.close()
+        return cursor_id
+
+    def execute_page(self, query: Optional[str], page_size: int = 100, continuation: Optional[str] = None,
+                     operation_type: str = "read") -> ExecutionResult:
+        """
+        Page through find/aggregate results on a live server cursor (batch_size = page_size).
+        The token names the parked cursor; if it is gone (evicted, other process),
+        the query is re-opened with a skip to the recorded offset.
+        """
+        if operation_type == "write":
+            return self.execute(query, operation_type)
+        state = decode_token(continuation) if continuation else {"q": query, "offset": 0, "cursor": None}
+        try:
+            command = json.loads(state["q"])
+        except (TypeError, ValueError):
+            return super().execute_page(query, page_size, continuation, operation_type)
+        if command.get("operation") not in ("find", "aggregate") or not command.get("collection"):
+            return super().execute_page(query, page_size, continuation, operation_type)
+
+        if not self.connected:
+            self.connect()
+        if not self.connected:
+            return ExecutionResult(status="error", payload=None, raw_response=None, error_message="MongoDB is disconnected. Please start the server.")
+
+        start_time = time.time()
+        try:
+            cursor, lookahead = self._cursors.pop(state.get("cursor"), (None, []))
+            if cursor is None:
+                cursor = self._open_cursor(command, page_size, state["offset"])
+            page = lookahead + list(islice(cursor, page_size - len(lookahead)))
+            lookahead = list(islice(cursor, 1))
+            payload = [self._sanitize_doc(doc) for doc in page]
+
+            token = None
+            if lookahead:
+                offset = state["offset"] + len(payload)
+                token = encode_token({"q": state["q"], "offset": offset, "cursor": self._park_cursor(cursor, lookahead)})
+            return ExecutionResult(
+                status="success",
+                payload=payload,
+                raw_response=None,
+                execution_time_ms=(time.time() - start_time) * 1000,
+                truncated=token is not None,
+                continuation=token
+            )
         except Exception as e:
             return ExecutionResult(
                 status="error",
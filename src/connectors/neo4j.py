@@ -1,7 +1,12 @@
+import itertools
+import re
+import threading
 import time
-from typing import Any, Dict, List
-from neo4j import GraphDatabase, basic_auth
-from .base import BaseConnector, DatabaseMetadata, ExecutionResult
+from typing import Any, Dict, List, Optional
+from neo4j import GraphDatabase, basic_auth, Query, READ_ACCESS, unit_of_work
+from .base import BaseConnector, DatabaseMetadata, ExecutionResult, PlanEstimate, encode_token, decode_token
+from src.optimization.shapes import STRING_LITERAL, parameterize_cypher
+from src.engine.graph import GraphAccelerator
 
 import os
 
@@ -14,10 +19,30 @@ class Neo4jConnector(BaseConnector):
         super().__init__(uri, **kwargs)
         self.auth = (user, password)
         self.driver = None
+        # Inline literals become $params so one cached plan serves every constant
+        self.parameterize = kwargs.get("parameterize", True)
+        self.fetch_size = kwargs.get("fetch_size", 1000)  # records per PULL round trip
+        # Per-deployment tuning (kwargs override environment)
+        self.pool_size = int(kwargs.get("pool_size", os.getenv("NEO4J_POOL_SIZE", 50)))
+        self.acquisition_timeout = float(kwargs.get("acquisition_timeout", os.getenv("NEO4J_ACQUISITION_TIMEOUT", 30)))
+        self.tx_timeout = float(kwargs.get("tx_timeout", os.getenv("NEO4J_TX_TIMEOUT", 30)))  # server-side, seconds
+        self.max_rows = int(kwargs.get("max_rows", os.getenv("NEO4J_MAX_ROWS", 10000)))
+        self.metadata_ttl = kwargs.get("metadata_ttl", 300.0)
+        self._metadata = None  # (fetched_at, DatabaseMetadata)
+        self._metrics_lock = threading.Lock()
+        self._counters = {"reads": 0, "writes": 0, "errors": 0, "timeouts": 0, "truncated": 0, "total_ms": 0.0}
+        # Optional in-memory adjacency cache for hot 1-2 hop traversals
+        self.graph_cache = None
+        if kwargs.get("graph_cache", os.getenv("NEO4J_GRAPH_CACHE", "0") == "1"):
+            self.graph_cache = GraphAccelerator(self.export_graph, ttl=float(kwargs.get("graph_cache_ttl", 600)))
 
     def connect(self):
         try:
-            self.driver = GraphDatabase.driver(self.uri, auth=self.auth)
+            self.driver = GraphDatabase.driver(
+                self.uri, auth=self.auth,
+                max_connection_pool_size=self.pool_size,
+                connection_acquisition_timeout=self.acquisition_timeout,
+            )
             self.driver.verify_connectivity()
             self.connected = True
             print("Connected to Neo4j")
@@ -35,10 +60,13 @@ class Neo4jConnector(BaseConnector):
         
         if not self.connected:
             return DatabaseMetadata(db_type="neo4j", schema_summary={"error": "Disconnected"}, version="N/A")
+
+        if self._metadata and time.time() - self._metadata[0] < self.metadata_ttl:
+            return self._metadata[1]
         
         summary = {"nodes": [], "relationships": []}
         try:
-            with self.driver.session() as session:
+            with self.driver.session(default_access_mode=READ_ACCESS) as session:
                 # Get labels
                 result = session.run("CALL db.labels()")
                 summary["nodes"] = [record["label"] for record in result]
@@ -51,11 +79,13 @@ class Neo4jConnector(BaseConnector):
         except Exception as e:
             print(f"Error fetching Neo4j metadata: {e}")
 
-        return DatabaseMetadata(
+        metadata = DatabaseMetadata(
             db_type="neo4j",
             schema_summary=summary,
             version="unknown"
         )
+        self._metadata = (time.time(), metadata)
+        return metadata
 
     def execute(self, query: str, operation_type: str = "read") -> ExecutionResult:
         """
@@ -68,33 +98,203 @@ class Neo4jConnector(BaseConnector):
                 pass
         
         if not self.connected:
-            return ExecutionResult(status="error", payload=None, error_message="Neo4j Disconnected")
+            return ExecutionResult(status="error", payload=None, raw_response=None, error_message="Neo4j Disconnected")
             
         start_time = time.time()
         try:
-            with self.driver.session() as session:
-                # Run query
-                if operation_type == "read":
-                    result = session.run(query)
-                else: 
-                     # Write transaction if we were separating them rigidly, but 'run' handles both.
-                     # The Policy layer should have blocked unsafe writes.
-                     result = session.run(query)
-
-                # Fetch all data
-                data = [dict(record) for record in result]
-                
-                # Consume result to get stats
-                consume_result = result.consume()
-            
+            text, params = self._prepare(query)
+
+            @unit_of_work(timeout=self.tx_timeout)
+            def work(tx):
+                result = tx.run(text, params)
+                return self._fetch(result), result.consume()
+
+            with self.driver.session(fetch_size=self.fetch_size) as session:
+                # Managed transactions route reads to readers and writes to the leader,
+                # retrying transient errors. The Policy layer should have blocked unsafe writes.
+                if re.search(r"\bIN\s+TRANSACTIONS\b", text, re.IGNORECASE):
+                    # Batched writes manage their own transactions (auto-commit only)
+                    result = session.run(Query(text, timeout=self.tx_timeout), params)
+                    (data, truncated), consume_result = self._fetch(result), result.consume()
+                elif operation_type == "read":
+                    (data, truncated), consume_result = session.execute_read(work)
+                else:
+                    (data, truncated), consume_result = session.execute_write(work)
+
+            if operation_type != "read":
+                self._metadata = None  # Labels / relationship types may have changed
+                if self.graph_cache:
+                    self.graph_cache.invalidate()
             duration = (time.time() - start_time) * 1000
+            self._count(operation_type, duration, truncated=truncated)
             return ExecutionResult(
                 status="success",
                 payload=data,
                 raw_response=consume_result.counters, # Stats about updates
+                execution_time_ms=duration,
+                truncated=truncated
+            )
+
+        except Exception as e:
+            duration = (time.time() - start_time) * 1000
+            self._count(operation_type, duration, error=e)
+            return ExecutionResult(
+                status="error",
+                payload=None,
+                raw_response=None,
+                error_message=str(e),
                 execution_time_ms=duration
             )
 
+    def _fetch(self, result):
+        """Records as dicts, at most max_rows; the rest is discarded server-side by consume()."""
+        rows = [dict(record) for record in itertools.islice(result, self.max_rows + 1)]
+        return rows[:self.max_rows], len(rows) > self.max_rows
+
+    def _count(self, operation_type: str, duration_ms: float, truncated: bool = False, error: Exception = None):
+        with self._metrics_lock:
+            self._counters["reads" if operation_type == "read" else "writes"] += 1
+            self._counters["total_ms"] += duration_ms
+            self._counters["truncated"] += int(truncated)
+            if error is not None:
+                self._counters["errors"] += 1
+                code = getattr(error, "code", "") or ""
+                self._counters["timeouts"] += int("Timeout" in code or "TimedOut" in code)
+
+    def export_graph(self):
+        """Bulk export for the graph cache: nodes plus relationships of the types in get_metadata()."""
+        types = self.get_metadata().schema_summary.get("relationships", [])
+        with self.driver.session(default_access_mode=READ_ACCESS, fetch_size=10000) as session:
+            nodes = [(r["id"], r["labels"], r["props"]) for r in session.run(
+                "MATCH (n) RETURN elementId(n) AS id, labels(n) AS labels, properties(n) AS props")]
+            edges = [(r["s"], r["t"], r["d"]) for r in session.run(
+                "MATCH (a)-[r]->(b) WHERE type(r) IN $types RETURN elementId(a) AS s, type(r) AS t, elementId(b) AS d",
+                types=types)]
+        return nodes, edges
+
+    def answer_locally(self, query: str, ir) -> Optional[ExecutionResult]:
+        """Serve recognized 1-2 hop TRAVERSAL reads from the graph cache, if enabled."""
+        if not self.graph_cache or ir is None or ir.intent.upper() != "TRAVERSAL" or ir.aggregations:
+            return None
+        start_time = time.time()
+        try:
+            rows = self.graph_cache.answer(query)
+        except Exception as e:
+            print(f"⚠️ Graph cache lookup failed: {e}")
+            return None
+        if rows is None:
+            return None
+        return ExecutionResult(status="success", payload=rows, raw_response="Graph cache",
+                               execution_time_ms=(time.time() - start_time) * 1000)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        with self._metrics_lock:
+            counters = dict(self._counters)
+        queries = counters["reads"] + counters["writes"]
+        if self.graph_cache:
+            counters["graph_cache_hits"] = self.graph_cache.hits
+        return {
+            "config": {
+                "pool_size": self.pool_size,
+                "acquisition_timeout_s": self.acquisition_timeout,
+                "tx_timeout_s": self.tx_timeout,
+                "max_rows": self.max_rows,
+                "fetch_size": self.fetch_size,
+            },
+            **counters,
+            "avg_ms": counters["total_ms"] / queries if queries else 0.0,
+        }
+
+    def _prepare(self, query: str):
+        """(query text, params): literals extracted unless parameterization is disabled."""
+        if not self.parameterize:
+            return query, {}
+        return parameterize_cypher(query)
+
+    @staticmethod
+    def _return_columns(query: str, masked: str, start: int) -> List[str]:
+        """
+        Columns of the RETURN clause starting at `start` (alias, else expression
+        text). `masked` is the query with string literals blanked, same length.
+        """
+        end = start + re.search(r"\b(?:ORDER\s+BY|SKIP|LIMIT)\b|$", masked[start:], re.IGNORECASE).start()
+        columns, depth, begin = [], 0, start
+        for i in range(start, end + 1):
+            char = masked[i] if i < end else ","
+            depth += (char in "([{") - (char in ")]}")
+            if char == "," and depth == 0:
+                alias = re.search(r"\bAS\s+(`[^`]+`|\w+)\s*$", masked[begin:i], re.IGNORECASE)
+                columns.append(alias.group(1) if alias else query[begin:i].strip())
+                begin = i + 1
+        return columns
+
+    @classmethod
+    def _paged_query(cls, query: str) -> str:
+        """
+        Add SKIP/LIMIT parameters over a deterministic order, so pages neither
+        overlap nor skip rows: the final RETURN's columns are appended to its
+        ORDER BY as tie-breakers (or become one). Queries with their own
+        SKIP/LIMIT are wrapped in a subquery. RETURN * and UNION have no column
+        list to order by and are refused.
+        """
+        query = query.strip().rstrip(";")
+        masked = STRING_LITERAL.sub(lambda m: "_" * len(m.group(0)), query)
+        returns = list(re.finditer(r"\bRETURN\s+(?:DISTINCT\s+)?", masked, re.IGNORECASE))
+        if not returns or re.search(r"\bUNION\b", masked, re.IGNORECASE):
+            raise ValueError("Cannot page this query in a stable order: use a single RETURN of named columns")
+        start = returns[-1].end()
+        columns = cls._return_columns(query, masked, start)
+        if "*" in columns:
+            raise ValueError("Cannot page RETURN * in a stable order: return named columns")
+
+        order = re.search(r"\bORDER\s+BY\b.*?(?=\bSKIP\b|\bLIMIT\b|$)", masked[start:], re.IGNORECASE | re.DOTALL)
+        at = start + (order.end() if order else re.search(r"\b(?:SKIP|LIMIT)\b|$", masked[start:], re.IGNORECASE).start())
+        keys = ", ".join(columns)
+        ordered = f"{query[:at].rstrip()}{', ' if order else ' ORDER BY '}{keys} {query[at:]}".strip()
+        if re.search(r"\b(?:SKIP|LIMIT)\b", masked[start:], re.IGNORECASE):
+            return f"CALL {{ {ordered} }} RETURN * SKIP $page_skip LIMIT $page_limit"
+        return f"{ordered} SKIP $page_skip LIMIT $page_limit"
+
+    def execute_page(self, query: Optional[str], page_size: int = 100, continuation: Optional[str] = None,
+                     operation_type: str = "read") -> ExecutionResult:
+        """
+        Page a read query with SKIP/LIMIT. One extra row is requested to know
+        whether another page exists; the token records the query and offset.
+        """
+        if operation_type == "write":
+            return self.execute(query, operation_type)
+        if not self.connected:
+            try:
+                self.connect()
+            except:
+                pass
+
+        if not self.connected:
+            return ExecutionResult(status="error", payload=None, raw_response=None, error_message="Neo4j Disconnected")
+
+        state = decode_token(continuation) if continuation else {"q": query, "offset": 0}
+        start_time = time.time()
+        try:
+            text, params = self._prepare(self._paged_query(state["q"]))
+            params.update(page_skip=state["offset"], page_limit=page_size + 1)
+
+            @unit_of_work(timeout=self.tx_timeout)
+            def work(tx):
+                return [dict(record) for record in tx.run(text, params)]
+
+            with self.driver.session(fetch_size=min(self.fetch_size, page_size + 1)) as session:
+                data = session.execute_read(work)
+
+            has_more = len(data) > page_size
+            token = encode_token({"q": state["q"], "offset": state["offset"] + page_size}) if has_more else None
+            return ExecutionResult(
+                status="success",
+                payload=data[:page_size],
+                raw_response=None,
+                execution_time_ms=(time.time() - start_time) * 1000,
+                truncated=has_more,
+                continuation=token
+            )
         except Exception as e:
             return ExecutionResult(
                 status="error",
@@ -104,6 +304,86 @@ class Neo4jConnector(BaseConnector):
                 execution_time_ms=(time.time() - start_time) * 1000
             )
 
+    @staticmethod
+    def _walk_plan(node, operators: List[str], leaves: List[float]):
+        operator = node.get("operatorType", "").split("@")[0]
+        operators.append(operator)
+        children = node.get("children") or []
+        if not children:
+            args = node.get("args") or node.get("arguments") or {}
+            leaves.append(float(args.get("EstimatedRows", 0) or 0))
+        for child in children:
+            Neo4jConnector._walk_plan(child, operators, leaves)
+
+    def explain(self, query: str) -> Optional[PlanEstimate]:
+        """
+        Plan the query with EXPLAIN (nothing runs). Rows examined are estimated
+        as the planner's row estimate summed over the leaf operators.
+        """
+        if not self.connected:
+            try:
+                self.connect()
+            except:
+                pass
+        if not self.connected:
+            return None
+
+        text, params = self._prepare(query.strip().rstrip(";"))
+        with self.driver.session() as session:
+            plan = session.run("EXPLAIN " + text, params).consume().plan
+        if not plan:
+            return None
+        operators, leaves = [], []
+        self._walk_plan(plan, operators, leaves)
+        full_scan = any(op in ("AllNodesScan", "NodeByLabelScan", "AllRelationshipsScan") for op in operators)
+        index = next((op for op in operators if "Index" in op), None)
+        return PlanEstimate(examined=int(sum(leaves)), stages=operators, full_scan=full_scan, index=index)
+
+    def bound_query(self, query: str, plan: PlanEstimate, limit: int) -> Optional[str]:
+        """Append a LIMIT to read queries that have none."""
+        query = query.strip().rstrip(";")
+        if re.search(r"\bLIMIT\b", query, re.IGNORECASE) or not re.search(r"\bRETURN\b", query, re.IGNORECASE):
+            return None
+        return f"{query} LIMIT {limit}"
+
+    def fulltext_indexes(self) -> List[Dict[str, Any]]:
+        """Online node full-text indexes: [{"name", "labels", "properties"}]."""
+        if not self.connected:
+            self.connect()
+        if not self.connected:
+            return []
+        with self.driver.session() as session:
+            result = session.run(
+                "SHOW FULLTEXT INDEXES YIELD name, labelsOrTypes, properties, entityType, state "
+                "WHERE entityType = 'NODE' AND state = 'ONLINE' RETURN name, labelsOrTypes, properties"
+            )
+            return [{"name": r["name"], "labels": r["labelsOrTypes"], "properties": r["properties"]} for r in result]
+
+    def sample_ids(self, query: str, limit: int, ids: Optional[List[Any]] = None,
+                   key: Optional[str] = None) -> Optional[List[Any]]:
+        """elementIds of the `key` nodes a read query matches (among `ids` if given), at most `limit`."""
+        if not key:
+            return None
+        if not self.connected:
+            self.connect()
+        if not self.connected:
+            return None
+        if limit <= 0:
+            return []
+        text, params = self._prepare(query.strip().rstrip(";"))
+        returns = list(re.finditer(r"\bRETURN\b", text, re.IGNORECASE))
+        if not returns:
+            return None
+        # Same MATCH/WHERE, projected to the matched node instead of the query's RETURN
+        sample = f"{text[:returns[-1].start()]} WITH DISTINCT {key}"
+        if ids is not None:
+            sample += f" WHERE elementId({key}) IN $sample_ids"
+            params["sample_ids"] = list(ids)
+        sample += f" RETURN elementId({key}) AS id LIMIT $sample_limit"
+        params["sample_limit"] = limit
+        with self.driver.session() as session:
+            return session.execute_read(lambda tx: [r["id"] for r in tx.run(sample, params)])
+
     def close(self):
         if self.driver:
             self.driver.close()
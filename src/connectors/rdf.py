@@ -1,25 +1,252 @@
+import json
+import multiprocessing
+import os
+import threading
 import time
-from typing import Any, Dict
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
+from typing import Any, Dict, List, Optional, Tuple
 import rdflib
-from .base import BaseConnector, DatabaseMetadata, ExecutionResult
+from rdflib.plugins.sparql import prepareQuery
+from rdflib.store import NO_STORE, TripleAddedEvent, TripleRemovedEvent
+from rdflib.util import from_n3, guess_format
+from src.optimization.shapes import SPARQL_TOKEN, parameterize_sparql
+from .base import BaseConnector, DatabaseMetadata, ExecutionResult, encode_token, decode_token
+
+EX = rdflib.Namespace("http://example.org/movies/")
+
+def parse_store_uri(uri: str) -> Tuple[str, str]:
+    """
+    'memory'                  -> ("memory", "")
+    'berkeleydb://data/rdf'   -> ("berkeleydb", "data/rdf")   persistent rdflib BerkeleyDB store
+    'file://data/movies.nt'   -> ("file", "data/movies.nt")   RDF snapshot file (also a bare path)
+    """
+    if uri == "memory":
+        return "memory", ""
+    for scheme in ("berkeleydb", "file"):
+        if uri.startswith(f"{scheme}://"):
+            return scheme, uri[len(scheme) + 3:]
+    return "file", uri
+
+class GraphSummary:
+    """
+    Predicate and rdf:type counts kept current from the store's add/remove
+    events, so schema metadata never scans the graph. Persistent stores keep
+    a JSON sidecar (see summary_path) written by the loader.
+    """
+    def __init__(self, predicates: Optional[Dict[str, int]] = None, types: Optional[Dict[str, int]] = None,
+                 triples: int = 0):
+        self.predicates = Counter(predicates or {})
+        self.types = Counter(types or {})
+        self.triples = triples
+        self._graph = None
+        self._lock = threading.Lock()
+
+    def _count(self, triple, delta: int):
+        _, p, o = triple
+        with self._lock:
+            self.triples += delta
+            self.predicates[str(p)] += delta
+            if p == rdflib.RDF.type:
+                self.types[str(o)] += delta
+            for counter in (self.predicates, self.types):
+                for key in [k for k, v in counter.items() if v <= 0]:
+                    del counter[key]
+
+    def _on_add(self, event):
+        # Dispatched before the store inserts: duplicates are already present
+        if event.triple not in self._graph:
+            self._count(event.triple, 1)
+
+    def _on_remove(self, event):
+        # Dispatched before removal with a pattern: count what it matches now
+        for triple in self._graph.triples(event.triple):
+            self._count(triple, -1)
+
+    def attach(self, graph: rdflib.Graph) -> "GraphSummary":
+        self._graph = graph
+        graph.store.dispatcher.subscribe(TripleAddedEvent, self._on_add)
+        graph.store.dispatcher.subscribe(TripleRemovedEvent, self._on_remove)
+        return self
+
+    @classmethod
+    def scan(cls, graph: rdflib.Graph) -> "GraphSummary":
+        return cls().rescan(graph)
+
+    def rescan(self, graph: rdflib.Graph) -> "GraphSummary":
+        """Recount from a full pass (stores built without a summary, unpublished removals)."""
+        with self._lock:
+            self.predicates, self.types, self.triples = Counter(), Counter(), 0
+        for triple in graph:
+            self._count(triple, 1)
+        return self
+
+    def assign(self, other: "GraphSummary") -> "GraphSummary":
+        """Take over another summary's counts (e.g. those of a cached snapshot parse)."""
+        counts = other.as_dict()
+        with self._lock:
+            self.predicates, self.types = Counter(counts["predicates"]), Counter(counts["types"])
+            self.triples = counts["triples"]
+        return self
+
+    def as_dict(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {"predicates": dict(self.predicates), "types": dict(self.types), "triples": self.triples}
+
+    def save(self, path: str):
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.as_dict(), f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "GraphSummary":
+        with open(path) as f:
+            data = json.load(f)
+        return cls(data.get("predicates"), data.get("types"), data.get("triples", 0))
+
+def summary_path(uri: str) -> Optional[str]:
+    """Sidecar of a persistent store: <dir>/summary.json for BerkeleyDB, none for snapshots."""
+    kind, path = parse_store_uri(uri)
+    return os.path.join(path, "summary.json") if kind == "berkeleydb" else None
+
+def require_berkeleydb():
+    """berkeleydb is optional (see requirements.txt): without it only memory and snapshot stores work."""
+    try:
+        import berkeleydb  # noqa: F401
+    except ImportError:
+        raise ImportError("berkeleydb library not installed (pip install berkeleydb). "
+                          "Use an RDF snapshot instead, e.g. RDF_STORE=data/movies.nt") from None
+
+# Parsed snapshots per process, keyed by path and (mtime, size): reconnecting
+# connectors share one read-only graph instead of re-parsing the file
+_snapshots: Dict[str, Tuple[Tuple[float, int], rdflib.Graph, GraphSummary]] = {}
+_snapshots_lock = threading.Lock()
+
+def _parsed_snapshot(path: str) -> Tuple[rdflib.Graph, GraphSummary]:
+    stamp = (os.path.getmtime(path), os.path.getsize(path))
+    with _snapshots_lock:
+        cached = _snapshots.get(path)
+        if cached is None or cached[0] != stamp:
+            graph = rdflib.Graph()
+            counts = GraphSummary().attach(graph)  # Filled while parsing, no second pass
+            graph.parse(path, format=guess_format(path) or "nt")
+            graph.bind("ex", EX)
+            cached = _snapshots[path] = (stamp, graph, counts)
+    return cached[1], cached[2]
+
+def open_graph(uri: str, create: bool = False, summary: Optional[GraphSummary] = None) -> rdflib.Graph:
+    """
+    Open a persistent graph. BerkeleyDB stores are opened in place (concurrent
+    readers across processes are allowed by its CDB environment). Snapshot
+    files are parsed into memory once per process and file version; the
+    graph is shared, so it must not be written to (the loader opens with
+    `create`, which always parses a private copy). Missing stores raise
+    FileNotFoundError unless `create` is set. A given summary is attached
+    before any triple is read, or given the cached parse's counts.
+    """
+    kind, path = parse_store_uri(uri)
+    if kind == "berkeleydb":
+        require_berkeleydb()
+        graph = rdflib.Graph(store="BerkeleyDB", identifier=EX["graph"])
+        if not create and not os.path.isdir(path):
+            raise FileNotFoundError(f"No RDF store at {path} (load it with: python -m src.ingest.rdf_loader)")
+        if graph.open(path, create=create) == NO_STORE:
+            raise ImportError("berkeleydb library not installed. Cannot open the RDF store.")
+        if summary is not None:
+            summary.attach(graph)
+    elif not create:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No RDF snapshot at {path} (load it with: python -m src.ingest.rdf_loader)")
+        graph, counts = _parsed_snapshot(path)
+        if summary is not None:
+            summary.assign(counts)
+        return graph
+    else:
+        graph = rdflib.Graph()
+        if summary is not None:
+            summary.attach(graph)
+        if os.path.exists(path):
+            graph.parse(path, format=guess_format(path) or "nt")
+    graph.bind("ex", EX)
+    return graph
+
+def compact_result(res, offset: int = 0, limit: Optional[int] = None) -> Optional[Tuple[List[str], List[tuple]]]:
+    """SELECT result as (variable names, row tuples of strings), rows offset..offset+limit only."""
+    if res.type != "SELECT":
+        return None
+    variables = list(res.vars)
+    rows = islice(res, offset, None if limit is None else offset + limit)
+    return [str(v) for v in variables], [tuple(str(row[v]) for v in variables) for row in rows]
+
+# --- Worker processes: one connector (and graph) per process, opened at pool start ---
+
+_inherited: Dict[str, "RdfConnector"] = {}  # Visible to forked workers only while the pool starts
+_worker_connector = None
+
+def _init_worker(uri: str):
+    global _worker_connector
+    _worker_connector = _inherited.get(uri)
+    if _worker_connector is None:
+        _worker_connector = RdfConnector(uri, processes=0)
+        _worker_connector.connect()
+    _worker_connector.processes = 0
+
+def _worker_ping() -> int:
+    return os.getpid()
+
+def _worker_query(query: str, offset: int, limit: Optional[int]):
+    return compact_result(_worker_connector._query(query), offset, limit)
+
+# Prepared-cache marker for templates rdflib cannot prepare (literal in a non-variable position)
+RAW = object()
 
 class RdfConnector(BaseConnector):
-    def __init__(self, uri: str = "memory", **kwargs):
+    def __init__(self, uri: Optional[str] = None, **kwargs):
         """
-        uri: 'memory' for in-memory graph, or a URL to a SPARQL endpoint (feature todo).
+        uri: 'memory' for the in-memory sample graph, 'berkeleydb://<dir>' for a
+        persistent store or a path to an RDF snapshot (see parse_store_uri).
+        Defaults to $RDF_STORE, else 'memory'.
+        processes: evaluate queries in that many worker processes ($RDF_PROCESSES,
+        0 = in this process); results come back as (vars, row tuples).
         """
-        super().__init__(uri, **kwargs)
+        super().__init__(uri or os.getenv("RDF_STORE", "memory"), **kwargs)
         self.graph = None
+        self.summary: Optional[GraphSummary] = None
+        # Parsed + translated algebra per normalized query template (LRU)
+        self.prepared_cache_size = kwargs.get("prepared_cache_size", 256)
+        self._prepared: "OrderedDict[str, Any]" = OrderedDict()
+        self._prepared_lock = threading.Lock()
+        self.prepared_hits = 0
+        self.prepared_misses = 0
+        # Optional worker processes for SPARQL evaluation (pure Python, holds the GIL)
+        self.processes = int(kwargs.get("processes", os.getenv("RDF_PROCESSES", 0)))
+        self.start_method = kwargs.get("start_method", os.getenv("RDF_START_METHOD", "fork"))
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
 
     def connect(self):
         try:
-            self.graph = rdflib.Graph()
-            # In a real app, we'd load data here or connect to a remote store.
-            # For this prototype, we'll initialize with some dummy movie data 
-            # so queries return something.
-            self._load_sample_data()
+            kind, path = parse_store_uri(self.uri)
+            if kind == "memory":
+                self.graph = rdflib.Graph()
+                self.summary = GraphSummary().attach(self.graph)
+                # No store configured: a few sample triples so queries return something
+                self._load_sample_data()
+            else:
+                # Opened as built by src/ingest/rdf_loader.py; queries never write to it
+                sidecar = summary_path(self.uri)
+                self.summary = GraphSummary.load(sidecar) if sidecar and os.path.exists(sidecar) else GraphSummary()
+                self.graph = open_graph(self.uri, summary=self.summary)
+                if sidecar and not os.path.exists(sidecar):
+                    # Store built without a sidecar: one full pass, then kept current by events
+                    self.summary.rescan(self.graph)
+            with self._prepared_lock:
+                self._prepared.clear()
             self.connected = True
-            print("Connected to RDF Graph (In-Memory)")
+            print(f"Connected to RDF Graph ({kind}{': ' + path if path else ''}, {len(self.graph)} triples)")
         except Exception as e:
             print(f"Failed to connect to RDF: {e}")
             self.connected = False
@@ -27,7 +254,6 @@ class RdfConnector(BaseConnector):
     
     def _load_sample_data(self):
         # Define some prefixes
-        EX = rdflib.Namespace("http://example.org/movies/")
         self.graph.bind("ex", EX)
         
         # Add basic data (Inception) mimicking the other DBs
@@ -41,55 +267,114 @@ class RdfConnector(BaseConnector):
         if not self.connected:
             self.connect()
         
-        summary = {"predicates": [], "types": []}
-        try:
-            # query distinct predicates
-            q = "SELECT DISTINCT ?p WHERE { ?s ?p ?o }"
-            res = self.graph.query(q)
-            summary["predicates"] = [str(r.p) for r in res]
-            
-            # query distinct types
-            q2 = "SELECT DISTINCT ?t WHERE { ?s a ?t }"
-            res2 = self.graph.query(q2)
-            summary["types"] = [str(r.t) for r in res2]
-            
-        except Exception as e:
-            print(f"Error fetching RDF metadata: {e}")
+        # Maintained incrementally (GraphSummary): no graph scan here. The in-memory
+        # store does not publish removals; its O(1) size shows when one happened.
+        if self.summary and parse_store_uri(self.uri)[0] != "berkeleydb" and len(self.graph) != self.summary.triples:
+            self.summary.rescan(self.graph)
+        counts = self.summary.as_dict() if self.summary else {"predicates": {}, "types": {}}
+        summary = {
+            "predicates": sorted(counts["predicates"], key=counts["predicates"].get, reverse=True),
+            "types": sorted(counts["types"], key=counts["types"].get, reverse=True),
+            "type_counts": counts["types"],
+        }
 
         return DatabaseMetadata(
             db_type="rdf_sparql",
             schema_summary=summary,
-            version="rdflib-memory"
+            version=f"rdflib-{parse_store_uri(self.uri)[0]}"
         )
 
+    def _prepared_get(self, key: str):
+        with self._prepared_lock:
+            prepared = self._prepared.get(key)
+            if prepared is None:
+                self.prepared_misses += 1
+            else:
+                self._prepared.move_to_end(key)
+                self.prepared_hits += prepared is not RAW
+            return prepared
+
+    def _prepared_put(self, key: str, prepared: Any):
+        with self._prepared_lock:
+            self._prepared[key] = prepared
+            if len(self._prepared) > self.prepared_cache_size:
+                self._prepared.popitem(last=False)
+
+    def _query(self, query: str):
+        """
+        Run a query through the prepared-query cache: literals become pre-bound
+        variables (parameterize_sparql), so queries differing only in constants
+        share one parsed and translated algebra. Templates rdflib cannot
+        prepare are cached as written.
+        """
+        template, literals = parameterize_sparql(query)
+        has_comment = any(m.lastgroup == "comment" for m in SPARQL_TOKEN.finditer(template))
+        key = template if has_comment else " ".join(template.split())
+        prepared = self._prepared_get(key)
+        if prepared is RAW:
+            # This template could not be prepared: cache the query as written
+            template, literals, key = query, {}, query
+            prepared = self._prepared_get(key)
+        if prepared is None:
+            namespaces = dict(self.graph.namespaces())
+            try:
+                prepared = prepareQuery(template, initNs=namespaces)
+            except Exception:
+                if not literals:
+                    raise
+                self._prepared_put(key, RAW)
+                template, literals, key = query, {}, query
+                prepared = prepareQuery(query, initNs=namespaces)
+            self._prepared_put(key, prepared)
+        bindings = {rdflib.Variable(name): from_n3(token) for name, token in literals.items()}
+        return self.graph.query(prepared, initBindings=bindings)
+
+    def _pool(self) -> ProcessPoolExecutor:
+        """Warm worker pool; each worker opens the graph once (see _init_worker)."""
+        with self._pool_lock:
+            if self._executor is None:
+                kind = parse_store_uri(self.uri)[0]
+                method = self.start_method if self.start_method in multiprocessing.get_all_start_methods() else None
+                if method == "fork" and kind != "berkeleydb":
+                    # Forked workers share this process's loaded graph copy-on-write
+                    _inherited[self.uri] = self
+                self._executor = ProcessPoolExecutor(self.processes, mp_context=multiprocessing.get_context(method),
+                                                     initializer=_init_worker, initargs=(self.uri,))
+                for future in [self._executor.submit(_worker_ping) for _ in range(self.processes)]:
+                    future.result()
+                _inherited.pop(self.uri, None)
+            return self._executor
+
+    def _select(self, query: str, offset: int = 0, limit: Optional[int] = None) -> Optional[Tuple[List[str], List[tuple]]]:
+        """(vars, rows) of a SELECT, in a worker process if the pool is enabled; None for other query forms."""
+        if not self.processes:
+            return compact_result(self._query(query), offset, limit)
+        try:
+            return self._pool().submit(_worker_query, query, offset, limit).result()
+        except BrokenProcessPool:
+            with self._pool_lock:
+                self._executor = None  # Recreated on the next query
+            raise
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {"prepared_queries": len(self._prepared), "prepared_hits": self.prepared_hits,
+                "prepared_misses": self.prepared_misses, "processes": self.processes}
+
     def execute(self, query: str, operation_type: str = "read") -> ExecutionResult:
         """
-        Executes a SPARQL query.
+        Executes a SPARQL SELECT query.
         """
         if not self.connected:
             self.connect()
             
         start_time = time.time()
         try:
-            # rdflib query returns a Result object
-            res = self.graph.query(query)
-            
-            # Convert to list of dicts for JSON serialization
-            # res.bindings is a list of dicts of RDFlib terms
-            data = []
-            for row in res:
-                # row is a resultRow, can be accessed by variable name
-                # or we can iterate.
-                # simpler: serialize to a standard format?
-                # let's try to make a list of dicts from keys
-                row_dict = {}
-                # row.asdict() might happen if we iterate bindings?
-                # rdflib Result is iterable.
-                # let's map vars
-                for var in res.vars:
-                    val = row[var]
-                    row_dict[str(var)] = str(val) # Convert URIs/Literals to strings
-                data.append(row_dict)
+            result = self._select(query)
+            if result is None:
+                raise ValueError("Only SELECT queries are supported")
+            variables, rows = result
+            # URIs/Literals as strings for JSON serialization
+            data = [dict(zip(variables, row)) for row in rows]
                 
             duration = (time.time() - start_time) * 1000
             return ExecutionResult(
@@ -108,5 +393,51 @@ class RdfConnector(BaseConnector):
                 execution_time_ms=(time.time() - start_time) * 1000
             )
 
+    def execute_page(self, query: Optional[str], page_size: int = 100, continuation: Optional[str] = None,
+                     operation_type: str = "read") -> ExecutionResult:
+        """
+        Page SELECT results by offset, converting only the rows of the requested
+        page instead of materializing the full result list.
+        """
+        if operation_type == "write":
+            return self.execute(query, operation_type)
+        if not self.connected:
+            self.connect()
+
+        state = decode_token(continuation) if continuation else {"q": query, "offset": 0}
+        start_time = time.time()
+        try:
+            offset = state["offset"]
+            result = self._select(state["q"], offset, page_size + 1)
+            if result is None:
+                return super().execute_page(query, page_size, continuation, operation_type)
+
+            variables, rows = result
+            data = [dict(zip(variables, row)) for row in rows[:page_size]]
+            has_more = len(rows) > page_size
+            token = encode_token({"q": state["q"], "offset": offset + page_size}) if has_more else None
+            return ExecutionResult(
+                status="success",
+                payload=data,
+                raw_response="SPARQL Result",
+                execution_time_ms=(time.time() - start_time) * 1000,
+                truncated=has_more,
+                continuation=token
+            )
+        except Exception as e:
+            return ExecutionResult(
+                status="error",
+                payload=None,
+                raw_response=None,
+                error_message=str(e),
+                execution_time_ms=(time.time() - start_time) * 1000
+            )
+
     def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self.graph is not None and parse_store_uri(self.uri)[0] == "berkeleydb":
+            self.graph.close()
         self.graph = None
+        self.connected = False
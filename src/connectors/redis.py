@@ -1,20 +1,212 @@
+import json
+import os
+import re
+import shlex
+import threading
 import time
-from typing import Any, Dict, List
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
 import redis
-from .base import BaseConnector, DatabaseMetadata, ExecutionResult
+try:
+    from redis.cache import CacheConfig, CacheEntryStatus, CacheKey
+except ImportError:
+    # Client-side caching needs redis-py >= 5.1: the near-cache is unavailable below that
+    CacheConfig = CacheEntryStatus = CacheKey = None
+from .base import BaseConnector, DatabaseMetadata, ExecutionResult, encode_token, decode_token
+
+# Cursor-based iteration commands and the position of their cursor argument
+SCAN_COMMANDS = {"SCAN": 0, "HSCAN": 1, "SSCAN": 1, "ZSCAN": 1}
+
+# Key segments abstracted to a placeholder when inferring patterns
+ID_SEGMENT = re.compile(r"^(\d+|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}|[0-9a-f]{16,})$", re.IGNORECASE)
+
+def key_pattern(key: str) -> str:
+    """'movie:42:views' -> 'movie:{id}:views'."""
+    return ":".join("{id}" if ID_SEGMENT.match(p) else p for p in key.split(":"))
+
+# Cacheable commands whose keys are not just the first argument
+MULTI_KEY_COMMANDS = {"MGET", "EXISTS", "SDIFF", "SINTER", "SUNION"}
+NUMKEYS_COMMANDS = {"SINTERCARD", "ZDIFF", "ZINTER", "ZINTERCARD", "ZUNION"}
+
+def tracked_keys(command: List[str]) -> List[str]:
+    """Keys a read command depends on (what the near-cache is invalidated by)."""
+    name, args = command[0].upper(), command[1:]
+    if name in MULTI_KEY_COMMANDS:
+        return args
+    if name == "JSON.MGET":
+        return args[:-1]
+    if name == "LCS":
+        return args[:2]
+    if name in NUMKEYS_COMMANDS and args and args[0].isdigit():
+        return args[1:1 + int(args[0])]
+    if name == "XREAD" and "STREAMS" in (a.upper() for a in args):
+        streams = [a.upper() for a in args].index("STREAMS") + 1
+        return args[streams:streams + (len(args) - streams) // 2]
+    return args[:1]
+
+class KeyspaceProfiler:
+    """
+    Incremental keyspace profiler. Each step() advances a SCAN cursor for at
+    most `budget_ms`, counts keys per pattern and samples up to
+    `samples_per_pattern` keys per pattern with pipelined TYPE + MEMORY USAGE.
+    When a full pass completes, its histogram is published; until then the
+    partial histogram of the first pass is served.
+
+    By default profiling is lazy (refresh() from get_metadata): a published
+    pass is reused for `ttl` seconds. start() runs passes in a background
+    thread instead, working at most `duty_cycle` of the time within a pass.
+    """
+    def __init__(self, client, budget_ms: float = 50.0, scan_count: int = 1000,
+                 samples_per_pattern: int = 20, interval: float = 30.0,
+                 ttl: float = 300.0, duty_cycle: float = 0.1):
+        self.client = client
+        self.budget_ms = budget_ms
+        self.scan_count = scan_count
+        self.samples_per_pattern = samples_per_pattern
+        self.interval = interval
+        self.ttl = ttl
+        self.duty_cycle = duty_cycle
+        self.cursor = 0
+        self.passes = 0
+        self.published_at = None
+        self._current: Dict[str, Dict[str, Any]] = {}
+        self._published: Optional[Dict[str, Dict[str, Any]]] = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def _sample(self, keys: List[str]):
+        pipe = self.client.pipeline(transaction=False)
+        for key in keys:
+            pipe.type(key)
+            pipe.memory_usage(key)
+        replies = pipe.execute(raise_on_error=False)
+        with self._lock:
+            for i, key in enumerate(keys):
+                key_type, size = replies[2 * i], replies[2 * i + 1]
+                entry = self._current[key_pattern(key)]
+                if isinstance(key_type, str):
+                    entry["types"][key_type] += 1
+                if isinstance(size, int):
+                    entry["bytes"] += size
+                    entry["sized"] += 1
+
+    def step(self) -> bool:
+        """Advance the scan for up to budget_ms. Returns True when a pass completed."""
+        deadline = time.time() + self.budget_ms / 1000
+        to_sample = []
+        completed = False
+        while True:
+            self.cursor, keys = self.client.scan(cursor=self.cursor, count=self.scan_count)
+            with self._lock:
+                for key in keys:
+                    pattern = key_pattern(key)
+                    entry = self._current.setdefault(pattern, {"count": 0, "types": Counter(), "bytes": 0,
+                                                               "sized": 0, "examples": []})
+                    entry["count"] += 1
+                    if len(entry["examples"]) < self.samples_per_pattern:
+                        entry["examples"].append(key)
+                        to_sample.append(key)
+            if int(self.cursor) == 0:
+                completed = True
+                break
+            if time.time() >= deadline:
+                break
+
+        if to_sample:
+            self._sample(to_sample)
+        if completed:
+            with self._lock:
+                self._published, self._current = self._current, {}
+                self.published_at = time.time()
+                self.passes += 1
+        return completed
+
+    def refresh(self) -> bool:
+        """
+        One budgeted step, unless the published pass is younger than ttl.
+        Returns True if a step ran.
+        """
+        if self.published_at is not None and time.time() - self.published_at < self.ttl:
+            return False
+        self.step()
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                completed = self.step()
+            except Exception as e:
+                print(f"⚠️ Redis profiler step failed: {e}")
+                completed = True
+            # Between passes wait the full interval; within a pass keep to the duty cycle
+            pause = self.budget_ms / 1000 * (1 / self.duty_cycle - 1)
+            self._stop.wait(self.interval if completed else pause)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def summary(self, top: int = 50) -> Dict[str, Any]:
+        """Pattern histogram (largest first) with dominant type and average sampled size."""
+        with self._lock:
+            complete = self._published is not None
+            histogram = self._published if complete else self._current
+            patterns = {
+                pattern: {
+                    "keys": entry["count"],
+                    "type": entry["types"].most_common(1)[0][0] if entry["types"] else "unknown",
+                    "avg_bytes": round(entry["bytes"] / entry["sized"]) if entry["sized"] else None,
+                    "examples": entry["examples"][:3],
+                }
+                for pattern, entry in sorted(histogram.items(), key=lambda kv: kv[1]["count"], reverse=True)[:top]
+            }
+        return {"patterns": patterns, "complete": complete, "passes": self.passes}
 
 class RedisConnector(BaseConnector):
+    supports_aggregation = False
+
     def __init__(self, uri: str = "redis://localhost:6379", **kwargs):
         # Handle simple host/port dict if needed, but uri is standard
         super().__init__(uri, **kwargs)
         self.client = None
+        # Keyspace profiling feeding get_metadata: lazy by default, opt-in background thread
+        self.profile = kwargs.get("profile", os.getenv("REDIS_PROFILE", "0") == "1")
+        self.profile_budget_ms = kwargs.get("profile_budget_ms", 50.0)
+        self.profile_interval = kwargs.get("profile_interval", 30.0)
+        self.profile_ttl = float(kwargs.get("profile_ttl", os.getenv("REDIS_PROFILE_TTL", 300)))
+        self.profiler = None
+        # Opt-in near-cache: RESP3 client tracking, the server pushes invalidations
+        self.near_cache = kwargs.get("near_cache", os.getenv("REDIS_NEAR_CACHE", "0") == "1")
+        self.near_cache_size = int(kwargs.get("near_cache_size", os.getenv("REDIS_NEAR_CACHE_SIZE", 10000)))
+        self.near_cache_hits = 0
+        self.near_cache_misses = 0
+        self._stats_lock = threading.Lock()
 
     def connect(self):
         try:
-            self.client = redis.Redis.from_url(self.uri, decode_responses=True)
-            self.client.ping()
+            if self.near_cache and CacheConfig is None:
+                print(f"⚠️ Redis near-cache disabled: redis-py {redis.__version__} has no client-side cache (needs >= 5.1)")
+                self.near_cache = False
+            if self.near_cache:
+                try:
+                    self.client = redis.Redis.from_url(self.uri, decode_responses=True, protocol=3,
+                                                       cache_config=CacheConfig(max_size=self.near_cache_size))
+                    self.client.ping()
+                except redis.ConnectionError as e:
+                    # Client tracking needs Redis >= 7.4; keep working without it
+                    print(f"⚠️ Redis near-cache disabled: {e}")
+                    self.near_cache = False
+            if not self.near_cache:
+                self.client = redis.Redis.from_url(self.uri, decode_responses=True)
+                self.client.ping()
             self.connected = True
-            print("Connected to Redis")
+            print("Connected to Redis" + (" (near-cache on)" if self.near_cache else ""))
         except Exception as e:
             print(f"Failed to connect to Redis: {e}")
             self.connected = False
@@ -24,23 +216,22 @@ class RedisConnector(BaseConnector):
         if not self.connected:
             self.connect()
         
-        # Redis has no schema. We scan for patterns.
-        # Research approach: Sample random keys to guess schema.
+        # Redis has no schema: key patterns come from the keyspace profiler
         summary = {"key_patterns": [], "sample_keys": []}
         try:
-            # Scan first 100 keys
-            cursor, keys = self.client.scan(count=100)
-            summary["sample_keys"] = keys
-            
-            # Simple pattern inference (e.g., "avg_rating" from "movie:1:avg_rating")
-            patterns = set()
-            for k in keys:
-                parts = k.split(":")
-                if len(parts) > 1:
-                    # Abstract the ID part (numeric)
-                    pattern = ":".join(["{id}" if p.isdigit() else p for p in parts])
-                    patterns.add(pattern)
-            summary["key_patterns"] = list(patterns)
+            if self.profiler is None:
+                self.profiler = KeyspaceProfiler(self.client, budget_ms=self.profile_budget_ms,
+                                                 interval=self.profile_interval, ttl=self.profile_ttl)
+                self.profiler.step()  # First slice synchronously so the first prompt has patterns
+                if self.profile:
+                    self.profiler.start()
+            elif not self.profile:
+                self.profiler.refresh()
+            profile = self.profiler.summary()
+            summary["key_patterns"] = list(profile["patterns"])
+            summary["sample_keys"] = [k for p in profile["patterns"].values() for k in p["examples"]][:100]
+            summary["patterns"] = profile["patterns"]
+            summary["profile_complete"] = profile["complete"]
 
         except Exception as e:
             print(f"Error fetching Redis metadata: {e}")
@@ -51,25 +242,120 @@ class RedisConnector(BaseConnector):
             version="unknown"
         )
 
+    @staticmethod
+    def parse_commands(query: str) -> Tuple[List[List[str]], bool]:
+        """
+        Parse a query into (commands, transaction). Accepted forms:
+          - one command with shell-style quoting: 'HGET movie:1 "release date"'
+          - a JSON list of commands: ["GET movie:1:views", "GET movie:2:views"]
+          - {"commands": [...], "transaction": true}  (MULTI/EXEC for writes)
+        Commands in JSON may also be argument lists: ["HGET", "movie:1", "title"].
+        """
+        text = query.strip()
+        spec = None
+        if text[:1] in ("[", "{"):
+            try:
+                spec = json.loads(text)
+            except json.JSONDecodeError:
+                spec = None
+        transaction = False
+        if isinstance(spec, dict):
+            transaction = bool(spec.get("transaction", False))
+            spec = spec.get("commands")
+        items = spec if isinstance(spec, list) else [text]
+
+        commands = []
+        for item in items:
+            parts = [str(a) for a in item] if isinstance(item, list) else shlex.split(str(item))
+            if parts:
+                commands.append([parts[0].upper()] + parts[1:])
+        if not commands:
+            raise ValueError("Empty query")
+        return commands, transaction
+
+    @staticmethod
+    def _batch(commands: List[List[str]]) -> List[Tuple[List[str], int]]:
+        """
+        Merge runs of consecutive single-key GETs into one MGET.
+        Returns (command, n) pairs; n > 0 marks an MGET standing in for n GETs.
+        """
+        batched, run = [], []
+        for command in commands + [None]:
+            if command is not None and command[0] == "GET" and len(command) == 2:
+                run.append(command[1])
+                continue
+            if len(run) > 1:
+                batched.append((["MGET"] + run, len(run)))
+            elif run:
+                batched.append((["GET", run[0]], 0))
+            run = []
+            if command is not None:
+                batched.append((command, 0))
+        return batched
+
+    def _execute_single(self, command: List[str]) -> Any:
+        """
+        Run one command. With the near-cache on, cacheable reads go through
+        redis-py's client-side cache (LRU, bounded by near_cache_size) keyed by
+        the command and its keys; entries are dropped when the server pushes an
+        invalidation for any of those keys.
+        """
+        cache = self.client.get_cache() if self.near_cache else None
+        if cache is None or not cache.is_cachable(CacheKey(command=command[0], redis_keys=())):
+            return self.client.execute_command(*command)
+        keys = tracked_keys(command)
+        entry = cache.get(CacheKey(command=command[0], redis_keys=tuple(keys), redis_args=tuple(command)))
+        hit = entry is not None and entry.status == CacheEntryStatus.VALID
+        with self._stats_lock:
+            if hit:
+                self.near_cache_hits += 1
+            else:
+                self.near_cache_misses += 1
+        return self.client.execute_command(*command, keys=keys)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        if not self.near_cache:
+            return {}
+        cache = self.client.get_cache() if self.client else None
+        with self._stats_lock:
+            hits, misses = self.near_cache_hits, self.near_cache_misses
+        return {
+            "near_cache": {
+                "max_size": self.near_cache_size,
+                "entries": cache.size if cache else 0,
+                "hits": hits,
+                "misses": misses,
+            }
+        }
+
     def execute(self, query: str, operation_type: str = "read") -> ExecutionResult:
         """
-        Executes a Redis command.
-        Query is expected to be a space-separated string e.g. "GET movie:1" or "HGETALL movie:1:info"
+        Executes Redis command(s) (see parse_commands for the accepted formats).
+        A single command runs as is; a command list is sent through one
+        pipeline (one round trip), with consecutive GETs merged into MGET.
         """
         if not self.connected:
             self.connect()
             
         start_time = time.time()
         try:
-            # Very basic parsing. In a real shell we'd handle quotes.
-            parts = query.split()
-            if not parts:
-                raise ValueError("Empty query")
-            
-            cmd = parts[0].upper()
-            args = parts[1:]
+            commands, transaction = self.parse_commands(query)
+            is_list = query.strip()[:1] in ("[", "{")
 
-            result = self.client.execute_command(cmd, *args)
+            if len(commands) == 1 and not is_list:
+                result = self._execute_single(commands[0])
+            else:
+                batched = self._batch(commands)
+                pipe = self.client.pipeline(transaction=transaction and operation_type == "write")
+                for command, _ in batched:
+                    pipe.execute_command(*command)
+                replies = pipe.execute()
+                result = []
+                for (command, gets), reply in zip(batched, replies):
+                    if gets:
+                        result.extend(reply)
+                    else:
+                        result.append(reply)
             
             duration = (time.time() - start_time) * 1000
             return ExecutionResult(
@@ -88,6 +374,58 @@ class RedisConnector(BaseConnector):
                 execution_time_ms=(time.time() - start_time) * 1000
             )
 
+    def execute_page(self, query: Optional[str], page_size: int = 100, continuation: Optional[str] = None,
+                     operation_type: str = "read") -> ExecutionResult:
+        """
+        Page keyspace iteration with the server-side SCAN cursor. KEYS is served
+        as SCAN MATCH so large keyspaces never arrive in one reply.
+        Other commands fall back to offset slicing.
+        """
+        start_time = time.time()
+        try:
+            state = decode_token(continuation) if continuation else {"q": query, "cursor": 0}
+            parts = shlex.split(state["q"] or "") if (state["q"] or "").strip()[:1] not in ("[", "{") else []
+        except ValueError as e:
+            # Unbalanced quotes or a bad token: an error result, as from execute
+            return ExecutionResult(status="error", payload=None, raw_response=None, error_message=str(e),
+                                   execution_time_ms=(time.time() - start_time) * 1000)
+        cmd = parts[0].upper() if parts else ""
+        if operation_type == "write" or (cmd not in SCAN_COMMANDS and cmd != "KEYS"):
+            return super().execute_page(query, page_size, continuation, operation_type)
+
+        if not self.connected:
+            self.connect()
+
+        try:
+            if cmd == "KEYS":
+                pattern = parts[1] if len(parts) > 1 else "*"
+                args = ["SCAN", state["cursor"], "MATCH", pattern, "COUNT", page_size]
+            else:
+                pos = SCAN_COMMANDS[cmd] + 1
+                args = [cmd] + parts[1:pos] + [state["cursor"]] + parts[pos + 1:] + ["COUNT", page_size]
+
+            next_cursor, items = self.client.execute_command(*args)
+            next_cursor = int(next_cursor)
+            token = encode_token({"q": state["q"], "cursor": next_cursor}) if next_cursor else None
+            return ExecutionResult(
+                status="success",
+                payload=items,
+                raw_response=None,
+                execution_time_ms=(time.time() - start_time) * 1000,
+                truncated=token is not None,
+                continuation=token
+            )
+        except Exception as e:
+            return ExecutionResult(
+                status="error",
+                payload=None,
+                raw_response=None,
+                error_message=str(e),
+                execution_time_ms=(time.time() - start_time) * 1000
+            )
+
     def close(self):
+        if self.profiler:
+            self.profiler.stop()
         if self.client:
             self.client.close()
@@ -0,0 +1,189 @@
+"""
+Client-side aggregation engine for stores without native aggregation
+(Redis, HBase). Connector payloads are turned into columnar NumPy arrays;
+grouping is hash-based and top-k uses a partial sort.
+"""
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from src.ir.models import QueryIR
+from src.engine.local import MISSING, resolve_field, match_filter
+
+METRIC_TYPES = {"count", "sum", "avg", "min", "max"}
+
+
+def to_rows(payload: Any) -> List[Dict[str, Any]]:
+    """
+    Normalize connector payloads into a list of row dicts.
+    Scalars (e.g. Redis GET/MGET/KEYS results) become {"value": v}.
+    """
+    if payload is None:
+        return []
+    if isinstance(payload, dict):
+        return [payload]
+    if isinstance(payload, (list, tuple)):
+        return [item if isinstance(item, dict) else {"value": item} for item in payload]
+    return [{"value": payload}]
+
+
+def _to_float(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def numeric_column(rows: List[Dict[str, Any]], field: str) -> np.ndarray:
+    """Extract a field as a float column; missing or non-numeric cells become NaN."""
+    values = (resolve_field(row, field) for row in rows)
+    return np.fromiter((_to_float(v) for v in values), dtype=np.float64, count=len(rows))
+
+
+def group_codes(rows: List[Dict[str, Any]], field: str):
+    """
+    Hash-based grouping: map each row's key to a dense integer code.
+    Returns (codes, keys) where keys[code] is the original group value.
+    """
+    index: Dict[Any, int] = {}
+    keys: List[Any] = []
+
+    def code(row):
+        value = resolve_field(row, field)
+        if value is MISSING:
+            value = None
+        hashable = tuple(value) if isinstance(value, list) else value
+        if hashable not in index:
+            index[hashable] = len(keys)
+            keys.append(value)
+        return index[hashable]
+
+    codes = np.fromiter((code(row) for row in rows), dtype=np.int64, count=len(rows))
+    return codes, keys
+
+
+def top_k_indices(column: np.ndarray, k: Optional[int], descending: bool) -> np.ndarray:
+    """Indices of the k best entries in order, using argpartition when k < n. NaNs sort last."""
+    n = len(column)
+    keyed = -column if descending else column.copy()
+    keyed[np.isnan(keyed)] = np.inf
+    if k is None or k >= n:
+        return np.argsort(keyed, kind="stable")
+    if k <= 0:
+        return np.array([], dtype=np.int64)
+    part = np.argpartition(keyed, k - 1)[:k]
+    return part[np.argsort(keyed[part], kind="stable")]
+
+
+def _metric_name(step_type: str, field: Optional[str]) -> str:
+    if step_type == "count" or not field:
+        return step_type
+    return f"{step_type}_{field}"
+
+
+def _reduce(step_type: str, codes: np.ndarray, values: np.ndarray, n_groups: int) -> np.ndarray:
+    valid = ~np.isnan(values)
+    if step_type == "sum":
+        return np.bincount(codes[valid], weights=values[valid], minlength=n_groups)
+    if step_type == "avg":
+        sums = np.bincount(codes[valid], weights=values[valid], minlength=n_groups)
+        counts = np.bincount(codes[valid], minlength=n_groups)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return sums / counts
+    if step_type in ("min", "max"):
+        out = np.full(n_groups, np.inf if step_type == "min" else -np.inf)
+        ufunc = np.minimum if step_type == "min" else np.maximum
+        ufunc.at(out, codes[valid], values[valid])
+        out[np.isinf(out)] = np.nan
+        return out
+    raise ValueError(f"Unsupported aggregation '{step_type}'")
+
+
+def _python_value(value: Any) -> Any:
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
+
+
+def aggregate(payload: Any, ir: QueryIR) -> List[Dict[str, Any]]:
+    """
+    Evaluate the IR's aggregations, sort and limit over a connector payload.
+
+    Filters are applied only on fields present in the rows; filters on other
+    fields are assumed to have been pushed down to the store (e.g. encoded
+    in a key pattern or row range).
+    """
+    rows = to_rows(payload)
+    present = [f for f in ir.filters if rows and resolve_field(rows[0], f.field) is not MISSING]
+    if present:
+        # Client-side aggregation serves untyped stores (HBase cells, Redis strings)
+        rows = [row for row in rows if all(match_filter(row, f, exact=False) for f in present)]
+
+    group_by = next((a.group_by for a in ir.aggregations if a.group_by), None)
+    metrics = [a for a in ir.aggregations if a.type.lower() in METRIC_TYPES]
+    if ir.aggregations and not metrics:
+        # A bare 'group' step means "count per group"
+        metrics = [a.model_copy(update={"type": "count"}) for a in ir.aggregations[:1]]
+
+    if not metrics:
+        return _sort_rows(rows, ir)
+
+    if group_by:
+        codes, keys = group_codes(rows, group_by)
+    else:
+        codes, keys = np.zeros(len(rows), dtype=np.int64), [None]
+    n_groups = len(keys)
+
+    columns: Dict[str, np.ndarray] = {}
+    for step in metrics:
+        step_type = step.type.lower()
+        name = _metric_name(step_type, step.field)
+        if step_type == "count":
+            columns[name] = np.bincount(codes, minlength=n_groups).astype(np.float64)
+        else:
+            if not step.field:
+                raise ValueError(f"Aggregation '{step_type}' requires a field")
+            columns[name] = _reduce(step_type, codes, numeric_column(rows, step.field), n_groups)
+
+    order = np.arange(n_groups)
+    sort_name = _resolve_sort_column(ir.sort_field, columns)
+    if sort_name:
+        order = top_k_indices(columns[sort_name], ir.limit, ir.sort_order.upper() == "DESC")
+
+    result = []
+    for i in order:
+        out = {group_by: keys[i]} if group_by else {}
+        for name, column in columns.items():
+            value = _python_value(column[i])
+            out[name] = int(value) if name == "count" and value is not None else value
+        result.append(out)
+    if not sort_name:
+        if group_by and ir.sort_field:
+            result.sort(key=lambda r: str(r[group_by]), reverse=ir.sort_order.upper() == "DESC")
+        if ir.limit is not None:
+            result = result[:ir.limit]
+    return result
+
+
+def _resolve_sort_column(sort_field: Optional[str], columns: Dict[str, np.ndarray]) -> Optional[str]:
+    """Map an IR sort field ('count', 'avg_rating' or just 'rating') onto a metric column."""
+    if not sort_field:
+        return None
+    if sort_field in columns:
+        return sort_field
+    for name in columns:
+        if name.endswith("_" + sort_field):
+            return name
+    return None
+
+
+def _sort_rows(rows: List[Dict[str, Any]], ir: QueryIR) -> List[Dict[str, Any]]:
+    """Top-k over raw rows by a numeric sort field (no aggregation requested)."""
+    if ir.sort_field:
+        column = numeric_column(rows, ir.sort_field)
+        if not np.isnan(column).all():
+            order = top_k_indices(column, ir.limit, ir.sort_order.upper() == "DESC")
+            return [rows[i] for i in order]
+    return rows[:ir.limit] if ir.limit is not None else rows
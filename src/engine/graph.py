@@ -0,0 +1,289 @@
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from src.optimization.shapes import parameterize_cypher
+
+# --- Pattern recognition (on parameterized Cypher: literals are $params) ---
+
+NODE = re.compile(r"\(\s*(?P<var>\w+)?\s*(?::\s*`?(?P<label>\w+)`?)?\s*(?:\{(?P<props>[^{}]*)\})?\s*\)")
+REL = re.compile(r"(?P<left><)?-\[\s*\w*\s*:\s*`?(?P<type>\w+)`?\s*\]-(?P<right>>)?")
+PROP_EQ = re.compile(r"^\s*(\w+)\s*:\s*\$(\w+)\s*$")
+WHERE_EQ = re.compile(r"^(?:(\w+)\.(\w+)\s*=\s*\$(\w+)|\$(\w+)\s*=\s*(\w+)\.(\w+))$")
+RETURN_ITEM = re.compile(r"^(\w+)\.(\w+)(?:\s+AS\s+(\w+))?$", re.IGNORECASE)
+TAIL = re.compile(
+    r"\s*(?:WHERE\s+(?P<where>.*?)\s+)?RETURN\s+(?P<distinct>DISTINCT\s+)?(?P<items>.*?)"
+    r"(?:\s+ORDER\s+BY\s+(?P<order>[\w.]+)(?:\s+(?P<dir>ASC|DESC))?)?(?:\s+LIMIT\s+\$(?P<limit>\w+))?\s*;?\s*$",
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+def parse_traversal(query: str) -> Optional[Dict[str, Any]]:
+    """
+    Recognize a 1-2 hop read of the form
+        MATCH (a:Actor {name: 'X'})-[:ACTED_IN]->(m:Movie) [WHERE v.p = 'Y' AND ...]
+        RETURN [DISTINCT] v.p [AS alias], ... [ORDER BY ...] [LIMIT n]
+    Returns {"nodes", "rels", "returns", "distinct", "order", "limit"} or None
+    for anything else (the query then goes to Neo4j).
+    """
+    text, params = parameterize_cypher(query.strip())
+    match = re.match(r"^\s*MATCH\s+", text, re.IGNORECASE)
+    if not match:
+        return None
+    pos = match.end()
+
+    nodes, rels = [], []
+    while True:
+        node = NODE.match(text, pos)
+        if not node:
+            return None
+        constraints = {}
+        for prop in filter(None, (node.group("props") or "").split(",")):
+            eq = PROP_EQ.match(prop)
+            if not eq:
+                return None
+            constraints[eq.group(1)] = params[eq.group(2)]
+        nodes.append({"var": node.group("var"), "label": node.group("label"), "props": constraints})
+        pos = node.end()
+        rel = REL.match(text, pos)
+        if not rel:
+            break
+        if rel.group("left") and rel.group("right"):
+            return None
+        direction = "in" if rel.group("left") else "out" if rel.group("right") else "both"
+        rels.append({"type": rel.group("type"), "direction": direction})
+        pos = rel.end()
+
+    variables = [n["var"] for n in nodes if n["var"]]
+    if not 1 <= len(rels) <= 2 or len(variables) != len(set(variables)):
+        return None
+
+    tail = TAIL.match(text, pos)
+    if not tail:
+        return None
+    by_var = {n["var"]: n for n in nodes if n["var"]}
+    if tail.group("where"):
+        for cond in re.split(r"\s+AND\s+", tail.group("where"), flags=re.IGNORECASE):
+            eq = WHERE_EQ.match(cond.strip())
+            if not eq:
+                return None
+            var, prop, param = (eq.group(1), eq.group(2), eq.group(3)) if eq.group(1) else (eq.group(5), eq.group(6), eq.group(4))
+            if var not in by_var:
+                return None
+            by_var[var]["props"][prop] = params[param]
+
+    returns = []
+    for item in tail.group("items").split(","):
+        ret = RETURN_ITEM.match(item.strip())
+        if not ret or ret.group(1) not in by_var:
+            return None
+        returns.append((ret.group(1), ret.group(2), ret.group(3) or f"{ret.group(1)}.{ret.group(2)}"))
+
+    order = None
+    if tail.group("order"):
+        columns = {alias for _, _, alias in returns}
+        if tail.group("order") not in columns:
+            return None
+        order = (tail.group("order"), (tail.group("dir") or "ASC").upper() == "DESC")
+
+    return {
+        "nodes": nodes,
+        "rels": rels,
+        "returns": returns,
+        "distinct": bool(tail.group("distinct")),
+        "order": order,
+        "limit": params[tail.group("limit")] if tail.group("limit") else None,
+    }
+
+
+# --- Compressed sparse row adjacency ---
+
+class GraphSnapshot:
+    """
+    Immutable in-memory copy of a property graph: node labels/properties in
+    Python lists, topology as integer-indexed CSR arrays per relationship
+    type and direction (indptr[i]:indptr[i+1] slices indices for node i).
+    """
+    def __init__(self, nodes: Iterable[Tuple[Any, List[str], Dict[str, Any]]],
+                 edges: Iterable[Tuple[Any, str, Any]]):
+        self.labels: List[frozenset] = []
+        self.props: List[Dict[str, Any]] = []
+        position: Dict[Any, int] = {}
+        for node_id, labels, props in nodes:
+            position[node_id] = len(self.props)
+            self.labels.append(frozenset(labels))
+            self.props.append(dict(props))
+        n = len(self.props)
+
+        by_type: Dict[str, Tuple[List[int], List[int]]] = {}
+        for src, rel_type, dst in edges:
+            if src in position and dst in position:
+                pair = by_type.setdefault(rel_type, ([], []))
+                pair[0].append(position[src])
+                pair[1].append(position[dst])
+
+        self.adjacency: Dict[Tuple[str, str], Tuple[np.ndarray, np.ndarray]] = {}
+        for rel_type, (src, dst) in by_type.items():
+            src, dst = np.asarray(src, dtype=np.int32), np.asarray(dst, dtype=np.int32)
+            self.adjacency[(rel_type, "out")] = self._csr(src, dst, n)
+            self.adjacency[(rel_type, "in")] = self._csr(dst, src, n)
+        self.edge_count = sum(len(src) for src, _ in by_type.values())
+        self._prop_index: Dict[Tuple[Optional[str], str], Dict[Any, List[int]]] = {}
+
+    @staticmethod
+    def _csr(src: np.ndarray, dst: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        order = np.argsort(src, kind="stable")
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+        return indptr, dst[order]
+
+    def neighbors(self, node: int, rel_type: str, direction: str) -> np.ndarray:
+        csr = self.adjacency.get((rel_type, direction))
+        if csr is None:
+            return np.empty(0, dtype=np.int32)
+        indptr, indices = csr
+        return indices[indptr[node]:indptr[node + 1]]
+
+    def lookup(self, label: Optional[str], prop: str, value: Any) -> List[int]:
+        """Nodes with `label` whose `prop` equals value (index built on first use)."""
+        key = (label, prop)
+        if key not in self._prop_index:
+            index: Dict[Any, List[int]] = {}
+            for i, props in enumerate(self.props):
+                if (label is None or label in self.labels[i]) and prop in props:
+                    value_key = props[prop]
+                    if isinstance(value_key, list):
+                        continue
+                    index.setdefault(value_key, []).append(i)
+            self._prop_index[key] = index
+        return self._prop_index[key].get(value, []) if not isinstance(value, list) else []
+
+    def _matches(self, node: int, spec: Dict[str, Any]) -> bool:
+        if spec["label"] and spec["label"] not in self.labels[node]:
+            return False
+        props = self.props[node]
+        return all(k in props and props[k] == v for k, v in spec["props"].items())
+
+    def _step(self, node: int, rel: Dict[str, Any], forward: bool) -> List[Tuple[int, Tuple[int, str, int]]]:
+        """(neighbor, edge) pairs, edges as (src, type, dst) in stored direction."""
+        direction = rel["direction"]
+        if not forward and direction != "both":
+            direction = "in" if direction == "out" else "out"
+        steps = []
+        for d in (("out", "in") if direction == "both" else (direction,)):
+            for other in self.neighbors(node, rel["type"], d).tolist():
+                steps.append((other, (node, rel["type"], other) if d == "out" else (other, rel["type"], node)))
+        return steps
+
+    def traverse(self, pattern: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        """Evaluate a parse_traversal() pattern; None if it has no anchored start node."""
+        nodes, rels = pattern["nodes"], pattern["rels"]
+        start = next((i for i, spec in enumerate(nodes) if spec["props"]), None)
+        if start is None:
+            return None
+        spec = nodes[start]
+        prop, value = next(iter(spec["props"].items()))
+        paths = [({start: s}, set()) for s in self.lookup(spec["label"], prop, value) if self._matches(s, spec)]
+
+        # Expand right of the anchor, then left (relationships are unique within a path)
+        order = [(i, i + 1, True) for i in range(start, len(rels))] + [(i + 1, i, False) for i in range(start - 1, -1, -1)]
+        for frm, to, forward in order:
+            rel = rels[min(frm, to)]
+            expanded = []
+            for bound, edges in paths:
+                for other, edge in self._step(bound[frm], rel, forward):
+                    if edge not in edges and self._matches(other, nodes[to]):
+                        expanded.append(({**bound, to: other}, edges | {edge}))
+            paths = expanded
+
+        index = {spec["var"]: i for i, spec in enumerate(nodes) if spec["var"]}
+        rows = [{alias: self.props[bound[index[var]]].get(prop) for var, prop, alias in pattern["returns"]}
+                for bound, _ in paths]
+        if pattern["distinct"]:
+            seen, unique = set(), []
+            for row in rows:
+                key = tuple(repr(v) for v in row.values())
+                if key not in seen:
+                    seen.add(key)
+                    unique.append(row)
+            rows = unique
+        if pattern["order"]:
+            column, descending = pattern["order"]
+            # Cypher sorts nulls last (ascending)
+            rows.sort(key=lambda r: (r[column] is None, r[column] if r[column] is not None else 0), reverse=descending)
+        if pattern["limit"] is not None:
+            rows = rows[:pattern["limit"]]
+        return rows
+
+
+class GraphAccelerator:
+    """
+    Optional adjacency cache beside Neo4jConnector. `loader` returns
+    (nodes, edges) from a bulk export; the snapshot is rebuilt in the
+    background once older than `ttl` seconds, or after invalidate() (called
+    on write executions). While no fresh snapshot exists queries fall
+    through to the database.
+    """
+    def __init__(self, loader: Callable[[], Tuple[Iterable, Iterable]], ttl: float = 600.0):
+        self.loader = loader
+        self.ttl = ttl
+        self.snapshot: Optional[GraphSnapshot] = None
+        self.built_at = 0.0
+        self.hits = 0
+        self._building = False
+        self._generation = 0  # Bumped by invalidate(): loads started before it are stale
+        self._lock = threading.Lock()
+
+    def refresh(self) -> bool:
+        """Rebuild the snapshot synchronously; False if a write invalidated it while loading."""
+        start_time = time.time()
+        with self._lock:
+            generation = self._generation
+        nodes, edges = self.loader()
+        snapshot = GraphSnapshot(nodes, edges)
+        with self._lock:
+            if generation != self._generation:
+                print("⚠️ Graph cache refresh discarded: invalidated while loading")
+                return False
+            self.snapshot, self.built_at = snapshot, time.time()
+        print(f"🕸️ Graph cache built: {len(snapshot.props)} nodes, {snapshot.edge_count} relationships "
+              f"({(time.time() - start_time) * 1000:.0f}ms)")
+        return True
+
+    def _refresh_in_background(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            print(f"⚠️ Graph cache refresh failed: {e}")
+        finally:
+            self._building = False
+
+    def invalidate(self):
+        with self._lock:
+            self.snapshot = None
+            self._generation += 1
+
+    def ready(self) -> bool:
+        """True if a fresh snapshot is loaded; otherwise starts a background rebuild."""
+        if self.snapshot is not None and time.time() - self.built_at < self.ttl:
+            return True
+        with self._lock:
+            if not self._building:
+                self._building = True
+                threading.Thread(target=self._refresh_in_background, daemon=True).start()
+        return False
+
+    def answer(self, query: str) -> Optional[List[Dict[str, Any]]]:
+        pattern = parse_traversal(query)
+        if pattern is None or not self.ready():
+            return None
+        snapshot = self.snapshot
+        if snapshot is None:
+            return None
+        rows = snapshot.traverse(pattern)
+        if rows is not None:
+            self.hits += 1
+        return rows
@@ -0,0 +1,65 @@
+from typing import Any, Dict, List
+
+from src.engine.local import MISSING, resolve_field
+from src.ir.canonical import normalize_value
+
+
+def join_value(row: Dict[str, Any], key: str) -> Any:
+    """
+    Normalized join key of a row, or MISSING. Normalization lets Mongo's
+    int ids meet HBase's string row keys and titles match across case.
+    """
+    value = resolve_field(row, key)
+    if value is MISSING or value is None:
+        return MISSING
+    value = normalize_value(value)
+    return tuple(value) if isinstance(value, list) else value
+
+
+def _merge(left: Dict[str, Any], right: Dict[str, Any], right_prefix: str) -> Dict[str, Any]:
+    merged = dict(left)
+    for key, value in right.items():
+        if key in merged and merged[key] != value:
+            key = f"{right_prefix}.{key}"
+        merged[key] = value
+    return merged
+
+
+def hash_join(left: List[Dict[str, Any]], right: List[Dict[str, Any]],
+              left_key: str, right_key: str, how: str = "inner",
+              right_prefix: str = "right") -> List[Dict[str, Any]]:
+    """
+    In-process equi-join. The hash table is built on the smaller input and
+    probed with the larger one; output rows keep the left input's order.
+    Conflicting column names from the right side are prefixed with `right_prefix`.
+    how: "inner" or "left".
+    """
+    if how not in ("inner", "left"):
+        raise ValueError(f"Unsupported join type '{how}'")
+
+    build_left = len(left) < len(right) and how == "inner"
+    build_rows, build_key = (left, left_key) if build_left else (right, right_key)
+
+    table: Dict[Any, List[int]] = {}
+    for i, row in enumerate(build_rows):
+        value = join_value(row, build_key)
+        if value is not MISSING:
+            table.setdefault(value, []).append(i)
+
+    if build_left:
+        # Probe with the right side, then restore left order
+        pairs = []
+        for j, row in enumerate(right):
+            for i in table.get(join_value(row, right_key), ()):
+                pairs.append((i, j))
+        pairs.sort()
+        return [_merge(left[i], right[j], right_prefix) for i, j in pairs]
+
+    result = []
+    for row in left:
+        matches = table.get(join_value(row, left_key), ())
+        for j in matches:
+            result.append(_merge(row, right[j], right_prefix))
+        if not matches and how == "left":
+            result.append(dict(row))
+    return result
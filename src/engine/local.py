@@ -0,0 +1,143 @@
+"""
+In-process evaluation of QueryIR clauses over connector payloads.
+Used when a result can be derived from data already fetched (cached
+supersets) instead of going back to the database.
+"""
+from typing import Any, Dict, List, Optional
+
+from src.ir.models import QueryIR, FilterCondition
+from src.ir.canonical import literal_value, normalize_operator, normalize_value
+
+MISSING = object()
+
+
+def resolve_field(row: Dict[str, Any], field: str) -> Any:
+    """
+    Look up an IR field in a payload row. Handles the shapes our connectors
+    return: plain keys (Mongo), dotted paths (nested docs), Cypher aliases
+    like 'm.title' and HBase qualifiers like 'info:genre'.
+    Returns MISSING when the field is absent or ambiguous.
+    """
+    if not isinstance(row, dict):
+        return MISSING
+    if field in row:
+        return row[field]
+
+    lowered = field.lower()
+    for key, value in row.items():
+        if str(key).lower() == lowered:
+            return value
+
+    if "." in field:
+        node = row
+        for part in field.split("."):
+            if not isinstance(node, dict) or part not in node:
+                break
+            node = node[part]
+        else:
+            return node
+
+    matches = [k for k in row if str(k).lower().endswith(("." + lowered, ":" + lowered))]
+    if len(matches) == 1:
+        return row[matches[0]]
+    return MISSING
+
+
+def _compare(left: Any, right: Any, op: str) -> bool:
+    try:
+        if op == "gt":
+            return left > right
+        if op == "gte":
+            return left >= right
+        if op == "lt":
+            return left < right
+        if op == "lte":
+            return left <= right
+    except TypeError:
+        return False
+    return False
+
+
+def _kind(value: Any) -> str:
+    if isinstance(value, bool):
+        return "bool"
+    return "number" if isinstance(value, (int, float)) else type(value).__name__
+
+
+def _comparable(raw: Any, literal: Any) -> bool:
+    """
+    True if the row value has the literal's type (None aside). Stores compare
+    typed values ('2010' never equals 2010), so mixed types are not evaluated here.
+    """
+    values = raw if isinstance(raw, list) else [raw]
+    options = literal if isinstance(literal, list) else [literal]
+    kinds = {_kind(o) for o in options}
+    return all(v is None or _kind(v) in kinds for v in values)
+
+
+def match_filter(row: Dict[str, Any], cond: FilterCondition, exact: bool = True) -> bool:
+    """
+    Exact literal semantics by default, as Mongo equality and Cypher =/CONTAINS:
+    case- and type-sensitive. exact=False normalizes both sides (see
+    normalize_value) for untyped stores whose cells hold 2010 as '2010'.
+    """
+    raw = resolve_field(row, cond.field)
+    if raw is MISSING:
+        return False
+    op = normalize_operator(cond.operator)
+    normalize = literal_value if exact else normalize_value
+    target = normalize(cond.value)
+    # Array fields (e.g. actors) match if any element matches, as in Mongo
+    values = raw if isinstance(raw, list) else [raw]
+    normalized = [normalize(v) for v in values]
+
+    if op == "eq":
+        return target in normalized
+    if op == "ne":
+        return target not in normalized
+    if op == "in":
+        options = target if isinstance(target, list) else [target]
+        return any(v in options for v in normalized)
+    if op == "contains":
+        needle = str(target)
+        return any((isinstance(v, str) or not exact) and needle in str(v) for v in normalized)
+    if op in ("gt", "gte", "lt", "lte"):
+        return any(_compare(v, target, op) for v in normalized)
+    raise ValueError(f"Unsupported operator '{cond.operator}'")
+
+
+def can_evaluate(rows: List[Any], ir: QueryIR) -> bool:
+    """
+    True if every row exposes every field the IR filters, sorts or projects on,
+    with values of the filter literals' types (see _comparable).
+    """
+    fields = [f.field for f in ir.filters] + list(ir.return_fields)
+    if ir.sort_field:
+        fields.append(ir.sort_field)
+    for row in rows:
+        if not isinstance(row, dict):
+            return False
+        if any(resolve_field(row, f) is MISSING for f in fields):
+            return False
+        if not all(_comparable(resolve_field(row, f.field), literal_value(f.value)) for f in ir.filters):
+            return False
+    return True
+
+
+def evaluate(rows: List[Dict[str, Any]], ir: QueryIR) -> List[Dict[str, Any]]:
+    """Apply the IR's filters, sort, projection and limit to a list of rows."""
+    result = [row for row in rows if all(match_filter(row, f) for f in ir.filters)]
+
+    if ir.sort_field:
+        def sort_key(row):
+            value = literal_value(resolve_field(row, ir.sort_field))
+            return (value is None, isinstance(value, str), value if value is not None else 0)
+        result.sort(key=sort_key, reverse=ir.sort_order.upper() == "DESC")
+
+    if ir.limit is not None:
+        result = result[:ir.limit]
+
+    if ir.return_fields:
+        result = [{f: resolve_field(row, f) for f in ir.return_fields} for row in result]
+
+    return result
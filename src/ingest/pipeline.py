@@ -0,0 +1,197 @@
+import argparse
+import threading
+import time
+from abc import ABC, abstractmethod
+from itertools import islice
+from queue import Queue
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from src.ingest.records import iter_records
+
+
+class Sink(ABC):
+    """
+    One target store of an ingestion run. open() prepares the store (drop /
+    create tables), write() receives each batch of records in order, close()
+    flushes. Batches are shared between sinks: copy before mutating.
+    """
+    name = "sink"
+
+    def __init__(self):
+        self.written = 0
+        self.failed: Optional[Exception] = None
+        self.busy_s = 0.0
+
+    def open(self):
+        pass
+
+    @abstractmethod
+    def write(self, batch: List[Dict[str, Any]]):
+        pass
+
+    def close(self):
+        pass
+
+
+def batched(records: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    it = iter(records)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
+class _Progress:
+    def __init__(self, sinks: List[Sink], interval: float):
+        self.sinks = sinks
+        self.interval = interval
+        self.read = 0
+        self.start_time = time.time()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def line(self) -> str:
+        elapsed = max(time.time() - self.start_time, 1e-9)
+        stores = " | ".join(f"{s.name} {s.written:,}" + (" ❌" if s.failed else "") for s in self.sinks)
+        return f"📦 {self.read:,} read ({self.read / elapsed:,.0f}/s) | {stores}"
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            print(self.line())
+
+    def start(self):
+        if self.interval > 0:
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+def _drain(sink: Sink, queue: Queue):
+    while True:
+        batch = queue.get()
+        if batch is None:
+            break
+        if sink.failed:
+            continue  # Keep consuming so the reader never blocks on a dead store
+        start_time = time.time()
+        try:
+            sink.write(batch)
+            sink.written += len(batch)
+        except Exception as e:
+            sink.failed = e
+            print(f"❌ {sink.name}: {e} (store skipped for the rest of the run)")
+        sink.busy_s += time.time() - start_time
+    try:
+        sink.close()
+    except Exception as e:
+        sink.failed = sink.failed or e
+        print(f"❌ {sink.name}: close failed: {e}")
+
+
+def ingest(records: Iterable[Dict[str, Any]], sinks: List[Sink], batch_size: int = 1000,
+           queue_size: int = 4, progress_interval: float = 5.0) -> Dict[str, Any]:
+    """
+    Fan records out to every sink concurrently: the reader cuts batches of
+    `batch_size` and hands each to one thread per sink through a bounded
+    queue (`queue_size` batches), so the slowest store applies backpressure
+    instead of the whole source piling up in memory. A failing store is
+    reported and skipped; the others continue.
+    """
+    active = []
+    for sink in sinks:
+        try:
+            sink.open()
+            active.append(sink)
+        except Exception as e:
+            sink.failed = e
+            print(f"❌ {sink.name}: {e}")
+
+    progress = _Progress(active, progress_interval)
+    queues = [Queue(maxsize=queue_size) for _ in active]
+    threads = [threading.Thread(target=_drain, args=(sink, queue), daemon=True) for sink, queue in zip(active, queues)]
+    for thread in threads:
+        thread.start()
+    progress.start()
+    try:
+        for batch in batched(records, batch_size):
+            progress.read += len(batch)
+            for queue in queues:
+                queue.put(batch)
+    except BaseException as e:
+        # Source unreadable: sinks must not commit a partial load as complete
+        for sink in active:
+            sink.failed = sink.failed or e
+        raise
+    finally:
+        for queue in queues:
+            queue.put(None)
+        for thread in threads:
+            thread.join()
+        progress.stop()
+
+    elapsed = time.time() - progress.start_time
+    print(progress.line())
+    stats = {"read": progress.read, "elapsed_s": elapsed, "stores": {}}
+    for sink in sinks:
+        stats["stores"][sink.name] = {
+            "written": sink.written,
+            "per_second": sink.written / sink.busy_s if sink.busy_s else 0.0,
+            "error": str(sink.failed) if sink.failed else None,
+        }
+        status = f"❌ {sink.failed}" if sink.failed else "✅"
+        print(f"{status} {sink.name}: {sink.written:,} records in {sink.busy_s:.1f}s busy")
+    return stats
+
+
+def build_sinks(stores: List[str], **options) -> List[Sink]:
+    """Sinks by store name; stores whose driver is missing are reported and left out."""
+    from src.ingest import sinks as store_sinks
+    factories = {
+        "mongodb": store_sinks.MongoSink,
+        "neo4j": store_sinks.Neo4jSink,
+        "redis": store_sinks.RedisSink,
+        "views": store_sinks.MaterializedViewSink,
+        "hbase": store_sinks.HBaseSink,
+        "rdf": store_sinks.RdfSink,
+    }
+    built = []
+    for store in stores:
+        factory = factories.get(store)
+        if factory is None:
+            raise ValueError(f"Unknown store '{store}' (expected one of {', '.join(factories)})")
+        try:
+            built.append(factory(**options))
+        except ImportError as e:
+            print(f"⚠️ {store}: {e}")
+    return built
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Stream a movie catalog into every configured store")
+    parser.add_argument("source", nargs="?", default="data/data.json", help="JSON array or JSONL file")
+    parser.add_argument("--stores", default="mongodb,neo4j,redis,hbase,rdf",
+                        help="Comma-separated target stores (add 'views' to rebuild the materialized aggregates)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Records per batch handed to each store")
+    parser.add_argument("--progress", type=float, default=5.0, help="Seconds between progress lines (0 = off)")
+    parser.add_argument("--rdf-store", default=None, help="RDF target (default: $RDF_STORE or data/movies.nt)")
+    args = parser.parse_args(argv)
+
+    options = {"batch_size": args.batch_size}
+    if args.rdf_store:
+        options["rdf_store"] = args.rdf_store
+    stores = [s.strip() for s in args.stores.split(",") if s.strip()]
+    sinks = build_sinks(stores, **options)
+    if "views" not in stores:
+        # The load replaces the catalog: aggregates of the previous one must not keep answering
+        from src.optimization.views import connect_views
+        views = connect_views()
+        if views is not None:
+            views.invalidate()
+            print("🧹 Materialized views dropped (rebuild them with --stores ...,views)")
+    return ingest(iter_records(args.source), sinks, batch_size=args.batch_size, progress_interval=args.progress)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import argparse
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+import rdflib
+from rdflib import RDF, XSD, Literal
+
+from src.connectors.rdf import EX, GraphSummary, open_graph, parse_store_uri, require_berkeleydb, summary_path
+from src.ingest.pipeline import Sink, ingest
+from src.ingest.records import iter_records
+
+Triple = Tuple[rdflib.term.Node, rdflib.term.Node, rdflib.term.Node]
+
+
+def slug(name: str) -> str:
+    """'Christopher Nolan' -> 'christopher-nolan' (IRI-safe, stable across loads)."""
+    return re.sub(r"[^a-z0-9]+", "-", str(name).lower()).strip("-") or "unknown"
+
+
+def movie_triples(record: Dict[str, Any]) -> List[Triple]:
+    """
+    Triples for one data.json movie:
+      ex:movie/1 a ex:Movie; ex:title; ex:year; ex:rating; ex:genre ex:genre/sci-fi;
+                 ex:director ex:person/christopher-nolan; ex:actor ex:person/...
+    People and genres carry rdf:type and ex:name, repeated per movie (the
+    store deduplicates identical triples).
+    """
+    movie = EX[f"movie/{record['id']}"]
+    triples: List[Triple] = [(movie, RDF.type, EX.Movie)]
+    if record.get("title") is not None:
+        triples.append((movie, EX.title, Literal(record["title"])))
+    if record.get("year") is not None:
+        triples.append((movie, EX.year, Literal(int(record["year"]), datatype=XSD.integer)))
+    if record.get("rating") is not None:
+        triples.append((movie, EX.rating, Literal(float(record["rating"]), datatype=XSD.double)))
+
+    genres = record.get("genre") or []
+    for genre in [genres] if isinstance(genres, str) else genres:
+        node = EX[f"genre/{slug(genre)}"]
+        triples += [(movie, EX.genre, node), (node, RDF.type, EX.Genre), (node, EX.name, Literal(genre))]
+
+    people = [(record["director"], EX.director, EX.Director)] if record.get("director") else []
+    people += [(actor, EX.actor, EX.Actor) for actor in record.get("actors") or []]
+    for name, predicate, rdf_type in people:
+        node = EX[f"person/{slug(name)}"]
+        triples += [(movie, predicate, node), (node, RDF.type, rdf_type), (node, EX.name, Literal(name))]
+    return triples
+
+
+class RdfSink(Sink):
+    """
+    Bulk-add movie triples. BerkeleyDB stores get one addN per batch and an
+    updated summary sidecar; snapshot files are written as N-Triples to a
+    temporary file, renamed on close so readers never see a partial snapshot.
+    """
+    name = "rdf"
+
+    def __init__(self, rdf_store: Optional[str] = None, **options):
+        super().__init__()
+        self.uri = rdf_store or os.getenv("RDF_STORE", "data/movies.nt")
+        self.kind, self.path = parse_store_uri(self.uri)
+        if self.kind == "memory":
+            raise ValueError("Nothing to load into 'memory': give berkeleydb://<dir> or a snapshot path")
+        if self.kind == "berkeleydb":
+            require_berkeleydb()  # Fail before the load starts, not at open()
+        self.triples = 0
+        self._graph = self._file = self._summary = None
+
+    def open(self):
+        if self.kind == "berkeleydb":
+            os.makedirs(self.path, exist_ok=True)
+            self._graph = open_graph(self.uri, create=True)
+            # The sidecar summary is kept current as triples go in
+            sidecar = summary_path(self.uri)
+            self._summary = GraphSummary.load(sidecar) if os.path.exists(sidecar) else GraphSummary.scan(self._graph)
+            self._summary.attach(self._graph)
+        else:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path + ".tmp", "w", encoding="utf-8")
+
+    def write(self, batch: List[Dict[str, Any]]):
+        triples = [t for record in batch for t in movie_triples(record)]
+        if self._graph is not None:
+            self._graph.addN((s, p, o, self._graph) for s, p, o in triples)
+        else:
+            self._file.writelines(f"{s.n3()} {p.n3()} {o.n3()} .\n" for s, p, o in triples)
+        self.triples += len(triples)
+
+    def close(self):
+        if self._graph is not None:
+            self._summary.save(summary_path(self.uri))
+            self._graph.close()
+        elif self._file is not None:
+            self._file.close()
+            if self.failed:
+                os.remove(self._file.name)
+            else:
+                os.replace(self._file.name, self.path)
+
+
+def load(source: str, uri: str, batch_size: int = 1000) -> int:
+    """Stream `source` (JSON array or JSONL) into the RDF store at `uri`. Returns the number of triples written."""
+    sink = RdfSink(uri)
+    ingest(iter_records(source), [sink], batch_size=batch_size, progress_interval=0)
+    if sink.failed:
+        raise sink.failed
+    print(f"✅ RDF : {sink.triples:,} triples loaded into {uri}")
+    return sink.triples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-load the movie catalog into a persistent RDF store")
+    parser.add_argument("source", nargs="?", default="data/data.json", help="JSON array or JSONL file")
+    parser.add_argument("--store", default=os.getenv("RDF_STORE", "data/movies.nt"),
+                        help="berkeleydb://<dir> or an N-Triples snapshot path (default: $RDF_STORE)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Records per batch")
+    args = parser.parse_args()
+    load(args.source, args.store, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
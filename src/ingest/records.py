@@ -0,0 +1,46 @@
+import json
+from typing import Any, Dict, Iterator
+
+CHUNK_SIZE = 1 << 16
+
+
+def _iter_array(f, chunk_size: int) -> Iterator[Any]:
+    """Decode the elements of a top-level JSON array one at a time."""
+    decoder = json.JSONDecoder()
+    buffer = f.read(chunk_size).lstrip()[1:]  # Past the opening '['
+    eof = False
+    while True:
+        buffer = buffer.lstrip().lstrip(",").lstrip()
+        if buffer.startswith("]"):
+            return
+        try:
+            value, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer += chunk
+            continue
+        yield value
+        buffer = buffer[end:]
+
+
+def iter_records(path: str, chunk_size: int = CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+    """
+    Stream records from a JSON array file (data/data.json) or a JSONL file
+    (one object per line) without loading the whole file.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        head = f.read(1)
+        while head and head.isspace():
+            head = f.read(1)
+        if head == "[":
+            f.seek(0)
+            yield from _iter_array(f, chunk_size)
+            return
+        f.seek(0)
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
@@ -0,0 +1,182 @@
+import os
+from typing import Any, Dict, List
+
+from src.connectors.hbase_index import DEFAULT_INDEXES, apply_mutations, ensure_index_tables, index_mutations
+from src.ingest.pipeline import Sink
+from src.ingest.rdf_loader import RdfSink
+from src.optimization.views import MaterializedViews, configured_views
+
+# Loads replace the previous catalog (the same reset lecture.py always did)
+
+class MongoSink(Sink):
+    """Unordered insert_many per batch: the server keeps inserting past a bad document."""
+    name = "mongodb"
+
+    def __init__(self, uri: str = None, database: str = "movie_db", collection: str = "movies", **options):
+        super().__init__()
+        from pymongo import MongoClient
+        self.client = MongoClient(uri or os.getenv("MONGO_URI", "mongodb://localhost:27017/"),
+                                  serverSelectionTimeoutMS=2000)
+        self.collection = self.client[database][collection]
+
+    def open(self):
+        self.collection.drop()
+
+    def write(self, batch: List[Dict[str, Any]]):
+        # insert_many adds _id to the documents it is given: insert copies
+        self.collection.insert_many([dict(record) for record in batch], ordered=False)
+
+    def close(self):
+        self.client.close()
+
+
+NEO4J_BATCH = """
+UNWIND $batch AS m
+MERGE (mov:Movie {id: m.id})
+SET mov.title = m.title, mov.year = m.year, mov.genre = m.genre, mov.rating = m.rating
+FOREACH (name IN CASE WHEN m.director IS NULL THEN [] ELSE [m.director] END |
+    MERGE (dir:Director {name: name})
+    MERGE (dir)-[:DIRECTED]->(mov))
+FOREACH (name IN coalesce(m.actors, []) |
+    MERGE (act:Actor {name: name})
+    MERGE (act)-[:ACTED_IN]->(mov))
+"""
+
+
+class Neo4jSink(Sink):
+    """One UNWIND $batch write transaction per batch; MERGE keys are backed by uniqueness constraints."""
+    name = "neo4j"
+
+    def __init__(self, uri: str = None, user: str = None, password: str = None, **options):
+        super().__init__()
+        from neo4j import GraphDatabase
+        self.driver = GraphDatabase.driver(uri or os.getenv("NEO4J_URI", "bolt://localhost:7687"),
+                                           auth=(user or os.getenv("NEO4J_USER", "neo4j"),
+                                                 password or os.getenv("NEO4J_PASSWORD", "password123")))
+
+    def open(self):
+        self.driver.verify_connectivity()
+        with self.driver.session() as session:
+            # Batched delete: one huge DETACH DELETE transaction would exhaust the heap.
+            # CALL { WITH n ... } runs on Neo4j 4.4+ (5.23+ also accepts the CALL (n) form)
+            session.run("MATCH (n) CALL { WITH n DETACH DELETE n } IN TRANSACTIONS OF 10000 ROWS").consume()
+            for label, key in (("Movie", "id"), ("Director", "name"), ("Actor", "name")):
+                session.run(f"CREATE CONSTRAINT {label.lower()}_{key} IF NOT EXISTS "
+                            f"FOR (n:{label}) REQUIRE n.{key} IS UNIQUE").consume()
+
+    def write(self, batch: List[Dict[str, Any]]):
+        with self.driver.session() as session:
+            session.execute_write(lambda tx: tx.run(NEO4J_BATCH, batch=batch).consume())
+
+    def close(self):
+        self.driver.close()
+
+
+class RedisSink(Sink):
+    """View counters through one non-transactional pipeline per batch."""
+    name = "redis"
+
+    def __init__(self, uri: str = None, **options):
+        super().__init__()
+        import redis
+        self.client = redis.Redis.from_url(uri or os.getenv("REDIS_URI", "redis://localhost:6379"))
+
+    def open(self):
+        self.client.ping()
+
+    def write(self, batch: List[Dict[str, Any]]):
+        pipe = self.client.pipeline(transaction=False)
+        for record in batch:
+            pipe.set(f"movie:{record['id']}:views", 0)
+        pipe.execute()
+
+    def close(self):
+        self.client.close()
+
+
+class MaterializedViewSink(Sink):
+    """
+    Rebuilds the Redis aggregate views (src/optimization/views.py) from the
+    ingested records; they are published only once the load completes.
+    """
+    name = "views"
+
+    def __init__(self, uri: str = None, views=None, **options):
+        super().__init__()
+        import redis
+        client = redis.Redis.from_url(uri or os.getenv("REDIS_URI", "redis://localhost:6379"), decode_responses=True)
+        self.views = MaterializedViews(client, configured_views() if views is None else views)
+
+    def open(self):
+        self.views.client.ping()
+        self.views.reset()
+
+    def write(self, batch: List[Dict[str, Any]]):
+        self.views.apply(batch)
+
+    def close(self):
+        if not self.failed:
+            self.views.mark_ready()
+        self.views.client.close()
+
+
+class HBaseSink(Sink):
+    """
+    Rows through a happybase batch flushed every `batch_size` mutations, with
+    the secondary index tables (src/connectors/hbase_index.py) filled in the
+    same pass.
+    """
+    name = "hbase"
+    families = {"info": dict(), "credits": dict()}
+
+    def __init__(self, host: str = None, port: int = None, table: str = "movies", batch_size: int = 1000,
+                 indexes=DEFAULT_INDEXES, **options):
+        super().__init__()
+        import happybase
+        self.connection = happybase.Connection(host or os.getenv("HBASE_HOST", "localhost"),
+                                               port=int(port or os.getenv("HBASE_PORT", 9090)), autoconnect=False)
+        self.table_name = table
+        self.batch_size = batch_size
+        self.indexes = [ix for ix in indexes if ix.table == table]
+
+    def _drop(self, name: str):
+        if name.encode("utf-8") in self.connection.tables():
+            self.connection.delete_table(name, disable=True)
+
+    def open(self):
+        self.connection.open()
+        for name in [self.table_name] + [ix.name for ix in self.indexes]:
+            self._drop(name)
+        self.connection.create_table(self.table_name, self.families)
+        ensure_index_tables(self.connection, self.indexes)
+        self.table = self.connection.table(self.table_name)
+        self.batches = {self.table_name: self.table.batch(batch_size=self.batch_size)}
+        for index in self.indexes:
+            self.batches[index.name] = self.connection.table(index.name).batch(batch_size=self.batch_size)
+
+    @staticmethod
+    def row(record: Dict[str, Any]) -> Dict[bytes, bytes]:
+        genre = record.get("genre")
+        cells = {
+            "info:title": record.get("title"),
+            "info:year": record.get("year"),
+            "info:genre": ",".join(genre) if isinstance(genre, list) else genre,
+            "info:rating": record.get("rating"),
+            "credits:director": record.get("director"),
+            "credits:actors": ",".join(record.get("actors") or []),
+        }
+        return {k.encode("utf-8"): str(v).encode("utf-8") for k, v in cells.items() if v is not None}
+
+    def write(self, batch: List[Dict[str, Any]]):
+        for record in batch:
+            row_key, data = str(record["id"]).encode("utf-8"), self.row(record)
+            self.batches[self.table_name].put(row_key, data)
+            apply_mutations(self.connection, index_mutations(self.indexes, self.table_name, row_key, data), self.batches)
+
+    def close(self):
+        for batch in getattr(self, "batches", {}).values():
+            batch.send()
+        self.connection.close()
+
+
+__all__ = ["MongoSink", "Neo4jSink", "RedisSink", "MaterializedViewSink", "HBaseSink", "RdfSink"]
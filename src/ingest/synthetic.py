@@ -0,0 +1,236 @@
+import argparse
+import json
+import os
+import random
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+# genre: (share of the catalog, mean rating)
+GENRES = {
+    "Drama": (0.22, 6.9), "Comedy": (0.16, 6.1), "Action": (0.13, 6.2), "Crime": (0.09, 7.0),
+    "Thriller": (0.08, 6.4), "Horror": (0.06, 5.6), "Romance": (0.06, 6.3), "Sci-Fi": (0.05, 6.5),
+    "Adventure": (0.04, 6.6), "Animation": (0.03, 7.1), "Biography": (0.03, 7.2), "Mystery": (0.02, 6.7),
+    "Fantasy": (0.01, 6.4), "War": (0.01, 7.1), "Music": (0.005, 6.8), "Western": (0.005, 6.9),
+}
+GENRE_NAMES = list(GENRES)
+GENRE_SHARE = np.array([share for share, _ in GENRES.values()]) / sum(share for share, _ in GENRES.values())
+GENRE_MEAN = np.array([mean for _, mean in GENRES.values()])
+
+FIRST = ["Ava", "Liam", "Maya", "Noah", "Zoe", "Ethan", "Lena", "Omar", "Iris", "Hugo", "Nora", "Felix",
+         "Clara", "Jonas", "Elena", "Marco", "Sofia", "Theo", "Ines", "Victor", "Julia", "Rafael", "Amara",
+         "Oscar", "Yuki", "Diego", "Hana", "Lucas", "Mila", "Samuel", "Aisha", "Pablo"]
+LAST = ["Moreau", "Kowalski", "Tanaka", "Okafor", "Lindqvist", "Romero", "Novak", "Haddad", "Fischer",
+        "Costa", "Ivanova", "Brennan", "Duarte", "Sato", "Mendes", "Kaplan", "Larsen", "Ferrari", "Nakamura",
+        "Dubois", "Castillo", "Weber", "Oyelaran", "Petrov", "Shah", "Quinn", "Varga", "Almeida",
+        "Holm", "Rossi", "Keller", "Abara"]
+ADJECTIVES = ["Silent", "Broken", "Last", "Crimson", "Hidden", "Golden", "Endless", "Frozen", "Burning",
+              "Distant", "Hollow", "Savage", "Quiet", "Electric", "Lost", "Iron", "Midnight", "Paper",
+              "Wild", "Fading", "Glass", "Secret", "Restless", "Northern", "Velvet", "Shattered", "Bitter",
+              "Silver", "Dark", "Open", "Second", "Lonely"]
+NOUNS = ["Harbor", "Empire", "Garden", "Signal", "River", "Promise", "Horizon", "Machine", "Kingdom",
+         "Witness", "Summer", "Frontier", "Mirror", "Station", "Letter", "Storm", "Country", "Road", "Heart",
+         "Archive", "Circus", "Winter", "Island", "Protocol", "Dynasty", "Shadow", "Orchard", "Voyage",
+         "Verdict", "Tide", "Theory", "City"]
+
+FIRST_YEAR, LAST_YEAR = 1920, 2024
+CAST_SIZES, CAST_SHARE = np.array([2, 3, 4]), np.array([0.6, 0.3, 0.1])
+STAR_BONUS = 0.5      # Rating lift for a top-billed lead, fading with the lead's popularity rank
+RATING_NOISE = 0.7
+CHUNK_SIZE = 10_000   # Part of the random stream: changing it changes the catalog a seed produces
+
+
+def person_name(index: int) -> str:
+    """Distinct, stable name for person `index` ('Ava Moreau', ..., 'Ava Moreau 2', ...)."""
+    first, rest = index % len(FIRST), index // len(FIRST)
+    last, generation = rest % len(LAST), rest // len(LAST)
+    return f"{FIRST[first]} {LAST[last]}" + (f" {generation + 1}" if generation else "")
+
+
+def title(movie_id: int) -> str:
+    """Distinct, stable title for `movie_id` ('The Silent Harbor', ..., 'The Silent Harbor 2')."""
+    index = movie_id - 1
+    adjective, rest = index % len(ADJECTIVES), index // len(ADJECTIVES)
+    noun, sequel = rest % len(NOUNS), rest // len(NOUNS)
+    return f"The {ADJECTIVES[adjective]} {NOUNS[noun]}" + (f" {sequel + 1}" if sequel else "")
+
+
+def zipf_cdf(n: int, skew: float) -> np.ndarray:
+    """Cumulative Zipf(skew) distribution over ranks 0..n-1 (rank 0 most popular)."""
+    cdf = np.cumsum(1.0 / np.arange(1, n + 1) ** skew)
+    return cdf / cdf[-1]
+
+
+class SyntheticCatalog:
+    """
+    Seeded movie catalog in the data/data.json schema, generated in vectorized
+    chunks so 10^7 records stream without the catalog in memory. Actor and director
+    popularity are Zipfian, genres follow GENRES, and ratings correlate with
+    the genre, a per-director quality and the lead actor's popularity.
+
+    Iterating the catalog also tallies what workload() needs to state the
+    expected answers, so the workload matches exactly the records produced.
+    """
+
+    def __init__(self, movies: int, seed: int = 42, actors: Optional[int] = None, directors: Optional[int] = None,
+                 actor_skew: float = 0.8, director_skew: float = 0.6,
+                 sample_size: int = 100):
+        self.movies = movies
+        self.seed = seed
+        self.actors = actors or max(50, movies // 4)
+        self.directors = directors or max(20, movies // 10)
+        self.sample_size = sample_size
+        self._actor_cdf = zipf_cdf(self.actors, actor_skew)
+        self._director_cdf = zipf_cdf(self.directors, director_skew)
+        self._reset()
+
+    def _reset(self):
+        self.generated = 0
+        self._genre_counts = np.zeros(len(GENRES), dtype=np.int64)
+        self._genre_ratings = np.zeros(len(GENRES))
+        self._director_counts = np.zeros(self.directors, dtype=np.int64)
+        self._actor_counts = np.zeros(self.actors, dtype=np.int64)
+        self._year_counts = np.zeros(LAST_YEAR - FIRST_YEAR + 1, dtype=np.int64)
+        self._sample: List[Dict[str, Any]] = []
+
+    def _zipf(self, rng: np.random.Generator, cdf: np.ndarray, shape) -> np.ndarray:
+        return np.minimum(np.searchsorted(cdf, rng.random(shape), side="right"), len(cdf) - 1)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        self._reset()
+        rng = np.random.default_rng(self.seed)
+        sampler = random.Random(self.seed)  # Separate stream: sampling never changes the data
+        director_quality = rng.normal(0.0, 0.6, self.directors)
+        star_scale = np.log1p(self.actors)
+
+        for start in range(0, self.movies, CHUNK_SIZE):
+            size = min(CHUNK_SIZE, self.movies - start)
+            genres = rng.choice(len(GENRES), size=size, p=GENRE_SHARE)
+            directors = self._zipf(rng, self._director_cdf, size)
+            cast = self._zipf(rng, self._actor_cdf, (size, CAST_SIZES.max()))
+            cast_sizes = rng.choice(CAST_SIZES, size=size, p=CAST_SHARE)
+            years = np.minimum(FIRST_YEAR + (rng.beta(4.0, 1.5, size) * (LAST_YEAR - FIRST_YEAR + 1)).astype(int),
+                               LAST_YEAR)
+            ratings = (GENRE_MEAN[genres] + director_quality[directors]
+                       + STAR_BONUS * (1.0 - np.log1p(cast[:, 0]) / star_scale)
+                       + rng.normal(0.0, RATING_NOISE, size))
+            ratings = np.clip(np.round(ratings, 1), 1.0, 9.9)
+
+            self._genre_counts += np.bincount(genres, minlength=len(GENRES))
+            self._genre_ratings += np.bincount(genres, weights=ratings, minlength=len(GENRES))
+            self._director_counts += np.bincount(directors, minlength=self.directors)
+            self._year_counts += np.bincount(years - FIRST_YEAR, minlength=len(self._year_counts))
+
+            billed = []
+            for i in range(size):
+                movie_id = start + i + 1
+                actors = list(dict.fromkeys(cast[i, :cast_sizes[i]].tolist()))  # A star is billed once
+                billed += actors
+                record = {
+                    "id": movie_id,
+                    "title": title(movie_id),
+                    "year": int(years[i]),
+                    "genre": GENRE_NAMES[genres[i]],
+                    "director": person_name(self.actors + int(directors[i])),
+                    "actors": [person_name(a) for a in actors],
+                    "rating": float(ratings[i]),
+                }
+                # Reservoir sample of movies for the point-lookup questions
+                if len(self._sample) < self.sample_size:
+                    self._sample.append(dict(record))
+                else:
+                    slot = sampler.randrange(movie_id)
+                    if slot < self.sample_size:
+                        self._sample[slot] = dict(record)
+                self.generated += 1
+                yield record
+            self._actor_counts += np.bincount(billed, minlength=self.actors)
+
+    def workload(self, size: int = 200) -> List[Dict[str, Any]]:
+        """
+        NLQ questions with their expected answers over the generated catalog:
+        half point lookups on sampled movies, half aggregates (genre counts and
+        average ratings, movies per director, releases per year).
+        """
+        if self.generated != self.movies:
+            raise ValueError("Iterate the whole catalog before building its workload")
+        rng = random.Random(self.seed)
+
+        lookups = []
+        for movie in self._sample:
+            lookups += [
+                {"nlq": f"Who directed {movie['title']}?", "intent": "FIND", "expected": movie["director"]},
+                {"nlq": f"Who acted in {movie['title']}?", "intent": "TRAVERSAL", "expected": sorted(movie["actors"])},
+                {"nlq": f"What year was {movie['title']} released?", "intent": "FIND", "expected": movie["year"]},
+            ]
+
+        aggregates = []
+        for g, genre in enumerate(GENRE_NAMES):
+            count = int(self._genre_counts[g])
+            if count:
+                aggregates += [
+                    {"nlq": f"How many {genre} movies are there?", "intent": "AGGREGATE", "expected": count},
+                    {"nlq": f"What is the average rating of {genre} movies?", "intent": "AGGREGATE",
+                     "expected": round(float(self._genre_ratings[g]) / count, 2)},
+                ]
+        active = np.flatnonzero(self._director_counts).tolist()
+        busiest = np.argsort(-self._director_counts, kind="stable")[:10].tolist()
+        for d in dict.fromkeys(busiest + rng.sample(active, min(20, len(active)))):
+            aggregates.append({"nlq": f"How many movies did {person_name(self.actors + d)} direct?",
+                               "intent": "AGGREGATE", "expected": int(self._director_counts[d])})
+        for y in np.flatnonzero(self._year_counts).tolist():
+            aggregates.append({"nlq": f"How many movies were released in {FIRST_YEAR + y}?",
+                               "intent": "AGGREGATE", "expected": int(self._year_counts[y])})
+        top = np.sort(self._actor_counts)[-2:]
+        if len(top) == 1 or top[-1] > top[-2]:  # Only ask when the answer is unambiguous
+            aggregates.append({"nlq": "Which actor appears in the most movies?", "intent": "AGGREGATE",
+                               "expected": person_name(int(np.argmax(self._actor_counts)))})
+
+        rng.shuffle(lookups)
+        rng.shuffle(aggregates)
+        half = min(size // 2, len(lookups))
+        queries = lookups[:half] + aggregates[:size - half]
+        rng.shuffle(queries)
+        return [{"id": f"q{i + 1:04d}", **q} for i, q in enumerate(queries)]
+
+
+def write_jsonl(records, path: str, progress_every: int = 100_000) -> int:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            count += 1
+            if progress_every and count % progress_every == 0:
+                print(f"📦 {count:,} movies written")
+    return count
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Generate a seeded synthetic movie catalog and NLQ workload")
+    parser.add_argument("--movies", type=int, default=10_000, help="Number of movies (10^4 - 10^7)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--actors", type=int, default=None, help="Actor pool size (default: movies / 4)")
+    parser.add_argument("--directors", type=int, default=None, help="Director pool size (default: movies / 10)")
+    parser.add_argument("--out", default="data/synthetic/movies.jsonl", help="JSONL catalog path")
+    parser.add_argument("--workload", default="data/synthetic/workload.json", help="Workload path ('' to skip)")
+    parser.add_argument("--queries", type=int, default=200, help="Workload size")
+    args = parser.parse_args(argv)
+
+    catalog = SyntheticCatalog(args.movies, seed=args.seed, actors=args.actors, directors=args.directors)
+    count = write_jsonl(catalog, args.out)
+    print(f"✅ {count:,} movies ({catalog.actors:,} actors, {catalog.directors:,} directors) -> {args.out}")
+    if args.workload:
+        queries = catalog.workload(args.queries)
+        if os.path.dirname(args.workload):
+            os.makedirs(os.path.dirname(args.workload), exist_ok=True)
+        with open(args.workload, "w", encoding="utf-8") as f:
+            json.dump(queries, f, indent=2, ensure_ascii=False)
+        print(f"✅ {len(queries)} workload questions with expected answers -> {args.workload}")
+    return catalog
+
+
+if __name__ == "__main__":
+    main()
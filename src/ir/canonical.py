@@ -0,0 +1,132 @@
+import hashlib
+import json
+from typing import Any, Dict, Optional
+
+from pydantic import ValidationError
+
+from src.ir.models import QueryIR, FilterCondition, AggregationStep
+
+# Operator spellings the LLM produces, mapped onto the IR vocabulary.
+OPERATOR_ALIASES = {
+    "eq": "eq", "=": "eq", "==": "eq", "$eq": "eq", "equals": "eq", "is": "eq",
+    "ne": "ne", "!=": "ne", "<>": "ne", "$ne": "ne", "neq": "ne", "not_equals": "ne",
+    "gt": "gt", ">": "gt", "$gt": "gt", "greater_than": "gt",
+    "gte": "gte", ">=": "gte", "$gte": "gte", "ge": "gte",
+    "lt": "lt", "<": "lt", "$lt": "lt", "less_than": "lt",
+    "lte": "lte", "<=": "lte", "$lte": "lte", "le": "lte",
+    "contains": "contains", "$regex": "contains", "regex": "contains", "like": "contains", "=~": "contains",
+    "in": "in", "$in": "in",
+}
+
+
+def normalize_operator(op: str) -> str:
+    op = str(op).strip().lower()
+    return OPERATOR_ALIASES.get(op, op)
+
+
+def normalize_value(value: Any) -> Any:
+    """
+    Normalize a filter value so that paraphrases compare equal:
+    strings are trimmed, whitespace-collapsed and lowercased, numeric strings
+    become numbers, integral floats become ints and lists are sorted.
+    """
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float)):
+        return int(value) if float(value).is_integer() else float(value)
+    if isinstance(value, str):
+        text = " ".join(value.split()).lower()
+        try:
+            return normalize_value(float(text))
+        except ValueError:
+            return text
+    if isinstance(value, (list, tuple, set)):
+        items = [normalize_value(v) for v in value]
+        return sorted(items, key=lambda v: json.dumps(v, sort_keys=True, default=str))
+    if isinstance(value, dict):
+        return {str(k).lower(): normalize_value(v) for k, v in value.items()}
+    return value
+
+
+def literal_value(value: Any) -> Any:
+    """
+    Normalize a filter value for the fingerprint without changing what it
+    matches: numbers unify (2000.0 == 2000) and lists are sorted, but strings
+    keep their case and spacing and are never turned into numbers.
+    """
+    if isinstance(value, bool) or value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)):
+        return int(value) if float(value).is_integer() else float(value)
+    if isinstance(value, (list, tuple, set)):
+        items = [literal_value(v) for v in value]
+        return sorted(items, key=lambda v: json.dumps(v, sort_keys=True, default=str))
+    if isinstance(value, dict):
+        return {str(k): literal_value(v) for k, v in value.items()}
+    return value
+
+
+def normalize_query(query: str) -> str:
+    """Generated query text for the fingerprint: JSON re-serialized with sorted keys, other text stripped."""
+    text = query.strip()
+    try:
+        return json.dumps(json.loads(text), sort_keys=True)
+    except ValueError:
+        return text
+
+
+def parse_ir(ir_data: Dict[str, Any]) -> Optional[QueryIR]:
+    """Parse the LLM's raw IR dict into a QueryIR, or None if it does not validate."""
+    try:
+        return QueryIR.model_validate(ir_data)
+    except ValidationError:
+        return None
+
+
+def canonicalize_ir(ir: QueryIR) -> QueryIR:
+    """Return a canonical copy of the IR (sorted filters, normalized operators and values)."""
+    filters = {}
+    for f in ir.filters:
+        cond = FilterCondition(
+            field=f.field.strip().lower(),
+            operator=normalize_operator(f.operator),
+            value=literal_value(f.value),
+        )
+        if cond.operator == "in" and not isinstance(cond.value, list):
+            cond = FilterCondition(field=cond.field, operator="eq", value=cond.value)
+        filters[json.dumps(cond.model_dump(), sort_keys=True, default=str)] = cond
+
+    aggregations = {}
+    for a in ir.aggregations:
+        step = AggregationStep(
+            type=a.type.strip().lower(),
+            field=a.field.strip().lower() if a.field else None,
+            group_by=a.group_by.strip().lower() if a.group_by else None,
+        )
+        aggregations[json.dumps(step.model_dump(), sort_keys=True)] = step
+
+    return QueryIR(
+        intent=ir.intent.strip().upper(),
+        target_collection=ir.target_collection.strip().lower(),
+        filters=[filters[k] for k in sorted(filters)],
+        return_fields=sorted({f.strip().lower() for f in ir.return_fields}),
+        aggregations=[aggregations[k] for k in sorted(aggregations)],
+        limit=ir.limit,
+        sort_field=ir.sort_field.strip().lower() if ir.sort_field else None,
+        sort_order=(ir.sort_order or "ASC").strip().upper(),
+        join_keys=sorted({k.strip().lower() for k in ir.join_keys}),
+        is_safe=ir.is_safe,
+    )
+
+
+def ir_fingerprint(ir: QueryIR, db_type: str, query: Optional[str] = None) -> str:
+    """
+    Stable hash of the canonical IR for a given database, plus the generated
+    query when given: two queries only share a key if they would run the same.
+    `is_safe` is excluded: it is a policy flag, not part of the query's meaning.
+    """
+    canonical = canonicalize_ir(ir).model_dump(exclude={"is_safe"})
+    raw = f"{db_type}:{json.dumps(canonical, sort_keys=True, default=str)}"
+    if query is not None:
+        raw += f":{normalize_query(query)}"
+    return hashlib.sha256(raw.encode()).hexdigest()
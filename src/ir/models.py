@@ -36,5 +36,29 @@ class QueryIR(BaseModel):
     sort_field: Optional[str] = None
     sort_order: str = "ASC"  # "ASC" or "DESC"
     
+    # Federation: fields identifying an entity across stores (e.g. "id", "title")
+    join_keys: List[str] = []
+    
     # Safety
     is_safe: bool = True
+
+
+class SubQueryIR(QueryIR):
+    """
+    One store's share of a federated query. Filters are pushed down into
+    `query`; dependent subqueries restrict themselves to the driving
+    subquery's join key values via the `$keys` placeholder, or for Redis
+    via `key_template` (e.g. "movie:{id}:views").
+    """
+    db_type: str = Field(..., description="Store answering this subquery")
+    query: str = ""
+    key_template: Optional[str] = None
+    value_field: Optional[str] = None
+
+
+class FederatedQueryIR(BaseModel):
+    """
+    A cross-store plan: the first subquery drives, the others are
+    hash-joined to it on their first join key.
+    """
+    subqueries: List[SubQueryIR]
@@ -0,0 +1,86 @@
+from src.ir.models import QueryIR, FilterCondition
+from src.ir.canonical import canonicalize_ir
+
+# Intents whose payload is a plain row set that can be re-filtered locally.
+ROW_INTENTS = {"FIND", "SCAN"}
+
+
+def _all(values, predicate) -> bool:
+    try:
+        return all(predicate(v) for v in values)
+    except TypeError:
+        return False
+
+
+def filter_implies(narrow: FilterCondition, broad: FilterCondition) -> bool:
+    """
+    True if every row satisfying `narrow` also satisfies `broad`.
+    Both conditions must already be canonical (see canonicalize_ir).
+    """
+    if narrow.field != broad.field:
+        return False
+
+    n_op, n_val = narrow.operator, narrow.value
+    b_op, b_val = broad.operator, broad.value
+    # Express the narrow condition as the finite set of values it admits, when it has one
+    admitted = [n_val] if n_op == "eq" else n_val if n_op == "in" and isinstance(n_val, list) else None
+
+    try:
+        if b_op == "eq":
+            return admitted is not None and admitted == [b_val]
+        if b_op == "in":
+            return admitted is not None and isinstance(b_val, list) and all(v in b_val for v in admitted)
+        if b_op == "ne":
+            if n_op == "ne":
+                return n_val == b_val
+            return admitted is not None and b_val not in admitted
+        if b_op == "contains":
+            if n_op == "contains":
+                return str(b_val) in str(n_val)
+            return admitted is not None and all(str(b_val) in str(v) for v in admitted)
+        if b_op in ("gt", "gte"):
+            if n_op == "gt":
+                return n_val >= b_val
+            if n_op == "gte":
+                return n_val > b_val if b_op == "gt" else n_val >= b_val
+            if admitted is not None:
+                return _all(admitted, (lambda v: v > b_val) if b_op == "gt" else (lambda v: v >= b_val))
+            return False
+        if b_op in ("lt", "lte"):
+            if n_op == "lt":
+                return n_val <= b_val
+            if n_op == "lte":
+                return n_val < b_val if b_op == "lt" else n_val <= b_val
+            if admitted is not None:
+                return _all(admitted, (lambda v: v < b_val) if b_op == "lt" else (lambda v: v <= b_val))
+            return False
+    except TypeError:
+        # Incomparable types (e.g. string vs number): no implication
+        return False
+    return False
+
+
+def subsumes(cached: QueryIR, query: QueryIR) -> bool:
+    """
+    True if the rows of `cached` are a superset of the rows `query` asks for,
+    so `query` can be answered by filtering the cached payload in-process.
+    Projection, sort and limit of `query` are evaluated locally afterwards;
+    completeness of the cached payload is checked by the caller.
+    """
+    c, q = canonicalize_ir(cached), canonicalize_ir(query)
+    if c.intent not in ROW_INTENTS or q.intent not in ROW_INTENTS:
+        return False
+    if c.target_collection != q.target_collection:
+        return False
+    if c.aggregations or q.aggregations or c.limit is not None:
+        return False
+
+    # Every field the new query touches must survive the cached projection
+    if c.return_fields:
+        needed = {f.field for f in q.filters} | set(q.return_fields)
+        if q.sort_field:
+            needed.add(q.sort_field)
+        if not q.return_fields or not needed.issubset(c.return_fields):
+            return False
+
+    return all(any(filter_implies(nf, cf) for nf in q.filters) for cf in c.filters)
@@ -15,6 +15,12 @@ from src.connectors.hbase import HBaseConnector
 from src.llm.provider import LLMProvider
 from src.rag.store import SimpleRAGStore
 from src.pipeline.smart import SmartPipeline
+from src.pipeline.federated import FederatedPipeline
+from src.pipeline.router import DatabaseRouter
+from src.optimization.cost_guard import QueryCostGuard
+from src.optimization.rewriter import TextMatchRewriter
+from src.optimization.workload import WorkloadLog
+from src.optimization.views import connect_views
 from src.validation.policy import SafetyException
 
 # --- CONFIG ---
@@ -42,31 +48,84 @@ def get_pipeline(db_type: str):
     if db_type == "mongodb": connector = MongoConnector()
     elif db_type == "redis": connector = RedisConnector()
     elif db_type == "neo4j": connector = Neo4jConnector()
-    elif db_type == "rdf": connector = RdfConnector("memory")
+    elif db_type == "rdf": connector = RdfConnector()
     elif db_type == "hbase": connector = HBaseConnector()
     else: return None
     
     llm = LLMProvider()
     rag = SimpleRAGStore()
-    return SmartPipeline(connector, llm, rag)
+    return SmartPipeline(connector, llm, rag, workload_log=get_workload_log(), views=get_views())
+
+@st.cache_resource
+def get_workload_log():
+    """Executed-query log shared by all pipelines (input of `setup_indexes.py --advise`)."""
+    return WorkloadLog()
+
+@st.cache_resource
+def get_views():
+    """Redis materialized aggregates shared by all pipelines (MATERIALIZED_VIEWS=0 disables)."""
+    if os.getenv("MATERIALIZED_VIEWS", "1") != "1":
+        return None
+    return connect_views()
+
+@st.cache_resource
+def get_federated_pipeline():
+    """Federated planner over the connectors of the per-DB pipelines."""
+    connectors = {db: get_pipeline(db).connector for db in ["mongodb", "neo4j", "redis", "rdf", "hbase"]}
+    return FederatedPipeline(connectors, LLMProvider())
+
+@st.cache_resource
+def get_cost_guard(max_examined: int):
+    """Shared cost guard (its plan cache is keyed by connector type and query shape)."""
+    return QueryCostGuard(max_examined=max_examined)
+
+@st.cache_resource
+def get_rewriter():
+    """Shared text-match rewriter (containment verdicts cached per query shape)."""
+    return TextMatchRewriter()
+
+@st.cache_resource
+def get_router():
+    """Adaptive router over the connectors of the per-DB pipelines (history persisted in logs/)."""
+    connectors = {db: get_pipeline(db).connector for db in ["mongodb", "neo4j", "redis", "rdf", "hbase"]}
+    return DatabaseRouter(connectors)
 
 # --- SIDEBAR ---
 with st.sidebar:
     st.header("⚙️ Configuration")
     
     # Mode Selection
-    mode = st.radio("Mode", ["Single Database", "Cross-DB Comparison"], 
-                   help="Single: Interact with one DB. Cross-DB: Compare how valid NLQ translates to multiple DBs.")
+    mode = st.radio("Mode", ["Single Database", "Cross-DB Comparison", "Federated Query"], 
+                   help="Single: Interact with one DB. Cross-DB: Compare how valid NLQ translates to multiple DBs. Federated: Answer one question by joining data across DBs.")
 
     selected_db_list = []
+    page_size = 0
     if mode == "Single Database":
         db = st.selectbox("Target Database", ["mongodb", "neo4j", "redis", "rdf", "hbase"])
         selected_db_list = [db]
+        page_size = st.number_input("Page Size (0 = all results)", min_value=0, value=0, step=50,
+                                    help="Stream large answers page by page instead of loading them at once.")
+    elif mode == "Federated Query":
+        st.info("Splitting the question into per-store subqueries joined in-process.")
+        selected_db_list = ["mongodb", "neo4j", "redis", "rdf", "hbase"]
     else:
-        st.info("Comparing query generation across all paradigms.")
+        full_comparison = st.toggle("Full Comparison (query all stores)", value=False,
+                                    help="Off: the router picks the best store(s) from intent, schema coverage and past runs.")
+        if full_comparison:
+            st.info("Comparing query generation across all paradigms.")
+        else:
+            route_top_k = st.slider("Stores to query", 1, 5, 1)
+            route_fallback = st.toggle("Fallback to next-best store on failure", value=True)
+            st.info("Routing to the best-suited store(s).")
         selected_db_list = ["mongodb", "neo4j", "redis", "rdf", "hbase"]
     
     unsafe_mode = st.toggle("Allow Writes (Unsafe Mode)", value=False)
+    rewrite_on = st.toggle("Index-backed Text Matching", value=False,
+                           help="Rewrite $regex / CONTAINS matching to text, collation or full-text indexes when they exist.")
+    cost_guard_on = st.toggle("Cost Guard (explain before running)", value=False,
+                              help="Plans reads with explain/EXPLAIN and bounds or rejects those over the budget.")
+    cost_budget = st.number_input("Max docs/rows examined", min_value=100, value=100_000, step=10_000,
+                                  disabled=not cost_guard_on)
     
     st.divider()
     
@@ -81,6 +140,10 @@ with st.sidebar:
                 st.code(json.dumps(meta.schema_summary, indent=2, default=str), language="json")
                 if "version" in str(meta):
                     st.caption(f"Connector Version: {meta.version}")
+                metrics = p.connector.get_metrics()
+                if metrics:
+                    with st.expander("Connector Metrics"):
+                        st.json(metrics)
             except Exception as e:
                 st.error(f"Connection Failed: {e}")
     else:
@@ -128,6 +191,24 @@ if prompt := st.chat_input("Enter your query (e.g., 'Who directed Inception? / F
     # 2. Assistant Processing
     with st.chat_message("assistant"):
         placeholder = st.empty()
+
+        if mode == "Federated Query":
+            with st.spinner("Planning federated query..."):
+                res = get_federated_pipeline().run(prompt)
+            if res["success"]:
+                last = res["steps"][-1]
+                content = "🔗 **Federated Query Complete**\n\n"
+                for store in last.get("stores", []):
+                    content += f"- **{store['db'].upper()}**: {store['rows']} rows in {store['round_trips']} round trip(s) ({store['latency_ms']:.1f}ms)\n"
+                placeholder.markdown(content)
+                with st.expander("Plan"):
+                    st.json(last.get("plan"))
+                st.json(res["final_result"])
+            else:
+                content = f"❌ **Federated query failed**: {res.get('error')}"
+                placeholder.error(content)
+            st.session_state.messages.append({"role": "assistant", "content": content})
+            st.stop()
         
         # Parallel Execution
         comparisons = [None] * len(selected_db_list)
@@ -138,44 +219,75 @@ if prompt := st.chat_input("Enter your query (e.g., 'Who directed Inception? / F
         prepared_pipes = []
         for db in selected_db_list:
             pipe = get_pipeline(db)
-            if pipe: pipe.set_safety(unsafe_mode)
+            if pipe:
+                pipe.set_safety(unsafe_mode)
+                pipe.cost_guard = get_cost_guard(int(cost_budget)) if cost_guard_on else None
+                pipe.rewriter = get_rewriter() if rewrite_on else None
             prepared_pipes.append(pipe)
 
+        router = get_router()
+        route_intent = router.classify_intent(prompt)
+
+        def to_comparison(db_type, res):
+            comp_result = {
+                "db": db_type,
+                "success": res["success"],
+                "query_str": "N/A", 
+                "payload": None,
+                "error": res.get("error"),
+                "intent": "UNKNOWN",
+                "latency": 0.0
+            }
+            
+            if res["success"]:
+                comp_result["payload"] = res["final_result"]
+                steps = res["steps"]
+                if steps:
+                    last = steps[-1]
+                    comp_result["query_str"] = last.get("parsed_query", "")
+                    comp_result["intent"] = last.get("parsed_ir", {}).get("intent", "UNKNOWN")
+                    comp_result["latency"] = last.get("execution", {}).execution_time_ms
+                    comp_result["optimization_tips"] = last.get("optimization_tips", None)
+                    comp_result["cost_guard"] = last.get("cost_guard")
+                    comp_result["rewrite"] = last.get("rewrite")
+                    if last.get("executed_query"):
+                        comp_result["query_str"] = last["executed_query"]
+            return comp_result
+
         def process_db(idx, db_type, pipe):
             if not pipe: return {"db": db_type, "success": False, "error": "Init Failed"}
             try:
-                res = pipe.run(prompt)
-                
-                comp_result = {
-                    "db": db_type,
-                    "success": res["success"],
-                    "query_str": "N/A", 
-                    "payload": None,
-                    "error": res.get("error"),
-                    "intent": "UNKNOWN",
-                    "latency": 0.0
-                }
-                
-                if res["success"]:
-                    comp_result["payload"] = res["final_result"]
-                    steps = res["steps"]
-                    if steps:
-                        last = steps[-1]
-                        comp_result["query_str"] = last.get("parsed_query", "")
-                        comp_result["intent"] = last.get("parsed_ir", {}).get("intent", "UNKNOWN")
-                        comp_result["latency"] = last.get("execution", {}).execution_time_ms
-                        comp_result["optimization_tips"] = last.get("optimization_tips", None)
+                res = pipe.run(prompt, page_size=page_size or None)
+                comp_result = to_comparison(db_type, res)
+                comp_result["continuation"] = res.get("continuation")
+                router.record(db_type, route_intent, comp_result["success"], comp_result["latency"])
                 return comp_result
             except Exception as e:
                 return {"db": db_type, "success": False, "error": str(e)}
 
-        with st.spinner(f"Running polyglot analysis on {len(selected_db_list)} paradigms simultaneously..."):
-            with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-                # Pass the pre-initialized pipe
-                futures = {executor.submit(process_db, i, selected_db_list[i], prepared_pipes[i]): i for i in range(len(selected_db_list))}
-                for future in concurrent.futures.as_completed(futures):
-                    idx = futures[future]
-                    comparisons[idx] = future.result()
+        routed = mode == "Cross-DB Comparison" and not full_comparison
+        route_note = ""
+        if routed:
+            with st.spinner("Routing query to the best-suited store(s)..."):
+                runs = router.run(prompt, dict(zip(selected_db_list, prepared_pipes)), top_k=route_top_k, fallback=route_fallback)
+            comparisons = [to_comparison(r["db"], r["result"]) for r in runs]
+            route_note = f"Routed `{route_intent}` query to: " + ", ".join(
+                f"**{r['db'].upper()}**" + (f" (fallback for {r['fallback_for'].upper()})" if r["fallback_for"] else "")
+                for r in runs
+            ) + "\n\n"
+            if not comparisons:
+                content = "❌ **Routing failed**: no store is currently available."
+                placeholder.error(content)
+                st.session_state.messages.append({"role": "assistant", "content": content})
+                st.stop()
+        else:
+            with st.spinner(f"Running polyglot analysis on {len(selected_db_list)} paradigms simultaneously..."):
+                with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
+                    # Pass the pre-initialized pipe
+                    futures = {executor.submit(process_db, i, selected_db_list[i], prepared_pipes[i]): i for i in range(len(selected_db_list))}
+                    for future in concurrent.futures.as_completed(futures):
+                        idx = futures[future]
+                        comparisons[idx] = future.result()
         
         # Graph Viz (Neo4j hook)
         graph_to_render = None
@@ -213,7 +325,16 @@ if prompt := st.chat_input("Enter your query (e.g., 'Who directed Inception? / F
                 if c.get("optimization_tips"):
                     with st.expander("⚡ Performance & Optimization Tips"):
                         st.info(c["optimization_tips"])
+                if c.get("rewrite"):
+                    st.caption(f"🔁 {c['rewrite']}")
+                if c.get("cost_guard"):
+                    st.caption(f"🛡️ {c['cost_guard']}")
                         
+                # Paged result: remember the token for "Load more"
+                st.session_state.pending_page = {"db": c["db"], "token": c["continuation"]} if c.get("continuation") else None
+                if c.get("continuation"):
+                    st.caption("More results available.")
+
                 msg_obj = {"role": "assistant", "content": content}
                 if graph_to_render:
                     msg_obj["graph_data"] = graph_to_render
@@ -227,7 +348,7 @@ if prompt := st.chat_input("Enter your query (e.g., 'Who directed Inception? / F
 
         else:
             # Comparison Mode Output
-            content = f"🔬 **Cross-Database Analysis Complete**\n\n{insight_text}"
+            content = f"🔬 **Cross-Database Analysis Complete**\n\n{route_note}{insight_text}"
             placeholder.markdown(content)
             
             # Render tabs dynamically
@@ -248,3 +369,17 @@ if prompt := st.chat_input("Enter your query (e.g., 'Who directed Inception? / F
                 "content": content,
                 "comparisons": comparisons
             })
+
+# Load the next page of the last paged result
+pending = st.session_state.get("pending_page")
+if pending and mode == "Single Database":
+    if st.button("⬇️ Load more results"):
+        page = get_pipeline(pending["db"]).fetch_more(pending["token"], page_size=page_size or 100)
+        if page.status == "success":
+            content = f"**Next page** ({len(page.payload)} rows)\n\n```json\n{json.dumps(page.payload, indent=2, default=str)}\n```"
+            st.session_state.pending_page = {"db": pending["db"], "token": page.continuation} if page.continuation else None
+        else:
+            content = f"❌ **Error** fetching more results: {page.error_message}"
+            st.session_state.pending_page = None
+        st.session_state.messages.append({"role": "assistant", "content": content})
+        st.rerun()
@@ -0,0 +1,134 @@
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Share of a query's observed time an index is assumed to save, by predicate kind
+BENEFIT_FACTORS = {"equality": 0.9, "range": 0.6, "sort": 0.3, "text": 0.7}
+
+EQUALITY_OPS = {"eq", "in"}
+RANGE_OPS = {"gt", "gte", "lt", "lte", "ne"}
+TEXT_OPS = {"contains"}
+
+MAX_COMPOUND_FIELDS = 3
+
+
+@dataclass
+class IndexRecommendation:
+    db_type: str
+    target: str          # Mongo collection, Neo4j label or HBase table
+    kind: str            # "single" | "compound" | "text" (Mongo), "property" | "fulltext" (Neo4j), "rowkey" (HBase)
+    fields: List[Tuple[str, int]]  # (field, direction); direction 1/-1 (0 for text/full-text)
+    benefit_ms: float = 0.0        # Estimated execution time saved over the logged workload
+    queries: int = 0
+    total_ms: float = 0.0
+    tip_votes: int = 0             # Logged LLM optimization_tips mentioning the leading field
+    examples: List[str] = field(default_factory=list)
+
+    @property
+    def name(self) -> str:
+        parts = [f"{f.replace(':', '_').replace('.', '_')}_{d}" for f, d in self.fields]
+        return f"{self.target.lower()}_{'_'.join(parts)}_{self.kind}"
+
+    def statement(self) -> str:
+        """Human-readable DDL (Cypher for Neo4j, pymongo call for Mongo, advice for HBase)."""
+        if self.db_type == "mongodb":
+            keys = ", ".join(f"('{f}', {repr('text') if self.kind == 'text' else d})" for f, d in self.fields)
+            return f"db.{self.target}.create_index([{keys}])"
+        if self.db_type == "neo4j":
+            props = ", ".join(f"n.{f}" for f, _ in self.fields)
+            if self.kind == "fulltext":
+                return f"CREATE FULLTEXT INDEX {self.name} IF NOT EXISTS FOR (n:{self.target}) ON EACH [{props}]"
+            return f"CREATE INDEX {self.name} IF NOT EXISTS FOR (n:{self.target}) ON ({props})"
+        leading = self.fields[0][0]
+        return (f"Row key of '{self.target}' does not encode {leading}: prefix it "
+                f"(e.g. <{leading}>#<id>) or declare a SecondaryIndex on it (src/connectors/hbase_index.py)")
+
+
+def _field_name(db_type: str, name: str) -> str:
+    """Strip Cypher variables ('m.title' -> 'title'); HBase 'family:qualifier' is kept."""
+    name = name.strip()
+    if db_type == "neo4j" and "." in name:
+        return name.split(".", 1)[1]
+    return name
+
+
+def _candidates(record: Dict[str, Any]) -> List[Tuple[str, List[Tuple[str, int]], float]]:
+    """(kind, fields, benefit factor) index candidates for one logged query."""
+    db_type = record.get("db_type")
+    equality, ranges, text = [], [], []
+    for f in record.get("filters", []):
+        name = _field_name(db_type, f["field"])
+        bucket = equality if f["operator"] in EQUALITY_OPS else ranges if f["operator"] in RANGE_OPS else \
+            text if f["operator"] in TEXT_OPS else None
+        if bucket is not None and name not in bucket:
+            bucket.append(name)
+    sort = _field_name(db_type, record["sort_field"]) if record.get("sort_field") else None
+    direction = -1 if record.get("sort_order") == "DESC" else 1
+
+    candidates = []
+    if db_type == "mongodb":
+        # Equality, Sort, Range ordering for compound keys
+        keys = [(f, 1) for f in sorted(equality)]
+        if sort and sort not in equality:
+            keys.append((sort, direction))
+        keys += [(f, 1) for f in sorted(ranges) if f != sort and f not in equality]
+        keys = keys[:MAX_COMPOUND_FIELDS]
+        if keys:
+            factor = BENEFIT_FACTORS["equality" if equality else "range" if ranges else "sort"]
+            candidates.append(("compound" if len(keys) > 1 else "single", keys, factor))
+        if text:
+            candidates.append(("text", [(f, 0) for f in sorted(text)], BENEFIT_FACTORS["text"]))
+    elif db_type == "neo4j":
+        for f in sorted(set(equality) | set(ranges)):
+            candidates.append(("property", [(f, 1)], BENEFIT_FACTORS["equality" if f in equality else "range"]))
+        if len(equality) > 1:
+            candidates.append(("property", [(f, 1) for f in sorted(equality)], BENEFIT_FACTORS["equality"]))
+        for f in sorted(text):
+            candidates.append(("fulltext", [(f, 0)], BENEFIT_FACTORS["text"]))
+    elif db_type == "hbase":
+        # Scans filtered on a column read the whole table; only the row key is indexed
+        for f in sorted(equality) or sorted(ranges)[:1]:
+            candidates.append(("rowkey", [(f, 1)], BENEFIT_FACTORS["equality" if f in equality else "range"]))
+    return candidates
+
+
+def _mentions(tip: Optional[str], field_name: str) -> bool:
+    leaf = re.split(r"[.:]", field_name)[-1]
+    return bool(tip) and re.search(rf"\b{re.escape(leaf)}\b", tip, re.IGNORECASE) is not None
+
+
+class IndexAdvisor:
+    """
+    Aggregates a workload log (src/optimization/workload.py) into ranked
+    index recommendations. Each logged query votes for the index that would
+    serve its filters/sort; the estimated benefit is the observed execution
+    time times an assumed saving per predicate kind (BENEFIT_FACTORS).
+    """
+    def __init__(self, records: Iterable[Dict[str, Any]]):
+        self.records = list(records)
+
+    def recommend(self, top: int = 10, min_queries: int = 1) -> List[IndexRecommendation]:
+        recs: Dict[Tuple[str, str, str, tuple], IndexRecommendation] = {}
+        for record in self.records:
+            elapsed = float(record.get("execution_time_ms") or 0.0)
+            for kind, fields, factor in _candidates(record):
+                key = (record["db_type"], record["target"], kind, tuple(fields))
+                rec = recs.get(key)
+                if rec is None:
+                    rec = recs[key] = IndexRecommendation(record["db_type"], record["target"], kind, list(fields))
+                rec.queries += 1
+                rec.total_ms += elapsed
+                rec.benefit_ms += elapsed * factor
+                rec.tip_votes += int(_mentions(record.get("optimization_tips"), fields[0][0]))
+                if len(rec.examples) < 3 and record.get("query") not in rec.examples:
+                    rec.examples.append(record.get("query"))
+
+        ranked = [r for r in recs.values() if r.queries >= min_queries]
+        ranked.sort(key=lambda r: (r.benefit_ms, r.tip_votes, r.queries), reverse=True)
+        return ranked[:top]
+
+
+def covered(fields: List[Tuple[str, int]], existing: Iterable[List[Tuple[str, Any]]]) -> bool:
+    """True if an existing key pattern starts with these fields (a prefix serves the same queries)."""
+    wanted = [f for f, _ in fields]
+    return any([f for f, _ in key[:len(wanted)]] == wanted for key in existing)
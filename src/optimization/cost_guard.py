@@ -0,0 +1,75 @@
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from src.connectors.base import BaseConnector, PlanEstimate
+from src.optimization.shapes import plan_shape
+
+
+class CostGuardViolation(Exception):
+    """Raised when a query's plan exceeds the budget and cannot be rewritten under it."""
+    def __init__(self, message: str, plan: PlanEstimate):
+        super().__init__(message)
+        self.plan = plan
+
+
+class QueryCostGuard:
+    """
+    Optional pre-execution stage: plans a generated read query with the
+    store's explain facility and compares the estimated documents/rows
+    examined against a budget.
+
+    Over budget:
+      - action="reject": raise CostGuardViolation (the plan summary goes back
+        into the repair prompt),
+      - action="rewrite": let the connector bound the query (limit / index
+        hint); if it cannot, reject.
+
+    Plans are cached by plan shape, so 'Inception' and 'Heat' cost one
+    explain while a different limit, sort or regex anchoring is re-explained. Stores without explain support, or explain failures, pass through.
+    """
+    def __init__(self, max_examined: int = 100_000, action: str = "rewrite",
+                 default_limit: int = 100, cache_size: int = 256):
+        if action not in ("rewrite", "reject"):
+            raise ValueError(f"Unknown cost guard action '{action}'")
+        self.max_examined = max_examined
+        self.action = action
+        self.default_limit = default_limit
+        self.cache_size = cache_size
+        self._plans: "OrderedDict[Tuple[str, str], Optional[PlanEstimate]]" = OrderedDict()
+
+    def estimate(self, connector: BaseConnector, query: str) -> Optional[PlanEstimate]:
+        key = (type(connector).__name__, plan_shape(query))
+        if key in self._plans:
+            self._plans.move_to_end(key)
+            return self._plans[key]
+        try:
+            plan = connector.explain(query)
+        except Exception as e:
+            print(f"⚠️ Cost guard: explain failed ({e}), skipping")
+            return None
+        self._plans[key] = plan
+        if len(self._plans) > self.cache_size:
+            self._plans.popitem(last=False)
+        return plan
+
+    def over_budget(self, plan: Optional[PlanEstimate]) -> bool:
+        return plan is not None and plan.examined is not None and plan.examined > self.max_examined
+
+    def check(self, connector: BaseConnector, query: str) -> Tuple[str, Optional[PlanEstimate], Optional[str]]:
+        """
+        Returns (query_to_run, plan, note). The note describes a rewrite, if any.
+        Raises CostGuardViolation if the query is over budget and not rewritable.
+        """
+        plan = self.estimate(connector, query)
+        if not self.over_budget(plan):
+            return query, plan, None
+
+        message = f"Query plan exceeds cost budget of {self.max_examined:,}: {plan.summary()}"
+        if self.action == "reject":
+            raise CostGuardViolation(message, plan)
+
+        bounded = connector.bound_query(query, plan, self.default_limit)
+        if not bounded:
+            raise CostGuardViolation(message + " (no bounded rewrite available)", plan)
+        print(f"🛡️ Cost guard rewrote query: {plan.summary()}")
+        return bounded, plan, f"Bounded by cost guard ({plan.summary()})"
@@ -0,0 +1,270 @@
+import copy
+import json
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.connectors.base import BaseConnector
+from src.optimization.shapes import STRING_LITERAL, query_shape
+
+# Words MongoDB's English text index drops: a $text search on them matches nothing
+TEXT_STOPWORDS = {"a", "an", "and", "are", "as", "at", "be", "but", "by", "for", "from", "has", "have", "in",
+                  "is", "it", "its", "of", "on", "or", "that", "the", "this", "to", "was", "were", "with"}
+
+REGEX_META = re.compile(r"[\\.^$*+?()\[\]{}|]")
+
+
+def regex_literal(pattern: str) -> Optional[Tuple[str, bool, bool, bool]]:
+    """
+    Split a simple regex into (literal, anchored_start, anchored_end, case_insensitive).
+    Only `(?i)`, `^`, `$` and leading/trailing `.*` are understood; anything
+    else (classes, alternation, escapes) returns None.
+    """
+    case_insensitive = pattern.startswith("(?i)")
+    if case_insensitive:
+        pattern = pattern[4:]
+    start = pattern.startswith("^")
+    end = pattern.endswith("$") and not pattern.endswith("\\$")
+    pattern = pattern[1 if start else 0:len(pattern) - 1 if end else len(pattern)]
+    if pattern.startswith(".*"):
+        pattern, start = pattern[2:], False
+    if pattern.endswith(".*"):
+        pattern, end = pattern[:-2], False
+    if not pattern or REGEX_META.search(pattern):
+        return None
+    return pattern, start, end, case_insensitive
+
+
+# --- MongoDB ---
+
+def mongo_index_fields(indexes: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Summarize pymongo index_information() into what the rewriter needs:
+    {"text": set of text-indexed fields, "plain": fields leading a regular
+    index, "ci": field -> collation of a case-insensitive index on it}.
+    """
+    summary = {"text": set(), "plain": set(), "ci": {}}
+    for info in indexes.values():
+        key = info.get("key") or []
+        if any(kind == "text" for _, kind in key):
+            summary["text"].update(info.get("weights", {}))
+            continue
+        if not key:
+            continue
+        field = key[0][0]
+        collation = info.get("collation")
+        if collation and collation.get("strength") in (1, 2):
+            summary["ci"][field] = {"locale": collation["locale"], "strength": collation["strength"]}
+        elif not collation:
+            summary["plain"].add(field)
+    return summary
+
+
+def _has_string_comparison(node: Any) -> bool:
+    """True if a filter compares against a string outside $regex (collation would change it)."""
+    if isinstance(node, str):
+        return True
+    if isinstance(node, dict):
+        return any(k not in ("$regex", "$options") and _has_string_comparison(v) for k, v in node.items())
+    if isinstance(node, list):
+        return any(_has_string_comparison(v) for v in node)
+    return False
+
+
+def _text_searchable(literal: str) -> bool:
+    words = literal.lower().split()
+    return bool(words) and all(w.isalnum() and len(w) >= 3 and w not in TEXT_STOPWORDS for w in words)
+
+
+def rewrite_mongo_filter(filter_: Dict[str, Any], fields: Dict[str, Any]) -> Optional[Tuple[Dict[str, Any], Optional[Dict[str, Any]], str]]:
+    """
+    Rewrite the first index-unfriendly $regex condition of a filter.
+    Returns (new_filter, collation or None, kind) or None.
+
+      collation  ^lit$ + i on a field with a case-insensitive index -> equality under that collation
+      prefix     ^lit + i where lit has no cased characters         -> case-sensitive anchored prefix
+      text       lit (whole words) on a text-indexed field          -> $text phrase search, regex kept
+    """
+    for field, cond in filter_.items():
+        if field.startswith("$") or not isinstance(cond, dict) or not isinstance(cond.get("$regex"), str):
+            continue
+        parsed = regex_literal(cond["$regex"])
+        if parsed is None or set(cond) - {"$regex", "$options"}:
+            continue
+        literal, start, end, inline_i = parsed
+        case_insensitive = inline_i or "i" in cond.get("$options", "")
+        if set(cond.get("$options", "")) - {"i"}:
+            continue
+
+        others = {k: v for k, v in filter_.items() if k != field}
+        if start and end and case_insensitive and field in fields["ci"] and not _has_string_comparison(others):
+            return dict(others, **{field: literal}), fields["ci"][field], "collation"
+
+        if start and case_insensitive and field in fields["plain"] and literal.lower() == literal.upper():
+            return dict(filter_, **{field: {"$regex": "^" + literal + ("$" if end else "")}}), None, "prefix"
+
+        if (field in fields["text"] and "$text" not in filter_ and "$or" not in filter_
+                and _text_searchable(literal)):
+            return dict({"$text": {"$search": f'"{literal}"'}}, **filter_), None, "text"
+    return None
+
+
+def rewrite_mongo(query: str, indexes: Dict[str, Dict[str, Any]]) -> Optional[Tuple[str, str]]:
+    """Rewrite a Mongo JSON instruction (find / count_documents / leading $match). Returns (query, kind) or None."""
+    command = json.loads(query)
+    args = command.get("args", {})
+    op = command.get("operation")
+    if op in ("find", "count_documents"):
+        target = args.get("filter") or {}
+    elif op == "aggregate" and args.get("pipeline") and "$match" in args["pipeline"][0]:
+        target = args["pipeline"][0]["$match"]
+    else:
+        return None
+
+    rewritten = rewrite_mongo_filter(target, mongo_index_fields(indexes))
+    if rewritten is None:
+        return None
+    new_filter, collation, kind = rewritten
+    command = copy.deepcopy(command)
+    args = command["args"]
+    if op == "aggregate":
+        args["pipeline"][0]["$match"] = new_filter
+    else:
+        args["filter"] = new_filter
+    if collation:
+        args["collation"] = collation
+    return json.dumps(command), kind
+
+
+# --- Neo4j ---
+
+_STRING = r"('(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\")"
+_PROPERTY = r"([A-Za-z_]\w*)\.([A-Za-z_]\w*)"
+CYPHER_TEXT_PREDICATES = [
+    re.compile(rf"(?:toLower|toUpper)\(\s*{_PROPERTY}\s*\)\s+CONTAINS\s+(?:(?:toLower|toUpper)\(\s*)?{_STRING}", re.IGNORECASE),
+    re.compile(rf"{_PROPERTY}\s+CONTAINS\s+{_STRING}", re.IGNORECASE),
+    re.compile(rf"{_PROPERTY}\s*=~\s*{_STRING}", re.IGNORECASE),
+]
+FIRST_MATCH = re.compile(
+    r"^\s*MATCH\s+(?P<pattern>.*?)\s+WHERE\s+(?P<where>.*?)(?=\b(?:WITH|RETURN|MATCH|OPTIONAL|UNWIND|CALL|ORDER)\b|$)",
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+def _mask_literals(query: str) -> str:
+    """Blank out string literals (same length) so keywords inside them are not parsed."""
+    return STRING_LITERAL.sub(lambda m: m.group(0)[0] + "_" * (len(m.group(0)) - 2) + m.group(0)[-1], query)
+
+
+def rewrite_cypher(query: str, fulltext: List[Dict[str, Any]]) -> Optional[Tuple[str, str]]:
+    """
+    Prefix a Cypher read whose first MATCH filters on CONTAINS / =~ '(?i)...'
+    with a full-text index lookup binding the same variable:
+
+        CALL db.index.fulltext.queryNodes('movie_title_fulltext', '*dark* AND *knight*') YIELD node AS m
+        MATCH (m:Movie) WHERE toLower(m.title) CONTAINS 'dark knight' RETURN m
+
+    The wildcard-per-token Lucene query matches a superset of the substring
+    predicate, which is kept, so the answer is unchanged. Only conjunctive
+    WHERE clauses of the first MATCH are rewritten.
+    """
+    masked = _mask_literals(query)
+    if re.search(r"\b(OPTIONAL|db\.index\.fulltext)\b", masked, re.IGNORECASE):
+        return None
+    clause = FIRST_MATCH.match(masked)
+    if not clause or re.search(r"\b(OR|XOR|NOT)\b", clause.group("where"), re.IGNORECASE):
+        return None
+
+    where_start, where_end = clause.span("where")
+    for predicate in CYPHER_TEXT_PREDICATES:
+        found = predicate.search(query, where_start, where_end)
+        if not found:
+            continue
+        var, prop, literal = found.group(1), found.group(2), found.group(3)[1:-1]
+        if "=~" in found.group(0):
+            parsed = regex_literal(literal)
+            if parsed is None or parsed[2]:
+                continue
+            literal = parsed[0]
+
+        label = re.search(rf"\(\s*{var}\s*:\s*`?(\w+)", clause.group("pattern"))
+        if not label:
+            continue
+        index = next((ix for ix in fulltext if label.group(1) in ix["labels"] and prop in ix["properties"]), None)
+        tokens = [t for t in re.findall(r"[a-z0-9]+", literal.lower()) if len(t) >= 2]
+        if index is None or not tokens:
+            continue
+        lucene = " AND ".join(f"*{t}*" for t in tokens)
+        return f"CALL db.index.fulltext.queryNodes('{index['name']}', '{lucene}') YIELD node AS {var} {query.lstrip()}", "fulltext"
+    return None
+
+
+class TextMatchRewriter:
+    """
+    Post-generation rewriter turning case-insensitive regex / CONTAINS text
+    matching into index-backed forms, only when the matching index exists
+    (see src/optimization/setup_indexes.py).
+
+    Each rewrite is checked once per query shape by containment on a sample:
+    up to `sample_size` records the original matches must all be matched by
+    the rewritten query, and up to `sample_size` the rewrite matches must all
+    be matched by the original (both restricted by id, so no second scan).
+    A sample that finds nothing is inconclusive: the original runs and the
+    next query of that shape verifies again.
+    """
+    def __init__(self, sample_size: int = 100, index_ttl: float = 300.0, cache_size: int = 256):
+        self.sample_size = sample_size
+        self.index_ttl = index_ttl
+        self.cache_size = cache_size
+        self._verdicts: "OrderedDict[Tuple[str, str], bool]" = OrderedDict()
+        self._indexes: Dict[Tuple[int, str], Tuple[float, Any]] = {}
+
+    def _index_info(self, connector: BaseConnector, db_type: str, query: str) -> Any:
+        collection = json.loads(query).get("collection", "") if db_type == "mongodb" else ""
+        key = (id(connector), collection)
+        fetched_at, info = self._indexes.get(key, (0.0, None))
+        if time.time() - fetched_at > self.index_ttl:
+            info = connector.index_information(collection) if db_type == "mongodb" else connector.fulltext_indexes()
+            self._indexes[key] = (time.time(), info)
+        return info
+
+    def _contained(self, connector: BaseConnector, inner: str, outer: str, key: Optional[str]) -> Optional[bool]:
+        """Whether a sample of `inner`'s matches is matched by `outer`; None if nothing to compare."""
+        ids = connector.sample_ids(inner, self.sample_size, key=key)
+        if not ids:
+            return None
+        found = connector.sample_ids(outer, len(ids), ids=ids, key=key)
+        return found is not None and len(found) == len(ids)
+
+    def _verified(self, connector: BaseConnector, db_type: str, original: str, rewritten: str) -> bool:
+        key = (db_type, query_shape(original))
+        if key not in self._verdicts:
+            node = re.search(r"YIELD node AS (\w+)", rewritten) if db_type == "neo4j" else None
+            node = node.group(1) if node else None
+            lossless = self._contained(connector, original, rewritten, node)
+            exact = self._contained(connector, rewritten, original, node) if lossless else lossless
+            if lossless is None or (lossless and exact is None):
+                print("⚠️ Rewrite not verified (empty sample): running the original")
+                return False
+            self._verdicts[key] = bool(lossless and exact)
+            if not self._verdicts[key]:
+                print("⚠️ Rewrite rejected: it does not match the same records as the original on a sample")
+            if len(self._verdicts) > self.cache_size:
+                self._verdicts.popitem(last=False)
+        self._verdicts.move_to_end(key)
+        return self._verdicts[key]
+
+    def rewrite(self, connector: BaseConnector, db_type: str, query: str) -> Tuple[str, Optional[str]]:
+        """Returns (query_to_run, note). Stores without a rewrite, or any failure, keep the original."""
+        if db_type not in ("mongodb", "neo4j"):
+            return query, None
+        try:
+            info = self._index_info(connector, db_type, query)
+            rewritten = rewrite_mongo(query, info) if db_type == "mongodb" else rewrite_cypher(query, info)
+            if rewritten is None or not self._verified(connector, db_type, query, rewritten[0]):
+                return query, None
+        except Exception as e:
+            print(f"⚠️ Text match rewrite skipped: {e}")
+            return query, None
+        return rewritten[0], f"Rewritten to use a {rewritten[1]} index"
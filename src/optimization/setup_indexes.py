@@ -1,6 +1,15 @@
+import argparse
+import os
+import sys
+
 from pymongo import MongoClient
 from neo4j import GraphDatabase
 
+sys.path.append(os.getcwd())
+
+from src.optimization.workload import WorkloadLog
+from src.optimization.advisor import IndexAdvisor, covered
+
 def optimize_mongo(uri="mongodb://localhost:27017/"):
     print("Optimization: Applying MongoDB Indexes...")
     try:
@@ -14,6 +23,10 @@ def optimize_mongo(uri="mongodb://localhost:27017/"):
         db.movies.create_index("year")
         db.movies.create_index("rating")
         db.movies.create_index("director")
+
+        # 3. Case-insensitive (collation) indexes for exact name/title matches
+        db.movies.create_index("title", name="title_ci", collation={"locale": "en", "strength": 2})
+        db.movies.create_index("director", name="director_ci", collation={"locale": "en", "strength": 2})
         
         print("✅ MongoDB Indexes Created.")
     except Exception as e:
@@ -30,11 +43,107 @@ def optimize_neo4j(uri="bolt://localhost:7687", auth=("neo4j", "password")):
             
             # 2. Search Indexes
             session.run("CREATE INDEX movie_title IF NOT EXISTS FOR (m:Movie) ON (m.title)")
+
+            # 3. Full-text Indexes (CONTAINS / case-insensitive matching)
+            session.run("CREATE FULLTEXT INDEX movie_title_fulltext IF NOT EXISTS FOR (m:Movie) ON EACH [m.title]")
+            session.run("CREATE FULLTEXT INDEX person_name_fulltext IF NOT EXISTS FOR (p:Person) ON EACH [p.name]")
             
         print("✅ Neo4j Indexes Created.")
     except Exception as e:
         print(f"⚠️ Neo4j Optimization Skipped: {e}")
 
+def print_recommendations(recs):
+    if not recs:
+        print("No recommendations: the workload log is empty.")
+        return
+    for i, rec in enumerate(recs, 1):
+        print(f"{i}. [{rec.db_type}] {rec.kind} on {rec.target}({', '.join(f for f, _ in rec.fields)}) "
+              f"- est. benefit {rec.benefit_ms:.1f}ms over {rec.queries} queries"
+              + (f", suggested by {rec.tip_votes} LLM tips" if rec.tip_votes else ""))
+        print(f"   {rec.statement()}")
+
+def _unknown(rec, targets, has_field):
+    """Why a recommendation names something the database does not have (None if it is valid)."""
+    if rec.target not in targets:
+        return f"{rec.target} does not exist"
+    missing = [f for f, _ in rec.fields if not has_field(rec.target, f)]
+    if missing:
+        return f"no {', '.join(missing)} on {rec.target}"
+    return None
+
+def apply_recommendations(recs, mongo_uri="mongodb://localhost:27017/",
+                          neo4j_uri="bolt://localhost:7687", auth=("neo4j", "password")):
+    """
+    Create recommended indexes. Existing (or prefix-covering) indexes are left alone, so reruns are no-ops.
+    Recommendations on unknown collections, labels or fields are skipped: create_index would
+    create the collection, and Neo4j would index a label nothing carries.
+    """
+    mongo_recs = [r for r in recs if r.db_type == "mongodb"]
+    neo4j_recs = [r for r in recs if r.db_type == "neo4j"]
+    for rec in recs:
+        if rec.db_type == "hbase":
+            print(f"ℹ️ HBase (manual): {rec.statement()}")
+
+    if mongo_recs:
+        try:
+            db = MongoClient(mongo_uri, serverSelectionTimeoutMS=2000).movie_db  # MVP hardcoded
+            collections = set(db.list_collection_names())
+            for rec in mongo_recs:
+                reason = _unknown(rec, collections, lambda c, f: db[c].find_one({f: {"$exists": True}}, {"_id": 1}))
+                if reason:
+                    print(f"⚠️ Skipped ({reason}): {rec.statement()}")
+                    continue
+                existing = db[rec.target].index_information().values()
+                if rec.kind == "text":
+                    # One text index per collection
+                    if any(kind == "text" for info in existing for _, kind in info["key"]):
+                        print(f"✔️ Exists: text index on {rec.target}")
+                        continue
+                    keys = [(f, "text") for f, _ in rec.fields]
+                elif covered(rec.fields, [info["key"] for info in existing if not info.get("collation")]):
+                    print(f"✔️ Exists: {rec.statement()}")
+                    continue
+                else:
+                    keys = list(rec.fields)
+                db[rec.target].create_index(keys)
+                print(f"✅ Created: {rec.statement()}")
+        except Exception as e:
+            print(f"⚠️ MongoDB Apply Skipped: {e}")
+
+    if neo4j_recs:
+        try:
+            driver = GraphDatabase.driver(neo4j_uri, auth=auth)
+            with driver.session() as session:
+                labels = {r["label"] for r in session.run("CALL db.labels() YIELD label RETURN label")}
+                keys = {r["key"] for r in session.run("CALL db.propertyKeys() YIELD propertyKey RETURN propertyKey AS key")}
+                for rec in neo4j_recs:
+                    reason = _unknown(rec, labels, lambda label, f: f in keys)
+                    if reason:
+                        print(f"⚠️ Skipped ({reason}): {rec.statement()}")
+                        continue
+                    try:
+                        # IF NOT EXISTS makes this idempotent
+                        session.run(rec.statement()).consume()
+                        print(f"✅ Ensured: {rec.statement()}")
+                    except Exception as e:
+                        print(f"⚠️ Failed ({e}): {rec.statement()}")
+        except Exception as e:
+            print(f"⚠️ Neo4j Apply Skipped: {e}")
+
 if __name__ == "__main__":
-    optimize_mongo()
-    optimize_neo4j()
+    parser = argparse.ArgumentParser(description="Create baseline indexes, or advise/apply indexes from the workload log")
+    parser.add_argument("--advise", action="store_true", help="Print ranked index recommendations from the workload log")
+    parser.add_argument("--apply", action="store_true", help="Create the recommended indexes (idempotent)")
+    parser.add_argument("--log", default="logs/workload.jsonl", help="Workload log path")
+    parser.add_argument("--top", type=int, default=10, help="Number of recommendations")
+    parser.add_argument("--min-queries", type=int, default=2, help="Ignore indexes serving fewer logged queries")
+    args = parser.parse_args()
+
+    if args.advise or args.apply:
+        recs = IndexAdvisor(WorkloadLog(args.log).records()).recommend(top=args.top, min_queries=args.min_queries)
+        print_recommendations(recs)
+        if args.apply:
+            apply_recommendations(recs)
+    else:
+        optimize_mongo()
+        optimize_neo4j()
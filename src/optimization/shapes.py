@@ -0,0 +1,155 @@
+import json
+import re
+from typing import Any, Dict, Tuple
+
+# Literals in Cypher / SPARQL / Redis text queries
+STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+NUMBER_LITERAL = re.compile(r"(?<![\w$])-?\d+(?:\.\d+)?(?![\w])")
+
+# JSON instruction keys whose values select *what* is queried, not a literal
+STRUCTURAL_KEYS = {"collection", "operation", "table"}
+
+
+# Values that change a plan's cost, kept in plan shapes (see plan_shape)
+COST_KEYS = {"limit", "skip", "sort", "hint", "collation", "$options"}
+TEXT_BOUNDS = re.compile(r"\b(LIMIT|SKIP)\s+(\d+)", re.IGNORECASE)
+TEXT_REGEX = re.compile(r"=~\s*(?:'(\^?)|\"(\^?))")
+
+
+def _json_shape(node: Any, key: str = None, costed: bool = False) -> Any:
+    if isinstance(node, dict):
+        return {k: _json_shape(v, k, costed) for k, v in sorted(node.items())}
+    if isinstance(node, list):
+        return [_json_shape(v, costed=costed) for v in node]
+    if key in STRUCTURAL_KEYS or (costed and key in COST_KEYS):
+        return node
+    if costed and key == "$regex":
+        return "^?" if str(node).startswith("^") else "?"
+    return "?"
+
+
+def query_shape(query: str) -> str:
+    """
+    Normalized query shape: literals replaced by '?', whitespace collapsed.
+    Queries differing only in constants ('Inception' vs 'Heat') share a shape,
+    so plans and rewrite decisions can be cached per shape.
+    """
+    try:
+        parsed = json.loads(query)
+    except (TypeError, ValueError):
+        parsed = None
+    if isinstance(parsed, (dict, list)):
+        return json.dumps(_json_shape(parsed), sort_keys=True)
+
+    shape = STRING_LITERAL.sub("?", query)
+    shape = NUMBER_LITERAL.sub("?", shape)
+    return " ".join(shape.split())
+
+
+def plan_shape(query: str) -> str:
+    """
+    query_shape plus what decides the plan's cost: limit/skip/sort/hint/
+    collation values and regex options, and whether each regex is anchored
+    ('^Inc' can use an index bound, 'ception' cannot).
+    """
+    try:
+        parsed = json.loads(query)
+    except (TypeError, ValueError):
+        parsed = None
+    if isinstance(parsed, (dict, list)):
+        return json.dumps(_json_shape(parsed, costed=True), sort_keys=True)
+    bounds = [f"{kind.upper()} {n}" for kind, n in TEXT_BOUNDS.findall(query)]
+    anchors = ["^?" if (a or b) else "?" for a, b in TEXT_REGEX.findall(query)]
+    return " | ".join([query_shape(query)] + bounds + anchors)
+
+
+# Cypher tokens: backtick identifiers and existing $params are skipped, strings and numbers extracted
+CYPHER_TOKEN = re.compile(
+    r"(?P<ident>`[^`]*`)|(?P<param>\$\w+)|(?P<string>'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\")"
+    r"|(?P<number>(?<![\w$.])-?\d+(?:\.\d+)?(?![\w.]))"
+)
+CYPHER_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f", "'": "'", '"': '"', "\\": "\\"}
+
+
+def _unescape(literal: str) -> str:
+    body = literal[1:-1]
+    return re.sub(r"\\(u[0-9a-fA-F]{4}|.)",
+                  lambda m: chr(int(m.group(1)[1:], 16)) if m.group(1)[0] == "u" and len(m.group(1)) == 5
+                  else CYPHER_ESCAPES.get(m.group(1), m.group(1)), body)
+
+
+def parameterize_cypher(query: str, prefix: str = "lit") -> Tuple[str, Dict[str, Any]]:
+    """
+    Replace inline string/number literals with $parameters:
+        MATCH (m:Movie {title: 'Heat'}) RETURN m LIMIT 5
+        -> MATCH (m:Movie {title: $lit0}) RETURN m LIMIT $lit1, {"lit0": "Heat", "lit1": 5}
+    Queries differing only in constants get the same text, so Neo4j reuses
+    one cached plan. Variable-length bounds (`*1..3`) must stay literal.
+    """
+    params: Dict[str, Any] = {}
+
+    def replace(match):
+        kind = match.lastgroup
+        token = match.group(0)
+        if kind in ("ident", "param"):
+            return token
+        if kind == "number":
+            before = query[:match.start()].rstrip()
+            if before.endswith(("*", "..")) or query[match.end():].lstrip().startswith(".."):
+                return token
+            value = float(token) if "." in token else int(token)
+        else:
+            value = _unescape(token)
+        name = f"{prefix}{len(params)}"
+        params[name] = value
+        return "$" + name
+
+    return CYPHER_TOKEN.sub(replace, query), params
+
+
+# SPARQL tokens: IRIs, comments and LIMIT/OFFSET counts are kept, strings (with
+# language tag or <IRI> datatype) and numbers extracted
+SPARQL_TOKEN = re.compile(
+    r"(?P<iri><[^<>\s\"{}|^`\\]*>)|(?P<comment>#[^\n]*)|(?P<keep>\b(?:LIMIT|OFFSET)\s+\d+)"
+    r"|(?P<string>(?:'(?:[^'\\\n]|\\.)*'|\"(?:[^\"\\\n]|\\.)*\")(?:@[A-Za-z]+(?:-[A-Za-z0-9]+)*|\^\^<[^<>\s]*>|\^\^[\w-]*:[\w-]*)?)"
+    r"|(?P<number>(?<![\w:?$.\-])[+-]?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?(?![\w:.]))",
+    re.IGNORECASE,
+)
+# Forms where pre-bound variables would leak into results or not reach the literal's scope
+SPARQL_UNPARAMETERIZABLE = re.compile(
+    r"\bSELECT\s+(?:DISTINCT\s+|REDUCED\s+)?\*|\{\s*SELECT\b|\b(?:CONSTRUCT|DESCRIBE|VALUES|SERVICE|"
+    r"INSERT|DELETE|LOAD|CLEAR|CREATE|DROP|COPY|MOVE|ADD)\b",
+    re.IGNORECASE,
+)
+
+
+def parameterize_sparql(query: str, prefix: str = "__lit") -> Tuple[str, Dict[str, str]]:
+    """
+    Replace inline literals of a SELECT/ASK query with variables to pre-bind:
+        SELECT ?t WHERE { ?m ex:title ?t ; ex:year ?y FILTER(?y > 2005) }
+        -> SELECT ?t WHERE { ?m ex:title ?t ; ex:year ?y FILTER(?y > ?__lit0) }, {"__lit0": "2005"}
+    Values are N3 tokens (rdflib.util.from_n3 turns them into terms).
+    Returns the query unchanged with no bindings for forms where binding
+    would change the answer (SELECT *, sub-selects, VALUES, updates, ...).
+    """
+    masked = SPARQL_TOKEN.sub(lambda m: m.group(0) if m.lastgroup in ("keep", "number") else " " * len(m.group(0)), query)
+    if SPARQL_UNPARAMETERIZABLE.search(masked):
+        return query, {}
+    bindings: Dict[str, str] = {}
+
+    def replace(match):
+        token = match.group(0)
+        # Prefixed datatypes need the query's prefixes to resolve: keep them inline
+        if match.lastgroup in ("iri", "comment", "keep") or re.search(r"\^\^[\w-]*:", token):
+            return token
+        if token.startswith("'"):
+            # N3 only knows double quotes
+            end = token.rindex("'")
+            body = re.sub(r'\\.|"', lambda m: "'" if m.group(0) == "\\'" else '\\"' if m.group(0) == '"' else m.group(0),
+                          token[1:end])
+            token = '"' + body + '"' + token[end + 1:]
+        name = f"{prefix}{len(bindings)}"
+        bindings[name] = token.lstrip("+")
+        return "?" + name
+
+    return SPARQL_TOKEN.sub(replace, query), bindings
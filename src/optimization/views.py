@@ -0,0 +1,335 @@
+import argparse
+import os
+import re
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from src.connectors.base import ExecutionResult
+from src.ir.canonical import normalize_operator, normalize_value
+from src.ir.models import QueryIR
+
+# IR targets naming the movie catalog (Mongo collection, Neo4j label, HBase table)
+MOVIE_TARGETS = ("movies", "movie")
+GROUPABLE_FIELDS = {"genre", "director", "year", "actors", "rating"}
+NUMERIC_FIELDS = ("rating", "year")
+FILTER_OPS = {"eq", "in", "contains"}
+INTEGER = re.compile(r"^-?\d+$")
+
+
+def field_name(name: Optional[str]) -> Optional[str]:
+    """'m.genre', 'info:genre', '$genre' -> 'genre'."""
+    if not name:
+        return None
+    return re.split(r"[.:]", name.strip().lstrip("$"))[-1].lower()
+
+
+@dataclass(frozen=True)
+class AggregateView:
+    """
+    Per-`group_by` movie count, plus sum and count of each `metrics` field (so
+    sums and averages stay incrementally maintainable), in Redis hashes:
+      mv:movies:genre:count        {Drama: 12, ...}
+      mv:movies:genre:sum:rating   {Drama: 95.3, ...}
+      mv:movies:genre:n:rating     {Drama: 12, ...}
+      mv:movies:genre:total        {count, sum:rating, n:rating}
+      mv:movies:genre:ready        "1" ("multi" for list fields such as actors)
+
+    A "multi" view counts a movie once per list element (unwind semantics),
+    which stores grouping or matching on the whole list do not share: it
+    only answers the ungrouped, unfiltered totals.
+    """
+    group_by: str
+    metrics: Tuple[str, ...] = ("rating",)
+    targets: Tuple[str, ...] = MOVIE_TARGETS
+
+    @property
+    def name(self) -> str:
+        return f"{self.targets[0]}_by_{self.group_by}"
+
+    def key(self, *parts: str) -> str:
+        return ":".join(("mv", self.targets[0], self.group_by) + parts)
+
+    def keys(self) -> List[str]:
+        keys = [self.key("count"), self.key("total"), self.key("ready")]
+        for metric in self.metrics:
+            keys += [self.key("sum", metric), self.key("n", metric)]
+        return keys
+
+
+# Group-bys behind the catalog's recurring questions (examples.json, benchmark workloads)
+DEFAULT_VIEWS = [AggregateView("genre"), AggregateView("director"), AggregateView("year")]
+
+
+def _decode(value: Any) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else str(value)
+
+
+def _group_value(key: str) -> Any:
+    return int(key) if INTEGER.match(key) else key
+
+
+def _number(value: Any) -> Optional[float]:
+    if isinstance(value, bool) or value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _matches(group: str, op: str, value: Any) -> bool:
+    if op == "contains":
+        return str(value).lower() in group.lower()
+    candidates = value if op == "in" and isinstance(value, list) else [value]
+    return normalize_value(group) in [normalize_value(v) for v in candidates]
+
+
+class MaterializedViews:
+    """
+    Group-by counts, sums and averages over the movie catalog, maintained in
+    Redis hashes with HINCRBY / HINCRBYFLOAT as records are ingested, and
+    read back by SmartPipeline for matching AGGREGATE IRs instead of running
+    the aggregate on the store.
+
+    Writes executed through the pipeline do not expose their row delta, so
+    they invalidate the views over their target; the next ingest rebuilds them.
+    """
+
+    def __init__(self, client, views: Iterable[AggregateView] = DEFAULT_VIEWS):
+        self.client = client
+        self.views = list(views)
+        self.hits = 0
+        self._multi = set()
+
+    # --- Maintenance ---
+
+    def reset(self):
+        """Drop every view (start of a full reload)."""
+        pipe = self.client.pipeline(transaction=False)
+        for view in self.views:
+            pipe.delete(*view.keys())
+        pipe.execute()
+        self._multi = set()
+
+    def apply(self, records: Iterable[Dict[str, Any]], sign: int = 1):
+        """Fold records into the views (sign=-1 removes them) in one round trip."""
+        pipe = self.client.pipeline(transaction=False)
+        for record in records:
+            numbers = {m: _number(record.get(m)) for view in self.views for m in view.metrics}
+            for view in self.views:
+                value = record.get(view.group_by)
+                if isinstance(value, list):
+                    self._multi.add(view.name)
+                    groups = list(dict.fromkeys(str(v) for v in value if v is not None))
+                else:
+                    groups = [] if value is None else [str(value)]
+                pipe.hincrby(view.key("total"), "count", sign)
+                for group in groups:
+                    pipe.hincrby(view.key("count"), group, sign)
+                for metric in view.metrics:
+                    number = numbers[metric]
+                    if number is None:
+                        continue
+                    pipe.hincrbyfloat(view.key("total"), f"sum:{metric}", sign * number)
+                    pipe.hincrby(view.key("total"), f"n:{metric}", sign)
+                    for group in groups:
+                        pipe.hincrbyfloat(view.key("sum", metric), group, sign * number)
+                        pipe.hincrby(view.key("n", metric), group, sign)
+        pipe.execute()
+
+    def mark_ready(self):
+        """Publish the views: until then (or after an invalidation) queries go to the store."""
+        pipe = self.client.pipeline(transaction=False)
+        for view in self.views:
+            pipe.set(view.key("ready"), "multi" if view.name in self._multi else "1")
+        pipe.execute()
+
+    def invalidate(self, target: Optional[str] = None):
+        """Drop the views over `target` (every view when None)."""
+        stale = [v for v in self.views if target is None or target.strip().lower() in v.targets]
+        if stale:
+            self.client.delete(*[k for view in stale for k in view.keys()])
+
+    # --- Query answering ---
+
+    def match(self, ir: QueryIR) -> Optional[AggregateView]:
+        """
+        The view answering `ir`, if any: an AGGREGATE over the catalog with
+        count/sum/avg steps on view metrics, grouped by the view's field or
+        ungrouped, and filtered (eq / in / contains) on that field only.
+        """
+        if ir.intent.strip().upper() != "AGGREGATE" or not ir.aggregations:
+            return None
+        target = ir.target_collection.strip().lower()
+        group_bys = {field_name(a.group_by) for a in ir.aggregations if a.group_by}
+        filter_fields = {field_name(f.field) for f in ir.filters}
+        if len(group_bys) > 1 or len(filter_fields) > 1 or (group_bys and filter_fields and group_bys != filter_fields):
+            return None
+        if any(normalize_operator(f.operator) not in FILTER_OPS for f in ir.filters):
+            return None
+        wanted = next(iter(group_bys or filter_fields), None)
+        for view in self.views:
+            if target not in view.targets or (wanted and view.group_by != wanted):
+                continue
+            if all(self._supported(a, view) for a in ir.aggregations):
+                return view
+        return None
+
+    @staticmethod
+    def _supported(step, view: AggregateView) -> bool:
+        step_type = step.type.strip().lower()
+        if step_type in ("count", "group"):
+            return True
+        return step_type in ("sum", "avg") and field_name(step.field) in view.metrics
+
+    def answer(self, ir: QueryIR) -> Optional[ExecutionResult]:
+        """Rows shaped like src/engine/aggregate.py output, or None when no ready view matches."""
+        view = self.match(ir)
+        if view is None:
+            return None
+        start_time = time.time()
+        steps = []
+        for a in ir.aggregations:
+            step_type = "count" if a.type.strip().lower() == "group" else a.type.strip().lower()
+            metric = field_name(a.field) if step_type != "count" else None
+            name = "count" if step_type == "count" else f"{step_type}_{metric}"
+            if (name, step_type, metric) not in steps:
+                steps.append((name, step_type, metric))
+
+        pipe = self.client.pipeline(transaction=False)
+        pipe.get(view.key("ready"))
+        pipe.hgetall(view.key("count"))
+        pipe.hgetall(view.key("total"))
+        for metric in view.metrics:
+            pipe.hgetall(view.key("sum", metric))
+            pipe.hgetall(view.key("n", metric))
+        ready, counts, total, *sums = pipe.execute()
+        if not ready:
+            return None
+
+        def table(raw) -> Dict[str, float]:
+            return {_decode(k): float(_decode(v)) for k, v in (raw or {}).items()}
+        counts, total = table(counts), table(total)
+        sums = {m: (table(sums[2 * i]), table(sums[2 * i + 1])) for i, m in enumerate(view.metrics)}
+
+        grouped = any(a.group_by for a in ir.aggregations)
+        groups = [g for g, n in counts.items() if n > 0]
+        for f in ir.filters:
+            op = normalize_operator(f.operator)
+            groups = [g for g in groups if _matches(g, op, f.value)]
+        if not grouped and not ir.filters:
+            rows = [self._row(steps, total.get("count", 0.0),
+                              {m: (total.get(f"sum:{m}", 0.0), total.get(f"n:{m}", 0.0)) for m in view.metrics})]
+        elif _decode(ready) == "multi":
+            return None  # Per-element groups of a list field: the store's own semantics apply
+        elif not grouped:
+            rows = [self._row(steps, sum(counts[g] for g in groups),
+                              {m: (sum(s.get(g, 0.0) for g in groups), sum(n.get(g, 0.0) for g in groups))
+                               for m, (s, n) in sums.items()})]
+        else:
+            rows = [{view.group_by: _group_value(g),
+                     **self._row(steps, counts[g], {m: (s.get(g, 0.0), n.get(g, 0.0)) for m, (s, n) in sums.items()})}
+                    for g in groups]
+            rows = self._order(rows, ir, view.group_by, [name for name, _, _ in steps])
+
+        self.hits += 1
+        return ExecutionResult(status="success", payload=rows, raw_response=f"materialized view {view.name}",
+                               execution_time_ms=(time.time() - start_time) * 1000)
+
+    @staticmethod
+    def _row(steps, count: float, sums: Dict[str, Tuple[float, float]]) -> Dict[str, Any]:
+        row = {}
+        for name, step_type, metric in steps:
+            if step_type == "count":
+                row[name] = int(count)
+            elif step_type == "sum":
+                row[name] = round(sums[metric][0], 10)
+            else:
+                total, n = sums[metric]
+                row[name] = round(total / n, 10) if n else None
+        return row
+
+    @staticmethod
+    def _order(rows: List[Dict[str, Any]], ir: QueryIR, group_by: str, columns: List[str]) -> List[Dict[str, Any]]:
+        sort = field_name(ir.sort_field)
+        column = next((c for c in columns if c == sort or c.endswith("_" + str(sort))), None)
+        descending = (ir.sort_order or "ASC").upper() == "DESC"
+        if column:
+            present = [r for r in rows if r[column] is not None]
+            rows = sorted(present, key=lambda r: r[column], reverse=descending) + \
+                [r for r in rows if r[column] is None]
+        else:
+            rows = sorted(rows, key=lambda r: str(r[group_by]), reverse=descending and sort == group_by)
+        return rows[:ir.limit] if ir.limit is not None else rows
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {"views": [v.name for v in self.views], "hits": self.hits}
+
+
+def detect_views(records: Iterable[Dict[str, Any]], min_queries: int = 3) -> List[AggregateView]:
+    """
+    Views for the AGGREGATE questions recurring in a workload log
+    (src/optimization/workload.py): grouped by, or filtered on, one catalog
+    field at least `min_queries` times, with the numeric fields they sum or average.
+    """
+    votes: Counter = Counter()
+    metrics: Dict[str, set] = {}
+    for record in records:
+        if record.get("intent") != "AGGREGATE" or str(record.get("target", "")).lower() not in MOVIE_TARGETS:
+            continue
+        steps = record.get("aggregations") or []
+        fields = {field_name(a.get("group_by")) for a in steps if a.get("group_by")}
+        fields |= {field_name(f["field"]) for f in record.get("filters", []) if f.get("operator") in FILTER_OPS}
+        if len(fields) != 1:
+            continue
+        group_by = fields.pop()
+        if group_by not in GROUPABLE_FIELDS:
+            continue
+        votes[group_by] += 1
+        metrics.setdefault(group_by, set()).update(
+            field_name(a.get("field")) for a in steps
+            if str(a.get("type", "")).lower() in ("sum", "avg") and field_name(a.get("field")) in NUMERIC_FIELDS)
+    return [AggregateView(group_by, tuple(sorted(metrics[group_by] | {"rating"})))
+            for group_by, n in votes.most_common() if n >= min_queries]
+
+
+def configured_views(log_path: Optional[str] = "logs/workload.jsonl", min_queries: int = 3) -> List[AggregateView]:
+    """DEFAULT_VIEWS plus the views detected in the workload log (detected metrics win)."""
+    from src.optimization.workload import WorkloadLog
+    views = {v.group_by: v for v in DEFAULT_VIEWS}
+    if log_path:
+        for view in detect_views(WorkloadLog(log_path).records(), min_queries):
+            views[view.group_by] = view
+    return list(views.values())
+
+
+def connect_views(uri: Optional[str] = None, views: Optional[Iterable[AggregateView]] = None) -> Optional[MaterializedViews]:
+    """Views on the Redis at `uri` ($REDIS_URI), or None if it is unreachable."""
+    try:
+        import redis
+        client = redis.Redis.from_url(uri or os.getenv("REDIS_URI", "redis://localhost:6379"),
+                                      decode_responses=True, socket_connect_timeout=2)
+        client.ping()
+    except Exception as e:
+        print(f"⚠️ Materialized views disabled: {e}")
+        return None
+    return MaterializedViews(client, configured_views() if views is None else views)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Detect and (re)build materialized aggregate views in Redis")
+    parser.add_argument("--log", default="logs/workload.jsonl", help="Workload log path")
+    parser.add_argument("--min-queries", type=int, default=3, help="Ignore group-bys asked fewer times")
+    parser.add_argument("--build", metavar="SOURCE", help="Rebuild the views from a JSON array / JSONL catalog")
+    args = parser.parse_args()
+
+    views = configured_views(args.log, args.min_queries)
+    for view in views:
+        print(f"📊 {view.name}: count" + "".join(f", sum/avg {m}" for m in view.metrics))
+    if args.build:
+        from src.ingest.pipeline import ingest
+        from src.ingest.records import iter_records
+        from src.ingest.sinks import MaterializedViewSink
+        ingest(iter_records(args.build), [MaterializedViewSink(views=views)])
@@ -0,0 +1,54 @@
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional
+
+from src.ir.canonical import normalize_operator
+from src.ir.models import QueryIR
+
+
+class WorkloadLog:
+    """
+    Append-only JSONL log of executed queries: the filter/sort fields of the
+    QueryIR, its aggregations, the generated query, its execution time and the LLM's
+    optimization tip. Read back by src/optimization/advisor.py.
+    """
+    def __init__(self, path: str = "logs/workload.jsonl"):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def record(self, db_type: str, ir: QueryIR, query: str, execution_time_ms: float,
+               optimization_tips: Optional[str] = None):
+        entry = {
+            "ts": time.time(),
+            "db_type": db_type,
+            "target": ir.target_collection,
+            "intent": ir.intent.upper(),
+            "filters": [{"field": f.field, "operator": normalize_operator(f.operator)} for f in ir.filters],
+            "aggregations": [{"type": a.type.lower(), "field": a.field, "group_by": a.group_by} for a in ir.aggregations],
+            "sort_field": ir.sort_field,
+            "sort_order": (ir.sort_order or "ASC").upper(),
+            "query": query,
+            "execution_time_ms": execution_time_ms,
+            "optimization_tips": optimization_tips,
+        }
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry, default=str) + "\n")
+
+    def records(self) -> Iterator[Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Torn last line of a crashed writer
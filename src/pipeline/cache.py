@@ -1,6 +1,15 @@
 import hashlib
 import json
 import time
+from collections import OrderedDict
+
+from typing import Optional
+
+from src.connectors.base import ExecutionResult
+from src.engine.local import can_evaluate, evaluate
+from src.ir.models import QueryIR
+from src.ir.canonical import ir_fingerprint
+from src.ir.subsumption import subsumes
 
 class SemanticCache:
     """
@@ -39,3 +48,64 @@ class SemanticCache:
         if len(self.order) > self.capacity:
             oldest = self.order.pop(0)
             del self.cache[oldest]
+
+
+class ResultCache:
+    """
+    In-Memory LRU Cache of executed results keyed by the canonical IR hash
+    and the generated query. Paraphrased NLQs that compile to the same IR and
+    query share one entry, so the DB round trip is skipped even when the NLQ
+    cache misses.
+
+    Each entry keeps its QueryIR, so a query whose filters are narrower than
+    a cached, complete (un-truncated) result can be answered by filtering
+    that payload locally (see get_subsuming).
+    """
+    def __init__(self, capacity: int = 256):
+        self.capacity = capacity
+        self.cache = OrderedDict()  # key -> (db_type, ir, result, complete)
+
+    def get(self, ir: QueryIR, db_type: str, query: Optional[str] = None):
+        key = ir_fingerprint(ir, db_type, query)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            print(f"⚡ IR Cache Hit ({key[:12]})")
+            return self.cache[key][2]
+        return None
+
+    def get_subsuming(self, ir: QueryIR, db_type: str) -> Optional[ExecutionResult]:
+        """Answer `ir` from a cached superset result, or return None."""
+        for key, (entry_db, entry_ir, result, complete) in reversed(self.cache.items()):
+            if entry_db != db_type or not complete or not subsumes(entry_ir, ir):
+                continue
+            rows = result.payload
+            if not can_evaluate(rows, ir):
+                continue
+            start_time = time.time()
+            payload = evaluate(rows, ir)
+            self.cache.move_to_end(key)
+            print(f"⚡ IR Cache Subsumption Hit ({key[:12]})")
+            return ExecutionResult(
+                status="success",
+                payload=payload,
+                raw_response=f"Filtered from cached superset {key[:12]}",
+                execution_time_ms=(time.time() - start_time) * 1000,
+                truncated=ir.limit is not None and len(payload) >= ir.limit
+            )
+        return None
+
+    def set(self, ir: QueryIR, db_type: str, result: ExecutionResult, query: Optional[str] = None):
+        key = ir_fingerprint(ir, db_type, query)
+        complete = (
+            ir.limit is None
+            and not result.truncated
+            and isinstance(result.payload, list)
+        )
+        self.cache[key] = (db_type, ir, result, complete)
+        self.cache.move_to_end(key)
+
+        if len(self.cache) > self.capacity:
+            self.cache.popitem(last=False)
+
+    def clear(self):
+        self.cache.clear()
@@ -0,0 +1,211 @@
+import json
+import shlex
+import time
+from typing import Any, Dict, List, Tuple
+
+from src.connectors.base import BaseConnector, ExecutionResult
+from src.llm.provider import LLMProvider
+from src.validation.policy import PolicyValidator, SafetyException
+from src.ir.models import FederatedQueryIR, SubQueryIR
+from src.engine.aggregate import to_rows
+from src.engine.join import hash_join, join_value
+from src.engine.local import MISSING, resolve_field
+
+
+class FederatedPipeline:
+    """
+    Cross-database execution for questions whose answer spans stores,
+    e.g. "view counts for all Nolan movies" (Mongo ids by director joined
+    with Redis `movie:{id}:views`).
+
+    The LLM splits the NLQ into per-store subqueries with explicit join keys.
+    The first subquery drives: its filters are pushed down to its store.
+    Every other subquery fetches only the driving join key values (Redis via
+    batched MGET, other stores via a `$keys` placeholder) and is hash-joined
+    in-process. Each store therefore sees one round trip per key batch.
+    """
+    def __init__(self, connectors: Dict[str, BaseConnector], llm: LLMProvider, batch_size: int = 500):
+        self.connectors = connectors
+        self.llm = llm
+        self.batch_size = batch_size
+        self.validator = PolicyValidator(allow_writes=False)  # Federation is read-only
+        self.max_retries = 2
+
+    def _construct_prompt(self, nlq: str, error_history: list = None) -> str:
+        prompt = """You are an expert in polyglot NoSQL querying.
+The answer to the user's request may span several databases. Split it into per-store subqueries joined on shared keys.
+
+### Available Stores
+"""
+        for db_type, connector in self.connectors.items():
+            try:
+                meta = connector.get_metadata()
+            except Exception as e:
+                prompt += f"- {db_type}: unavailable ({e})\n"
+                continue
+            prompt += f"- {db_type}: {json.dumps(meta.schema_summary, default=str)}\n"
+
+        if error_history:
+            prompt += "\n### Previous Errors (Fix these!)\n"
+            for err in error_history:
+                prompt += f"- Plan: {err['plan']}\n  Error: {err['error']}\n"
+
+        prompt += f"""
+### User Request
+"{nlq}"
+
+### Output Format
+You must output ONLY a valid JSON object. Do not wrap in markdown code blocks.
+{{
+  "subqueries": [
+    {{
+      "db_type": "one of: {', '.join(self.connectors)}",
+      "intent": "FIND",
+      "target_collection": "...",
+      "filters": [ {{"field": "...", "operator": "eq", "value": ...}} ],
+      "return_fields": [ ... ],
+      "join_keys": ["id"],
+      "query": "Executable query for that store",
+      "key_template": null,
+      "value_field": null
+    }}
+  ]
+}}
+
+RULES:
+- The FIRST subquery drives the plan. Push every filter you can into its query and return its join key field.
+- Every other subquery is joined to the first on its first join key (use "id" or "title").
+- In dependent subqueries, restrict to the driving keys with the placeholder $keys (it is replaced by a JSON list), e.g.
+  MongoDB: {{"collection": "movies", "operation": "find", "args": {{"filter": {{"id": {{"$in": $keys}}}}}}}}
+  Neo4j: MATCH (m:Movie) WHERE m.id IN $keys RETURN m.id AS id, m.title AS title
+- For Redis, leave "query" empty and give "key_template" with the join key in braces (e.g. "movie:{{id}}:views") and a "value_field" name (e.g. "views").
+- Joins need complete inputs: fetch every matching row (MongoDB finds default to 10 rows, give "limit": 0). Set "limit" on the first subquery only for top-N questions.
+- Use only one subquery if a single store can answer.
+"""
+        return prompt
+
+    def plan(self, nlq: str, error_history: list = None) -> FederatedQueryIR:
+        response = self.llm.generate(self._construct_prompt(nlq, error_history))
+        clean_resp = response.replace("```json", "").replace("```", "").strip()
+        plan = FederatedQueryIR.model_validate(json.loads(clean_resp))
+        if not plan.subqueries:
+            raise ValueError("Plan contains no subqueries")
+        for sub in plan.subqueries:
+            if sub.db_type not in self.connectors:
+                raise ValueError(f"Unknown store '{sub.db_type}' in plan")
+            if not sub.join_keys and len(plan.subqueries) > 1:
+                raise ValueError(f"Subquery for {sub.db_type} has no join key")
+        return plan
+
+    def _check_safety(self, sub: SubQueryIR):
+        self.validator.check_ir_safety(sub.intent)
+        if sub.query:
+            db_type = self.connectors[sub.db_type].get_metadata().db_type
+            self.validator.check_raw_safety(sub.query, db_type)
+
+    def _run_query(self, sub: SubQueryIR, query: str, driving: bool = False) -> ExecutionResult:
+        """
+        Run one subquery. A truncated result fails the plan (the error goes back
+        to the planner): joined on partial inputs the answer would look complete.
+        Only the driving subquery may stop at the IR's own `limit` (top-N questions).
+        """
+        result = self.connectors[sub.db_type].execute(query, operation_type="read")
+        if result.status != "success":
+            raise RuntimeError(f"{sub.db_type}: {result.error_message}")
+        if result.truncated:
+            rows = len(to_rows(result.payload))
+            if not (driving and sub.limit is not None and rows >= sub.limit):
+                raise RuntimeError(f"{sub.db_type}: result truncated at {rows} rows, but a join needs every row: "
+                                   f"fetch without a row limit (e.g. \"limit\": 0 for Mongo finds)")
+        return result
+
+    def _render_keys(self, sub: SubQueryIR, keys: List[Any]) -> str:
+        if sub.db_type in ("rdf", "rdf_sparql"):
+            # SPARQL VALUES block content
+            return " ".join(json.dumps(k) for k in keys)
+        return json.dumps(keys, default=str)
+
+    def _fetch_dependent(self, sub: SubQueryIR, keys: List[Any]) -> Tuple[List[Dict[str, Any]], int]:
+        """Fetch rows of a dependent subquery restricted to the driving keys. Returns (rows, round_trips)."""
+        key_name = sub.join_keys[0]
+        batches = [keys[i:i + self.batch_size] for i in range(0, len(keys), self.batch_size)]
+
+        if sub.key_template:
+            value_field = sub.value_field or "value"
+            rows = []
+            for batch in batches:
+                redis_keys = [sub.key_template.replace("{" + key_name + "}", str(k)) for k in batch]
+                # Keys built from titles contain spaces: quote each one for the connector's shlex parsing
+                values = self._run_query(sub, "MGET " + " ".join(shlex.quote(k) for k in redis_keys)).payload or []
+                if len(values) != len(batch):
+                    raise RuntimeError(f"{sub.db_type}: MGET returned {len(values)} values for {len(batch)} keys")
+                rows.extend({key_name: k, value_field: v} for k, v in zip(batch, values))
+            return rows, len(batches)
+
+        if "$keys" not in sub.query:
+            # Independent subquery: its own filters are pushed down, the join does the rest
+            return to_rows(self._run_query(sub, sub.query).payload), 1
+
+        rows = []
+        for batch in batches:
+            rows.extend(to_rows(self._run_query(sub, sub.query.replace("$keys", self._render_keys(sub, batch))).payload))
+        return rows, len(batches)
+
+    def execute(self, plan: FederatedQueryIR) -> Dict[str, Any]:
+        """Run a plan and return {"rows": [...], "stores": [per-store stats]}."""
+        for sub in plan.subqueries:
+            self._check_safety(sub)
+
+        driving = plan.subqueries[0]
+        start_time = time.time()
+        rows = to_rows(self._run_query(driving, driving.query, driving=True).payload)
+        stores = [{"db": driving.db_type, "rows": len(rows), "round_trips": 1,
+                   "latency_ms": (time.time() - start_time) * 1000}]
+
+        for sub in plan.subqueries[1:]:
+            left_key = driving.join_keys[0]
+            keys, seen = [], set()
+            for row in rows:
+                value = resolve_field(row, left_key)
+                normalized = join_value(row, left_key)
+                if normalized is MISSING or normalized in seen:
+                    continue
+                seen.add(normalized)
+                keys.append(value)
+
+            start_time = time.time()
+            if keys:
+                right_rows, round_trips = self._fetch_dependent(sub, keys)
+            else:
+                right_rows, round_trips = [], 0
+            stores.append({"db": sub.db_type, "rows": len(right_rows), "round_trips": round_trips,
+                           "latency_ms": (time.time() - start_time) * 1000})
+            rows = hash_join(rows, right_rows, left_key, sub.join_keys[0], right_prefix=sub.db_type)
+
+        return {"rows": rows, "stores": stores}
+
+    def run(self, nlq: str) -> Dict[str, Any]:
+        result_log = {"steps": [], "final_result": None, "success": False}
+        error_history = []
+
+        for attempt in range(self.max_retries + 1):
+            step_info = {"attempt": attempt}
+            try:
+                plan = self.plan(nlq, error_history)
+                step_info["plan"] = plan.model_dump()
+                outcome = self.execute(plan)
+                step_info["stores"] = outcome["stores"]
+                result_log["steps"].append(step_info)
+                result_log["success"] = True
+                result_log["final_result"] = outcome["rows"]
+                return result_log
+            except SafetyException as e:
+                result_log["steps"].append(step_info)
+                result_log["error"] = f"Safety Blocked: {e}"
+                return result_log
+            except Exception as e:
+                error_history.append({"plan": json.dumps(step_info.get("plan", "PLAN_ERROR"), default=str), "error": str(e)})
+            result_log["steps"].append(step_info)
+
+        result_log["error"] = "Max retries exceeded"
+        return result_log
@@ -0,0 +1,203 @@
+import concurrent.futures
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.connectors.base import BaseConnector
+
+# Lightweight NLQ intent classification (keyword cues, checked in order)
+INTENT_CUES = [
+    ("TRAVERSAL", [r"\bact(ed|s|ing)? in\b", r"\bco-?star", r"\bworked with\b", r"\bconnected\b",
+                   r"\bpath\b", r"\brelationship", r"\bhops?\b", r"\bwho (directed|acted|starred)\b"]),
+    ("KEY_LOOKUP", [r"\bviews?\b", r"\bcounters?\b", r"\bkeys?\b", r"\bmovie:\d+", r"\bcached?\b"]),
+    ("SEMANTIC", [r"\btype of\b", r"\bontology\b", r"\bentity\b", r"\btriples?\b", r"\bsparql\b", r"\brdf\b"]),
+    ("SCAN", [r"\brows?\b", r"\bscan\b", r"\bcolumn", r"\btable\b"]),
+    ("AGGREGATE", [r"\bhow many\b", r"\bcount\b", r"\baverage\b", r"\bavg\b", r"\bsum\b", r"\btotal\b",
+                   r"\bper\b", r"\beach\b", r"\bmost\b", r"\btop \d+\b"]),
+]
+
+# Prior fit of each store for an intent (0..1)
+STORE_AFFINITY = {
+    "TRAVERSAL": {"neo4j": 1.0, "rdf": 0.6, "mongodb": 0.4, "hbase": 0.1, "redis": 0.0},
+    "KEY_LOOKUP": {"redis": 1.0, "hbase": 0.5, "mongodb": 0.3, "neo4j": 0.1, "rdf": 0.1},
+    "SEMANTIC": {"rdf": 1.0, "neo4j": 0.5, "mongodb": 0.2, "hbase": 0.1, "redis": 0.0},
+    "SCAN": {"hbase": 1.0, "mongodb": 0.5, "redis": 0.2, "neo4j": 0.2, "rdf": 0.1},
+    "AGGREGATE": {"mongodb": 1.0, "neo4j": 0.7, "rdf": 0.4, "hbase": 0.3, "redis": 0.2},
+    "FIND": {"mongodb": 1.0, "neo4j": 0.8, "hbase": 0.5, "rdf": 0.5, "redis": 0.3},
+}
+
+DEFAULT_WEIGHTS = {"intent": 0.4, "schema": 0.3, "success": 0.2, "latency": 0.1}
+
+STOPWORDS = {"the", "a", "an", "of", "in", "for", "with", "by", "and", "or", "is", "are", "was", "what",
+             "who", "which", "how", "many", "much", "find", "show", "get", "list", "all", "me", "did",
+             "does", "do", "to", "on", "from", "than", "that", "their", "there"}
+
+
+def _tokens(text: str) -> set:
+    # Split identifiers like 'ACTED_IN', 'info:genre', 'movieTitle' into words
+    text = re.sub(r"([a-z])([A-Z])", r"\1 \2", text)
+    return {t for t in re.findall(r"[a-z0-9]+", text.lower()) if t not in STOPWORDS}
+
+
+def _stem(token: str) -> str:
+    return token[:-1] if len(token) > 3 and token.endswith("s") else token
+
+
+class DatabaseRouter:
+    """
+    Picks the store(s) best suited to an NLQ instead of fanning out to all of them.
+
+    Score = weighted sum of
+      - intent affinity (keyword intent classification x store prior),
+      - schema coverage (share of NLQ terms found in the store's metadata),
+      - historical success rate (Laplace-smoothed, per store and intent),
+      - historical latency (faster stores score higher).
+    History is recorded from every run and persisted as JSON.
+    """
+    def __init__(self, connectors: Dict[str, BaseConnector], stats_path: Optional[str] = "logs/router_stats.json",
+                 weights: Dict[str, float] = None, metadata_ttl: float = 300.0):
+        self.connectors = connectors
+        self.stats_path = stats_path
+        self.weights = weights or DEFAULT_WEIGHTS
+        self.metadata_ttl = metadata_ttl
+        self._schema_tokens: Dict[str, Tuple[float, Optional[set]]] = {}
+        self._lock = threading.Lock()
+        self.stats = self._load_stats()
+
+    # --- History ---
+    def _load_stats(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        if self.stats_path and os.path.exists(self.stats_path):
+            try:
+                with open(self.stats_path, "r") as f:
+                    return json.load(f)
+            except Exception as e:
+                print(f"Warning: Could not load router stats from {self.stats_path}: {e}")
+        return {}
+
+    def _save_stats(self):
+        if not self.stats_path:
+            return
+        directory = os.path.dirname(self.stats_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.stats_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.stats, f, indent=2)
+        os.replace(tmp_path, self.stats_path)
+
+    def record(self, db: str, intent: str, success: bool, latency_ms: float):
+        """Record the outcome of running an NLQ of the given intent on a store."""
+        with self._lock:
+            for bucket in ("ALL", intent):
+                entry = self.stats.setdefault(db, {}).setdefault(bucket, {"runs": 0, "successes": 0, "latency_ms": 0.0})
+                entry["runs"] += 1
+                entry["successes"] += int(success)
+                entry["latency_ms"] += latency_ms
+            self._save_stats()
+
+    def _history(self, db: str, intent: str) -> Tuple[float, float]:
+        """(success_score, latency_score) in 0..1; neutral 0.5 without history."""
+        buckets = self.stats.get(db, {})
+        entry = buckets.get(intent) if buckets.get(intent, {}).get("runs", 0) >= 3 else buckets.get("ALL")
+        if not entry or not entry["runs"]:
+            return 0.5, 0.5
+        success = (entry["successes"] + 1) / (entry["runs"] + 2)
+        mean_latency = entry["latency_ms"] / entry["runs"]
+        return success, 1.0 / (1.0 + mean_latency / 1000.0)
+
+    # --- Signals ---
+    def classify_intent(self, nlq: str) -> str:
+        text = nlq.lower()
+        for intent, cues in INTENT_CUES:
+            if any(re.search(cue, text) for cue in cues):
+                return intent
+        return "FIND"
+
+    def _schema_coverage(self, db: str, nlq: str) -> Optional[float]:
+        """Share of NLQ terms present in the store's schema; None if the store is unavailable."""
+        fetched_at, tokens = self._schema_tokens.get(db, (0.0, None))
+        if time.time() - fetched_at > self.metadata_ttl:
+            try:
+                meta = self.connectors[db].get_metadata()
+                if isinstance(meta.schema_summary, dict) and "error" in meta.schema_summary:
+                    tokens = None
+                else:
+                    tokens = {_stem(t) for t in _tokens(json.dumps(meta.schema_summary, default=str))}
+            except Exception:
+                tokens = None
+            self._schema_tokens[db] = (time.time(), tokens)
+
+        if tokens is None:
+            return None
+        terms = {_stem(t) for t in _tokens(nlq)}
+        if not terms:
+            return 0.0
+        return len(terms & tokens) / len(terms)
+
+    def rank(self, nlq: str) -> List[Dict[str, Any]]:
+        """All available stores, best first, with the score breakdown."""
+        intent = self.classify_intent(nlq)
+        ranked = []
+        for db in self.connectors:
+            coverage = self._schema_coverage(db, nlq)
+            if coverage is None:
+                continue
+            success, latency = self._history(db, intent)
+            breakdown = {
+                "intent": STORE_AFFINITY[intent].get(db, 0.0),
+                "schema": coverage,
+                "success": success,
+                "latency": latency,
+            }
+            score = sum(self.weights[k] * v for k, v in breakdown.items())
+            ranked.append({"db": db, "intent": intent, "score": score, "breakdown": breakdown})
+        ranked.sort(key=lambda r: r["score"], reverse=True)
+        return ranked
+
+    # --- Execution ---
+    def _run_one(self, db: str, intent: str, pipeline, nlq: str) -> Dict[str, Any]:
+        start_time = time.time()
+        try:
+            res = pipeline.run(nlq)
+        except Exception as e:
+            res = {"success": False, "error": str(e), "steps": []}
+        latency = (time.time() - start_time) * 1000
+        # Prefer the DB execution time over end-to-end time (which is dominated by the LLM)
+        steps = res.get("steps") or []
+        execution = steps[-1].get("execution") if steps else None
+        if res["success"] and execution is not None:
+            latency = execution.execution_time_ms
+        self.record(db, intent, res["success"], latency)
+        return {"db": db, "result": res, "latency_ms": latency}
+
+    def run(self, nlq: str, pipelines: Dict[str, Any], top_k: int = 1, fallback: bool = True) -> List[Dict[str, Any]]:
+        """
+        Run the NLQ on the top_k ranked stores in parallel. If a store fails and
+        fallback is on, the next-best unused store is tried in its place.
+        Returns one entry per store run: {"db", "result", "latency_ms", "fallback_for"}.
+        """
+        ranked = [r for r in self.rank(nlq) if pipelines.get(r["db"]) is not None]
+        if not ranked:
+            return []
+        intent = ranked[0]["intent"]
+        chosen, reserve = ranked[:top_k], [r["db"] for r in ranked[top_k:]]
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, len(chosen))) as executor:
+            futures = [executor.submit(self._run_one, r["db"], intent, pipelines[r["db"]], nlq) for r in chosen]
+            runs = [f.result() for f in futures]
+
+        results = []
+        for run in runs:
+            run["fallback_for"] = None
+            results.append(run)
+            failed = run["db"]
+            while fallback and not results[-1]["result"]["success"] and reserve:
+                db = reserve.pop(0)
+                print(f"↪️ Router fallback: {failed} -> {db}")
+                retry = self._run_one(db, intent, pipelines[db], nlq)
+                retry["fallback_for"] = failed
+                results.append(retry)
+        return results
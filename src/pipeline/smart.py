@@ -2,21 +2,37 @@ import json
 import time
 from typing import Dict, Any, Optional
 
-from src.connectors.base import BaseConnector
+from src.connectors.base import BaseConnector, ExecutionResult, decode_token
 from src.llm.provider import LLMProvider
 from src.rag.store import SimpleRAGStore
 from src.validation.policy import PolicyValidator, SafetyException
 from src.ir.models import QueryIR
-from src.pipeline.cache import SemanticCache
+from src.ir.canonical import parse_ir, ir_fingerprint
+from src.pipeline.cache import SemanticCache, ResultCache
+from src.engine.aggregate import aggregate
+from src.optimization.cost_guard import QueryCostGuard, CostGuardViolation
+from src.optimization.rewriter import TextMatchRewriter
+from src.optimization.workload import WorkloadLog
+from src.optimization.views import MaterializedViews
+
+# Intents whose results may be shared across paraphrases via the IR cache.
+CACHEABLE_INTENTS = {"FIND", "AGGREGATE", "TRAVERSAL", "SCAN"}
 
 class SmartPipeline:
-    def __init__(self, connector: BaseConnector, llm: LLMProvider, rag: SimpleRAGStore):
+    def __init__(self, connector: BaseConnector, llm: LLMProvider, rag: SimpleRAGStore,
+                 cost_guard: Optional[QueryCostGuard] = None, rewriter: Optional[TextMatchRewriter] = None,
+                 workload_log: Optional[WorkloadLog] = None, views: Optional[MaterializedViews] = None):
         self.connector = connector
         self.llm = llm
         self.rag = rag
         self.validator = PolicyValidator(allow_writes=False) # Default safe
         self.max_retries = 2
         self.cache = SemanticCache()
+        self.result_cache = ResultCache()
+        self.cost_guard = cost_guard  # Optional explain-based budget check on reads
+        self.rewriter = rewriter  # Optional regex/CONTAINS -> index-backed text matching
+        self.workload_log = workload_log  # Optional log of executed queries for the index advisor
+        self.views = views  # Optional Redis materialized aggregates answering matching AGGREGATE IRs
 
     def set_safety(self, allow_writes: bool):
         self.validator.allow_writes = allow_writes
@@ -41,6 +57,8 @@ Your task is to translate a Natural Language Query (NLQ) into:
             prompt += "\n### Previous Execution Errors (Fix these!)\n"
             for err in error_history:
                 prompt += f"- Attempt: {err['query']}\n  Error: {err['error']}\n"
+                if err.get("plan"):
+                    prompt += f"  Plan: {err['plan']} (filter on indexed fields or add a limit)\n"
         
         prompt += f"""
 ### User Request
@@ -53,7 +71,12 @@ Structure:
   "ir": {{
     "intent": "FIND" | "AGGREGATE" | "TRAVERSAL" | "DELETE" | "DROP" | "MUTATION",
     "target_collection": "...",
-    "filters": [ ... ],
+    "filters": [ {{"field": "...", "operator": "eq" | "ne" | "gt" | "gte" | "lt" | "lte" | "contains" | "in", "value": ...}} ],
+    "return_fields": [ ... ],
+    "aggregations": [ {{"type": "group" | "count" | "sum" | "avg", "field": "...", "group_by": "..."}} ],
+    "sort_field": null,
+    "sort_order": "ASC" | "DESC",
+    "limit": null,
     "is_safe": true/false
   }},
   "query": "The actual executable string",
@@ -71,20 +94,107 @@ For MongoDB: Query should be a JSON string like {{"collection": "...", "operatio
    - Use '$regex' with '$options': 'i' for text fields (names, titles) to ensure case-insensitive partial matching.
    - Example: {{"filter": {{"director": {{"$regex": "Nolan", "$options": "i"}}}}}}
 For Neo4j: Query is Cypher string. Use 'CONTAINS' or '(?i)' for string matching.
-For Redis: Query is command string "GET key".
+For Redis: Query is command string "GET key" (quote arguments containing spaces).
+   - For several keys, give a JSON list of commands; it runs in one round trip: ["GET movie:1:views", "GET movie:2:views", "HGETALL movie:1:info"]
+   - Multi-command writes may be atomic: {{"commands": ["INCR movie:1:views", "INCR movie:2:views"], "transaction": true}}
 For RDF: Query is SPARQL.
-For HBase: Query is JSON instruction.
+For HBase: Query is JSON instruction {{"table": "movies", "operation": "scan" | "get" | "rows" | "put", "args": {{...}}}}.
+   - Filter with one SingleColumnValueFilter (binary: or binaryprefix:) on credits:director, info:genre or info:year, with filterIfMissing and latestVersionOnly true: it is answered from a secondary index table.
+   - Several known row keys: one "rows" call with "row_keys": ["1", "2", "3"] instead of several "get".
+   - Push work into the scan: "row_start"/"row_stop" or "row_prefix", "columns": ["info:title", "info:genre"], "filter", "batch_size", "limit".
+   - Example: {{"table": "movies", "operation": "scan", "args": {{"columns": ["info:title"], "filter": "SingleColumnValueFilter('info', 'genre', =, 'binary:Sci-Fi', true, true)"}}}}
+For Redis and HBase, aggregations (group/count/sum/avg) are computed by the system from the "ir": the query only needs to fetch the rows (e.g. HBase scan, Redis MGET).
 """
         return prompt
 
-    def run(self, nlq: str) -> Dict[str, Any]:
-        # 0. Check Cache
+    def _aggregate_locally(self, exec_result: ExecutionResult, ir: QueryIR) -> ExecutionResult:
+        """Evaluate IR aggregations over fetched rows for stores that cannot aggregate."""
+        if exec_result.truncated:
+            # A count/sum/avg over a cut-off fetch would be silently wrong
+            return ExecutionResult(status="error", payload=None, raw_response=None,
+                                   error_message="Client-side aggregation needs every row, but the fetch was "
+                                                 "truncated by a limit: fetch without a row limit",
+                                   execution_time_ms=exec_result.execution_time_ms, truncated=True)
+        start_time = time.time()
+        try:
+            payload = aggregate(exec_result.payload, ir)
+        except Exception as e:
+            return ExecutionResult(status="error", payload=None, raw_response=None,
+                                   error_message=f"Client-side aggregation failed: {e}",
+                                   execution_time_ms=exec_result.execution_time_ms)
+        return ExecutionResult(
+            status="success",
+            payload=payload,
+            raw_response=exec_result.raw_response,
+            execution_time_ms=exec_result.execution_time_ms + (time.time() - start_time) * 1000,
+            truncated=exec_result.truncated
+        )
+
+    def _execute(self, query_str: str, ir: Optional[QueryIR], operation_type: str, db_type: str,
+                 page_size: Optional[int], step_info: Dict[str, Any]) -> ExecutionResult:
+        """Run a generated query on the database (rewriter and cost guard applied to reads)."""
+        if self.rewriter and operation_type == "read":
+            query_str, note = self.rewriter.rewrite(self.connector, db_type, query_str)
+            if note:
+                step_info["rewrite"] = note
+                step_info["executed_query"] = query_str
+        if self.cost_guard and operation_type == "read":
+            query_str, plan, note = self.cost_guard.check(self.connector, query_str)
+            if plan is not None:
+                step_info["plan"] = plan.summary()
+            if note:
+                step_info["cost_guard"] = note
+                step_info["executed_query"] = query_str
+        local_aggregation = ir is not None and ir.aggregations and not self.connector.supports_aggregation
+        if page_size and not local_aggregation:
+            exec_result = self.connector.execute_page(query_str, page_size=page_size, operation_type=operation_type)
+        else:
+            exec_result = self.connector.execute(query_str, operation_type=operation_type)
+        if exec_result.status == "success" and ir is not None and ir.aggregations and not self.connector.supports_aggregation:
+            exec_result = self._aggregate_locally(exec_result, ir)
+        return exec_result
+
+    def _answer_from_views(self, ir: QueryIR) -> Optional[ExecutionResult]:
+        try:
+            return self.views.answer(ir)
+        except Exception as e:
+            print(f"⚠️ Materialized view lookup failed: {e}")
+            return None
+
+    def _invalidate_views(self, ir: Optional[QueryIR]):
+        try:
+            self.views.invalidate(ir.target_collection if ir is not None else None)
+        except Exception as e:
+            print(f"⚠️ Materialized view invalidation failed: {e}")
+
+    def fetch_more(self, continuation: str, page_size: int = 100) -> ExecutionResult:
+        """
+        Fetch the next page of a paged run (see run(page_size=...)). The token
+        is signed by the connector; its query is re-checked against the policy
+        before anything runs.
+        """
+        try:
+            query = decode_token(continuation).get("q") or ""
+            self.validator.check_raw_safety(query, self.connector.get_metadata().db_type)
+        except (ValueError, SafetyException) as e:
+            prefix = "Safety Blocked: " if isinstance(e, SafetyException) else ""
+            return ExecutionResult(status="error", payload=None, raw_response=None, error_message=f"{prefix}{e}")
+        return self.connector.execute_page(None, page_size=page_size, continuation=continuation)
+
+    def run(self, nlq: str, page_size: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Translate and execute an NLQ.
+        With page_size, only the first page is returned (and kept in memory);
+        result_log["continuation"] is then the token for fetch_more().
+        """
+        # 0. Check Cache (full results only; paged runs hold a single page)
         db_type = self.connector.get_metadata().db_type
-        cached = self.cache.get(nlq, db_type)
-        if cached:
-            return cached
+        if page_size is None:
+            cached = self.cache.get(nlq, db_type)
+            if cached:
+                return cached
 
-        result_log = {"steps": [], "final_result": None, "success": False}
+        result_log = {"steps": [], "final_result": None, "success": False, "continuation": None}
         
         # 1. Get Metadata
         meta = self.connector.get_metadata()
@@ -110,6 +220,9 @@ For HBase: Query is JSON instruction.
                 
                 ir_data = parsed.get("ir", {})
                 query_str = parsed.get("query", "")
+                if not isinstance(query_str, str):
+                    # Structured queries (Mongo/HBase objects, Redis command lists) given unquoted
+                    query_str = json.dumps(query_str)
                 opt_tips = parsed.get("optimization_tips", None)
                 
                 step_info["parsed_ir"] = ir_data
@@ -120,19 +233,75 @@ For HBase: Query is JSON instruction.
                 self.validator.check_ir_safety(ir_data.get("intent", "UNKNOWN"))
                 self.validator.check_raw_safety(query_str, db_type)
                 
-                # Execute
-                exec_result = self.connector.execute(query_str, operation_type="write" if not ir_data.get("is_safe") else "read")
+                # IR Cache: paraphrases compiling to the same IR skip the DB
+                ir = parse_ir(ir_data)
+                # One read/write decision for execution, caching and invalidation: an IR that
+                # does not validate or omits is_safe runs (and invalidates) as a write
+                is_safe = ir is not None and "is_safe" in ir.model_fields_set and ir.is_safe
+                cacheable = is_safe and ir.intent.upper() in CACHEABLE_INTENTS
+                if ir is not None:
+                    step_info["ir_hash"] = ir_fingerprint(ir, db_type, query_str)
+
+                # Cached entries are whole results: paged runs go to the database for their first page
+                cached = self.result_cache.get(ir, db_type, query_str) if cacheable and not page_size else None
+                subsumed = None
+                if cacheable and not page_size and cached is None:
+                    # Narrower than a cached complete result: filtered in-process
+                    subsumed = self.result_cache.get_subsuming(ir, db_type)
+
+                if cached is not None:
+                    step_info["ir_cache_hit"] = True
+                    exec_result = ExecutionResult(status="success", payload=cached.payload, raw_response="IR cache hit", truncated=cached.truncated)
+                elif subsumed is not None:
+                    step_info["ir_cache_hit"] = "subsumed"
+                    exec_result = subsumed
+                else:
+                    # Execute
+                    if ir is not None:
+                        query_str = self.connector.push_down(query_str, ir)
+                        if query_str != step_info["parsed_query"]:
+                            step_info["executed_query"] = query_str
+                    operation_type = "read" if is_safe else "write"
+                    local_result = view_result = None
+                    if operation_type == "read" and not page_size and ir is not None and self.views is not None:
+                        view_result = self._answer_from_views(ir)
+                    if operation_type == "read" and not page_size and view_result is None:
+                        local_result = self.connector.answer_locally(query_str, ir)
+                    if view_result is not None:
+                        step_info["materialized_view"] = view_result.raw_response
+                        exec_result = view_result
+                    elif local_result is not None:
+                        step_info["answered_locally"] = True
+                        exec_result = local_result
+                    else:
+                        exec_result = self._execute(query_str, ir, operation_type, db_type, page_size, step_info)
                 step_info["execution"] = exec_result
                 
                 if exec_result.status == "success":
                     result_log["success"] = True
                     result_log["final_result"] = exec_result.payload
+                    result_log["continuation"] = exec_result.continuation
                     result_log["steps"].append(step_info)
-                    self.cache.set(nlq, db_type, result_log) # Cache result
+                    if page_size is None:
+                        self.cache.set(nlq, db_type, result_log) # Cache result
+                    if self.workload_log and ir is not None and "ir_cache_hit" not in step_info and "answered_locally" not in step_info \
+                            and "materialized_view" not in step_info:
+                        try:
+                            self.workload_log.record(db_type, ir, step_info.get("executed_query", query_str),
+                                                     exec_result.execution_time_ms, opt_tips)
+                        except Exception as e:
+                            print(f"⚠️ Workload log write failed: {e}")
+                    if cacheable and exec_result.continuation is None:
+                        self.result_cache.set(ir, db_type, exec_result, step_info["parsed_query"])
+                    elif not is_safe:
+                        # Data may have changed; previously executed results are stale
+                        self.result_cache.clear()
+                        if self.views is not None:
+                            self._invalidate_views(ir)
                     return result_log
                 else:
                     # Execution failed
-                    error_history.append({"query": query_str, "error": exec_result.error_message})
+                    error_history.append({"query": step_info.get("executed_query", query_str), "error": exec_result.error_message})
             
             except json.JSONDecodeError:
                 error_history.append({"query": "JSON_PARSE_ERROR", "error": "LLM output was not valid JSON"})
@@ -140,6 +309,9 @@ For HBase: Query is JSON instruction.
                 result_log["steps"].append(step_info)
                 result_log["error"] = f"Safety Blocked: {e}"
                 return result_log # Stop on safety violation
+            except CostGuardViolation as e:
+                step_info["plan"] = e.plan.summary()
+                error_history.append({"query": query_str, "error": str(e), "plan": e.plan.summary()})
             except Exception as e:
                 error_history.append({"query": "UNKNOWN", "error": str(e)})
             
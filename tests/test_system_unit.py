@@ -1,7 +1,225 @@
+import base64
+import contextlib
+import json
+import os
+import queue
+import shutil
+import socket
+import subprocess
+import tempfile
+import time
 import unittest
+from unittest import mock
+import rdflib
+from redis.exceptions import ResponseError
 from src.validation.policy import PolicyValidator, SafetyException
-from src.ir.models import QueryIR
-from src.connectors.rdf import RdfConnector
+from src.ir.models import FilterCondition, QueryIR
+from src.connectors.rdf import RdfConnector, open_graph
+from src.connectors.mongo import MongoConnector
+from src.connectors.base import BaseConnector, DatabaseMetadata, ExecutionResult, PlanEstimate, encode_token
+from src.ir.canonical import ir_fingerprint, parse_ir
+from src.ir.subsumption import subsumes
+from src.engine.local import can_evaluate, evaluate, match_filter
+from src.engine.aggregate import aggregate
+from src.pipeline.smart import SmartPipeline
+from src.pipeline.federated import FederatedPipeline
+from src.engine.join import hash_join
+from src.pipeline.router import DatabaseRouter
+from src.connectors.neo4j import Neo4jConnector
+from src.connectors.redis import RedisConnector, KeyspaceProfiler, tracked_keys
+from src.optimization.cost_guard import QueryCostGuard
+from src.optimization.rewriter import rewrite_mongo, rewrite_cypher, TextMatchRewriter
+from src.optimization.workload import WorkloadLog
+from src.optimization.views import AggregateView, MaterializedViews, detect_views
+from src.optimization.advisor import IndexAdvisor, IndexRecommendation, covered
+from src.optimization.setup_indexes import apply_recommendations
+from src.optimization.shapes import parameterize_cypher, parameterize_sparql, plan_shape
+from src.engine.graph import parse_traversal
+from src.connectors.hbase import HBaseConnector
+from src.connectors.hbase_index import BUILT_MARKER, DEFAULT_INDEXES, ensure_index_tables
+from src.ingest.records import iter_records
+from src.ingest.pipeline import Sink, ingest, main as ingest_main
+from src.ingest.rdf_loader import RdfSink, load as load_rdf, movie_triples
+from src.ingest.synthetic import SyntheticCatalog
+
+
+class FakeLLM:
+    """Returns canned responses in order (last one repeats)."""
+    def __init__(self, *responses):
+        self.responses = list(responses)
+
+    def generate(self, prompt, system_instruction=None):
+        if len(self.responses) > 1:
+            return self.responses.pop(0)
+        return self.responses[0]
+
+
+class FakeRAG:
+    def retrieve(self, nlq, db_type, k=3):
+        return []
+
+
+class FakeConnector(BaseConnector):
+    def __init__(self, payload=None, db_type="mongodb"):
+        super().__init__("fake://")
+        self.payload = payload if payload is not None else []
+        self.db_type = db_type
+        self.executed = []
+
+    def connect(self):
+        self.connected = True
+
+    def get_metadata(self):
+        return DatabaseMetadata(db_type=self.db_type, schema_summary={})
+
+    def execute(self, query, operation_type="read"):
+        self.executed.append(query)
+        return ExecutionResult(status="success", payload=self.payload, raw_response=None)
+
+    def close(self):
+        pass
+
+
+def llm_response(ir, query="{}"):
+    return json.dumps({"ir": ir, "query": query})
+
+
+class FakeRedisPipeline:
+    """Queues client calls; execute() runs them in order and records the pipeline on the client."""
+    def __init__(self, client, transaction):
+        self.client, self.transaction, self.queued = client, transaction, []
+
+    def __getattr__(self, name):
+        return lambda *args: self.queued.append((name, args))
+
+    @property
+    def commands(self):
+        return [list(args) for name, args in self.queued if name == "execute_command"]
+
+    def execute(self, raise_on_error=True):
+        self.client.pipelines.append(self)
+        return [self.client.run(*args) if name == "execute_command" else getattr(self.client, name)(*args)
+                for name, args in self.queued]
+
+
+class FakeRedisClient:
+    """In-memory redis.Redis stand-in: `store` holds strings and hashes (dicts), SCAN pages of 4 keys."""
+    def __init__(self, store=None, memory_disabled=()):
+        self.store = dict(store or {})
+        self.memory_disabled = set(memory_disabled)
+        self.pipelines, self.single = [], []
+
+    def pipeline(self, transaction=True):
+        return FakeRedisPipeline(self, transaction)
+
+    def run(self, command, *args):
+        if command == "MGET":
+            return [self.get(k) for k in args]
+        if command == "HGETALL":
+            return self.hgetall(args[0])
+        return self.get(args[0])
+
+    def execute_command(self, *args):
+        self.single.append(list(args))
+        return self.run(*args)
+
+    def scan(self, cursor=0, count=10):
+        keys, end = list(self.store), cursor + 4  # Small pages: a full pass takes several SCAN calls
+        return (end if end < len(keys) else 0), keys[cursor:end]
+
+    def type(self, key):
+        return "hash" if isinstance(self.store.get(key), dict) else "string"
+
+    def memory_usage(self, key):
+        return ResponseError("MEMORY disabled") if key in self.memory_disabled else 64
+
+    def get(self, key):
+        return self.store.get(key)
+
+    def set(self, key, value):
+        self.store[key] = value
+
+    def delete(self, *keys):
+        for key in keys:
+            self.store.pop(key, None)
+
+    def hincrby(self, key, field, amount):
+        self.store.setdefault(key, {})[field] = self.store.get(key, {}).get(field, 0) + amount
+
+    hincrbyfloat = hincrby
+
+    def hgetall(self, key):
+        return {k: str(v) for k, v in self.store.get(key, {}).items()}
+
+
+class FakeHBaseTable:
+    """happybase.Table over one `store` entry: {row_key: {column: value}}, calls recorded."""
+    def __init__(self, store, name):
+        self.store, self.name = store, name
+        self.scans, self.gets, self.multi_gets = [], [], []
+
+    def _rows(self):
+        return self.store.setdefault(self.name, {})
+
+    def scan(self, row_start=None, row_stop=None, limit=None, **kwargs):
+        self.scans.append(dict(kwargs, **{k: v for k, v in (("row_start", row_start), ("row_stop", row_stop),
+                                                              ("limit", limit)) if v is not None}))
+        keys = [k for k in sorted(self._rows()) if (row_start is None or k >= row_start)
+                and (row_stop is None or k < row_stop)]
+        return iter([(k, self._rows()[k]) for k in keys][:limit])
+
+    def row(self, key, columns=None):
+        self.gets.append((key, columns))
+        return {c: v for c, v in self._rows().get(key, {}).items() if not columns or c in columns}
+
+    def rows(self, keys, columns=None):
+        self.multi_gets.append((keys, columns))
+        return [(k, {c: v for c, v in self._rows()[k].items() if not columns or c in columns})
+                for k in keys if k in self._rows()]
+
+    def put(self, key, data):
+        self._rows().setdefault(key, {}).update(data)
+
+    def delete(self, key):
+        self._rows().pop(key, None)
+
+    def batch(self, batch_size=None):
+        table, queued = self, []
+
+        class Batch:
+            def put(self, key, data):
+                queued.append(lambda: table.put(key, data))
+
+            def delete(self, key):
+                queued.append(lambda: table.delete(key))
+
+            def send(self):
+                for mutation in queued:
+                    mutation()
+        return Batch()
+
+
+class FakeHBasePool:
+    """happybase.ConnectionPool stand-in lending itself as the connection; counts borrows."""
+    def __init__(self, names=("movies",), store=None):
+        self.store, self.names, self.tables_ = dict(store or {}), list(names), {}
+        self.borrowed, self.lent = 0, 0
+
+    @contextlib.contextmanager
+    def connection(self, timeout=None):
+        self.borrowed += 1
+        self.lent += 1
+        try:
+            yield self
+        finally:
+            self.lent -= 1
+
+    def tables(self):
+        return [n.encode() for n in self.names]
+
+    def table(self, name):
+        return self.tables_.setdefault(name, FakeHBaseTable(self.store, name))
+
 
 class TestSystemUnit(unittest.TestCase):
 
@@ -52,5 +270,1014 @@ class TestSystemUnit(unittest.TestCase):
         self.assertEqual(res.status, "success")
         self.assertTrue(len(res.payload) > 0)
 
+    def test_ir_fingerprint_paraphrases(self):
+        a = QueryIR(intent="FIND", target_collection="movies", filters=[
+            {"field": "title", "operator": "eq", "value": "Inception"},
+            {"field": "year", "operator": ">", "value": 2000},
+        ])
+        b = QueryIR(intent="find", target_collection="Movies ", filters=[
+            {"field": "Year", "operator": "$gt", "value": 2000.0},
+            {"field": "title", "operator": "==", "value": "Inception"},
+        ])
+        self.assertEqual(ir_fingerprint(a, "mongodb"), ir_fingerprint(b, "mongodb"))
+        self.assertNotEqual(ir_fingerprint(a, "mongodb"), ir_fingerprint(a, "neo4j"))
+
+        # Literals keep their case and type: they can match different rows
+        for value in ("inception", " Inception"):
+            other = parse_ir(dict(a.model_dump(), filters=[{"field": "title", "operator": "eq", "value": value},
+                                                            a.filters[1].model_dump()]))
+            self.assertNotEqual(ir_fingerprint(a, "mongodb"), ir_fingerprint(other, "mongodb"))
+        year_text = parse_ir(dict(a.model_dump(), filters=[a.filters[0].model_dump(),
+                                                           {"field": "year", "operator": "gt", "value": "2000"}]))
+        self.assertNotEqual(ir_fingerprint(a, "mongodb"), ir_fingerprint(year_text, "mongodb"))
+
+        # The generated query is part of the key (JSON key order and outer spacing aside)
+        self.assertEqual(ir_fingerprint(a, "mongodb", '{"collection": "movies", "operation": "find"}'),
+                         ir_fingerprint(a, "mongodb", ' {"operation": "find", "collection": "movies"}'))
+        self.assertNotEqual(ir_fingerprint(a, "mongodb", '{"collection": "movies", "operation": "find"}'),
+                            ir_fingerprint(a, "mongodb", '{"collection": "movies", "operation": "count_documents"}'))
+
+        c = QueryIR(intent="FIND", target_collection="movies", filters=a.filters, limit=5)
+        self.assertNotEqual(ir_fingerprint(a, "mongodb"), ir_fingerprint(c, "mongodb"))
+
+    def test_pipeline_ir_cache_shares_paraphrases(self):
+        ir = {"intent": "FIND", "target_collection": "movies", "is_safe": True,
+              "filters": [{"field": "title", "operator": "eq", "value": "Inception"}]}
+        paraphrase = dict(ir, target_collection="Movies", filters=[{"field": "Title", "operator": "=", "value": "Inception"}])
+        connector = FakeConnector(payload=[{"title": "Inception", "director": "Christopher Nolan"}])
+        pipeline = SmartPipeline(connector, FakeLLM(llm_response(ir), llm_response(paraphrase),
+                                                    llm_response(ir, '{"collection": "movies"}')), FakeRAG())
+
+        first = pipeline.run("Who directed Inception?")
+        second = pipeline.run("inception's director")
+        self.assertTrue(second["success"])
+        self.assertEqual(first["final_result"], second["final_result"])
+        self.assertEqual(len(connector.executed), 1)
+        self.assertTrue(second["steps"][-1].get("ir_cache_hit"))
+        # Same IR, different generated query: no exact hit (only the IR-level subsumption check applies)
+        third = pipeline.run("Director of Inception")
+        self.assertNotEqual(third["steps"][-1].get("ir_cache_hit"), True)
+        self.assertNotEqual(third["steps"][-1]["ir_hash"], second["steps"][-1]["ir_hash"])
+
+    def test_ir_subsumption(self):
+        broad = QueryIR(intent="FIND", target_collection="movies",
+                        filters=[{"field": "rating", "operator": "gt", "value": 8}])
+        narrow = QueryIR(intent="FIND", target_collection="movies", filters=[
+            {"field": "rating", "operator": "gt", "value": 8.5},
+            {"field": "director", "operator": "contains", "value": "Nolan"},
+        ])
+        self.assertTrue(subsumes(broad, narrow))
+        self.assertFalse(subsumes(narrow, broad))
+        wider = QueryIR(intent="FIND", target_collection="movies",
+                        filters=[{"field": "rating", "operator": "gte", "value": 7}])
+        self.assertFalse(subsumes(broad, wider))
+        limited = QueryIR(intent="FIND", target_collection="movies", filters=broad.filters, limit=3)
+        self.assertFalse(subsumes(limited, narrow))
+
+        # Local evaluation keeps the stores' literal semantics: case- and type-sensitive
+        rows = [{"title": "Inception", "year": 2010}, {"title": "inception", "year": "2010"}]
+        exact = QueryIR(intent="FIND", target_collection="movies",
+                        filters=[{"field": "title", "operator": "eq", "value": "Inception"}])
+        self.assertEqual(evaluate(rows, exact), [rows[0]])
+        self.assertFalse(can_evaluate(rows, QueryIR(intent="FIND", target_collection="movies",
+                                                    filters=[{"field": "year", "operator": "eq", "value": 2010}])))
+        self.assertFalse(match_filter(rows[0], FilterCondition(field="title", operator="contains", value="incep")))
+        self.assertTrue(match_filter(rows[1], FilterCondition(field="year", operator="eq", value=2010), exact=False))
+
+    def test_pipeline_answers_narrower_query_from_cache(self):
+        movies = [
+            {"title": "Inception", "director": "Christopher Nolan", "rating": 8.8},
+            {"title": "The Dark Knight", "director": "Christopher Nolan", "rating": 9.0},
+            {"title": "The Godfather", "director": "Francis Ford Coppola", "rating": 9.2},
+            {"title": "Fight Club", "director": "David Fincher", "rating": 8.1},
+        ]
+        broad = {"intent": "FIND", "target_collection": "movies", "is_safe": True,
+                 "filters": [{"field": "rating", "operator": "gt", "value": 8}]}
+        narrow = {"intent": "FIND", "target_collection": "movies", "is_safe": True,
+                  "filters": [{"field": "rating", "operator": "gt", "value": 8.5},
+                              {"field": "director", "operator": "eq", "value": "Christopher Nolan"}],
+                  "return_fields": ["title"], "sort_field": "rating", "sort_order": "DESC"}
+        connector = FakeConnector(payload=movies)
+        pipeline = SmartPipeline(connector, FakeLLM(llm_response(broad), llm_response(narrow)), FakeRAG())
+
+        pipeline.run("movies with rating > 8")
+        result = pipeline.run("movies with rating > 8.5 directed by Nolan")
+        self.assertEqual(len(connector.executed), 1)
+        self.assertEqual(result["final_result"], [{"title": "The Dark Knight"}, {"title": "Inception"}])
+
+        # No is_safe flag: runs as a write, so it is neither cached nor served from cache, and clears it
+        unflagged = dict(broad)
+        del unflagged["is_safe"]
+        pipeline = SmartPipeline(connector, FakeLLM(llm_response(broad), llm_response(unflagged)), FakeRAG())
+        pipeline.run("movies with rating > 8")
+        result = pipeline.run("movies rated above 8")
+        self.assertNotIn("ir_cache_hit", result["steps"][-1])
+        self.assertEqual(len(connector.executed), 3)
+        self.assertEqual(pipeline.result_cache.cache, {})
+
+    def test_client_side_aggregation(self):
+        # HBase scan rows: qualifiers prefixed by family, values as strings
+        rows = [
+            {"row_key": "1", "info:genre": "Sci-Fi", "info:rating": "8.8"},
+            {"row_key": "2", "info:genre": "Crime", "info:rating": "9.2"},
+            {"row_key": "3", "info:genre": "Sci-Fi", "info:rating": "8.7"},
+            {"row_key": "4", "info:genre": "Drama", "info:rating": "n/a"},
+        ]
+        ir = QueryIR(intent="AGGREGATE", target_collection="movies",
+                     aggregations=[{"type": "group", "group_by": "genre"},
+                                   {"type": "count"}, {"type": "avg", "field": "rating"}],
+                     sort_field="count", sort_order="DESC", limit=2)
+        result = aggregate(rows, ir)
+        self.assertEqual([r["genre"] for r in result], ["Sci-Fi", "Crime"])
+        self.assertEqual(result[0]["count"], 2)
+        self.assertAlmostEqual(result[0]["avg_rating"], 8.75)
+
+        # Redis MGET payload: plain values
+        total = aggregate(["3", "4", None], QueryIR(intent="AGGREGATE", target_collection="views",
+                                                    aggregations=[{"type": "sum", "field": "value"}]))
+        self.assertEqual(total, [{"sum_value": 7.0}])
+
+        # Aggregating HBase scans drop the implicit 10-row limit; truncated fetches are refused
+        scan = '{"table": "movies", "operation": "scan", "args": {"columns": ["info:genre"]}}'
+        self.assertIsNone(json.loads(HBaseConnector().push_down(scan, ir))["args"]["limit"])
+        self.assertEqual(HBaseConnector().push_down(scan, QueryIR(intent="FIND", target_collection="movies")), scan)
+
+        class TruncatingHBase(FakeConnector):
+            supports_aggregation = False
+
+            def execute(self, query, operation_type="read"):
+                self.executed.append(query)
+                return ExecutionResult(status="success", payload=rows, raw_response=None, truncated=True)
+
+        pipeline = SmartPipeline(TruncatingHBase(db_type="hbase"), FakeLLM(llm_response(
+            dict(ir.model_dump(), is_safe=True))), FakeRAG())
+        result = pipeline.run("How many movies per genre?")
+        self.assertFalse(result["success"])
+        self.assertIn("truncated", result["steps"][0]["execution"].error_message)
+
+    def test_hash_join(self):
+        movies = [{"id": 1, "title": "Inception"}, {"id": 3, "title": "The Dark Knight"}, {"id": 9, "title": "Fight Club"}]
+        views = [{"id": "3", "views": "12"}, {"id": "1", "views": "40"}]
+        joined = hash_join(movies, views, "id", "id")
+        self.assertEqual([r["title"] for r in joined], ["Inception", "The Dark Knight"])
+        self.assertEqual(joined[0]["views"], "40")
+        self.assertEqual(len(hash_join(movies, views, "id", "id", how="left")), 3)
+
+    def test_federated_pipeline_joins_mongo_and_redis(self):
+        class FakeRedis(FakeConnector):
+            def execute(self, query, operation_type="read"):
+                self.executed.append(query)
+                commands, _ = RedisConnector.parse_commands(query)
+                keys = commands[0][1:]
+                return ExecutionResult(status="success", payload=[str(len(k)) for k in keys], raw_response=None)
+
+        mongo = FakeConnector(payload=[{"_id": "a", "id": 1, "title": "Inception"},
+                                       {"_id": "b", "id": 3, "title": "The Dark Knight"}])
+        redis = FakeRedis(db_type="redis")
+        plan = {"subqueries": [
+            {"db_type": "mongodb", "intent": "FIND", "target_collection": "movies", "join_keys": ["id"],
+             "query": '{"collection": "movies", "operation": "find", "args": {"filter": {"director": "Christopher Nolan"}}}'},
+            {"db_type": "redis", "intent": "FIND", "target_collection": "views", "join_keys": ["id"],
+             "key_template": "movie:{id}:views", "value_field": "views"},
+        ]}
+        pipeline = FederatedPipeline({"mongodb": mongo, "redis": redis}, FakeLLM(json.dumps(plan)))
+        result = pipeline.run("view counts for all Nolan movies")
+        self.assertTrue(result["success"])
+        self.assertEqual(redis.executed, ["MGET movie:1:views movie:3:views"])
+        self.assertEqual([(r["title"], r["views"]) for r in result["final_result"]],
+                         [("Inception", "13"), ("The Dark Knight", "13")])
+
+        # Title join keys contain spaces: each key stays one MGET argument
+        plan["subqueries"][0]["join_keys"] = ["title"]
+        plan["subqueries"][1].update(join_keys=["title"], key_template="views:{title}")
+        redis.executed.clear()
+        result = FederatedPipeline({"mongodb": mongo, "redis": redis}, FakeLLM(json.dumps(plan))).run("Nolan views")
+        self.assertEqual(redis.executed, ["MGET views:Inception 'views:The Dark Knight'"])
+        self.assertEqual([(r["title"], r["views"]) for r in result["final_result"]],
+                         [("Inception", "15"), ("The Dark Knight", "21")])
+
+        # A truncated input fails the plan instead of joining a partial result
+        class CappedConnector(FakeConnector):
+            def execute(self, query, operation_type="read"):
+                self.executed.append(query)
+                return ExecutionResult(status="success", payload=self.payload, raw_response=None, truncated=True)
+
+        capped = FederatedPipeline({"mongodb": CappedConnector(payload=mongo.payload), "redis": redis},
+                                   FakeLLM(json.dumps(plan)))
+        with self.assertRaisesRegex(RuntimeError, "truncated at 2 rows"):
+            capped.execute(capped.plan("Nolan views"))
+        self.assertFalse(capped.run("Nolan views")["success"])
+        # ... unless the driving subquery stopped at the question's own top-N limit
+        plan["subqueries"][0]["limit"] = 2
+        capped.llm = FakeLLM(json.dumps(plan))
+        self.assertTrue(capped.run("top 2 Nolan views")["success"])
+
+    def test_router_ranks_and_falls_back(self):
+        class SchemaConnector(FakeConnector):
+            def __init__(self, db_type, schema):
+                super().__init__(db_type=db_type)
+                self.schema = schema
+
+            def get_metadata(self):
+                return DatabaseMetadata(db_type=self.db_type, schema_summary=self.schema)
+
+        class StubPipeline:
+            def __init__(self, success):
+                self.success = success
+                self.calls = 0
+
+            def run(self, nlq):
+                self.calls += 1
+                return {"success": self.success, "steps": [], "final_result": [] if self.success else None}
+
+        connectors = {
+            "mongodb": SchemaConnector("mongodb", {"collections": {"movies": {"fields": ["title", "director", "genre"]}}}),
+            "neo4j": SchemaConnector("neo4j", {"nodes": ["Movie", "Actor", "Director"], "relationships": ["ACTED_IN", "DIRECTED"]}),
+            "redis": SchemaConnector("redis", {"key_patterns": ["movie:{id}:views"]}),
+        }
+        router = DatabaseRouter(connectors, stats_path=None)
+        self.assertEqual(router.rank("What movies did Leonardo DiCaprio act in?")[0]["db"], "neo4j")
+        self.assertEqual(router.rank("How many views does movie:1 have?")[0]["db"], "redis")
+
+        pipelines = {"neo4j": StubPipeline(False), "mongodb": StubPipeline(True), "redis": StubPipeline(True)}
+        runs = router.run("What movies did Leonardo DiCaprio act in?", pipelines, top_k=1)
+        self.assertEqual([r["db"] for r in runs], ["neo4j", "mongodb"])
+        self.assertEqual(runs[1]["fallback_for"], "neo4j")
+        self.assertEqual(pipelines["redis"].calls, 0)
+        self.assertEqual(router.stats["neo4j"]["TRAVERSAL"]["successes"], 0)
+
+    def test_paged_execution_with_continuation(self):
+        ir = {"intent": "FIND", "target_collection": "movies"}
+        connector = FakeConnector(payload=[{"id": i} for i in range(5)])
+        pipeline = SmartPipeline(connector, FakeLLM(llm_response(ir)), FakeRAG())
+
+        result = pipeline.run("all movies", page_size=2)
+        self.assertEqual(result["final_result"], [{"id": 0}, {"id": 1}])
+        pages = [result["final_result"]]
+        token = result["continuation"]
+        while token:
+            page = pipeline.fetch_more(token, page_size=2)
+            pages.append(page.payload)
+            token = page.continuation
+        self.assertEqual([len(p) for p in pages], [2, 2, 1])
+
+        # A cached whole result does not answer a paged run
+        safe = SmartPipeline(connector, FakeLLM(llm_response(dict(ir, is_safe=True))), FakeRAG())
+        self.assertEqual(len(safe.run("every movie")["final_result"]), 5)
+        paged = safe.run("every movie", page_size=2)
+        self.assertEqual((paged["final_result"], paged["steps"][-1].get("ir_cache_hit")), ([{"id": 0}, {"id": 1}], None))
+        self.assertIsNotNone(paged["continuation"])
+
+        # Neo4j pages over a deterministic order: the returned columns break ties
+        self.assertEqual(Neo4jConnector._paged_query("MATCH (m:Movie) RETURN m.title, m.year AS year"),
+                         "MATCH (m:Movie) RETURN m.title, m.year AS year ORDER BY m.title, year "
+                         "SKIP $page_skip LIMIT $page_limit")
+        self.assertEqual(Neo4jConnector._paged_query(
+            "MATCH (m:Movie {title: 'A, B'}) RETURN m.title AS title ORDER BY m.rating DESC LIMIT 10;"),
+            "CALL { MATCH (m:Movie {title: 'A, B'}) RETURN m.title AS title ORDER BY m.rating DESC, title LIMIT 10 } "
+            "RETURN * SKIP $page_skip LIMIT $page_limit")
+        with self.assertRaisesRegex(ValueError, "RETURN \\*"):
+            Neo4jConnector._paged_query("MATCH (m) RETURN *")
+
+        # Tokens are signed, and the resumed query is re-validated
+        forged = base64.urlsafe_b64encode(json.dumps({"q": "FLUSHALL", "offset": 0}).encode()).decode()
+        executed = len(connector.executed)
+        self.assertEqual(pipeline.fetch_more(forged).error_message, "Invalid continuation token")
+        self.assertEqual(len(connector.executed), executed)
+        redis_pipeline = SmartPipeline(FakeConnector(db_type="redis"), FakeLLM(llm_response(ir)), FakeRAG())
+        blocked = redis_pipeline.fetch_more(encode_token({"q": "FLUSHALL", "offset": 0}))
+        self.assertTrue(blocked.error_message.startswith("Safety Blocked"))
+        self.assertEqual(redis_pipeline.connector.executed, [])
+
+        # RDF pages natively over the SPARQL result
+        conn = RdfConnector("memory")
+        conn.connect()
+        first = conn.execute_page("SELECT ?s ?p ?o WHERE { ?s ?p ?o }", page_size=3)
+        rest = conn.execute_page(None, page_size=3, continuation=first.continuation)
+        self.assertEqual(len(first.payload) + len(rest.payload), 4)
+        self.assertIsNone(rest.continuation)
+
+    def test_mongo_projection_pushdown_and_single_pass_sanitize(self):
+        conn = MongoConnector()
+        conn._fields["movies"] = {"_id", "title", "director", "year"}
+        ir = QueryIR(intent="FIND", target_collection="movies", return_fields=["title"])
+        query = json.dumps({"collection": "movies", "operation": "find", "args": {"filter": {"year": 1999}}})
+        pushed = json.loads(conn.push_down(query, ir))
+        self.assertEqual(pushed["args"]["projection"], {"title": 1, "_id": 0})
+
+        # Unknown fields are never pushed (would blank out documents)
+        unknown = QueryIR(intent="FIND", target_collection="movies", return_fields=["movie_title"])
+        self.assertEqual(conn.push_down(query, unknown), query)
+
+        docs, raw = conn._drain(iter([{"_id": object(), "title": "Heat"}]))
+        self.assertIsInstance(docs[0]["_id"], str)
+        self.assertIsNone(raw)
+
+    def test_cost_guard_bounds_or_rejects_expensive_plans(self):
+        class ExplainingConnector(FakeConnector):
+            explains = 0
+
+            def explain(self, query):
+                self.explains += 1
+                return PlanEstimate(examined=50_000, stages=["NodeByLabelScan", "Filter"], full_scan=True)
+
+            bound_query = Neo4jConnector.bound_query
+
+        ir = {"intent": "FIND", "target_collection": "Movie", "is_safe": True}
+        connector = ExplainingConnector(payload=[{"title": "Heat"}], db_type="neo4j")
+        guard = QueryCostGuard(max_examined=1_000, default_limit=10)
+        pipeline = SmartPipeline(connector, FakeLLM(
+            llm_response(ir, "MATCH (m:Movie) WHERE m.year = 1995 RETURN m.title"),
+            llm_response(ir, "MATCH (m:Movie) WHERE m.year = 1999 RETURN m.title")), FakeRAG(), cost_guard=guard)
+
+        first = pipeline.run("Movies from 1995")
+        pipeline.run("Movies from 1999")
+        self.assertTrue(first["success"])
+        self.assertEqual(connector.executed[0], "MATCH (m:Movie) WHERE m.year = 1995 RETURN m.title LIMIT 10")
+        self.assertIn("NodeByLabelScan", first["steps"][-1]["cost_guard"])
+        self.assertEqual(connector.explains, 1)  # Same query shape: plan reused
+        # Limits, sort and regex anchoring decide the cost: they are not folded into one plan
+        def regex_find(pattern, limit):
+            return json.dumps({"collection": "movies", "operation": "find",
+                               "args": {"filter": {"title": {"$regex": pattern}}, "limit": limit}})
+        self.assertEqual(plan_shape(regex_find("^Inc", 5)), plan_shape(regex_find("^Hea", 5)))
+        self.assertNotEqual(plan_shape(regex_find("^Inc", 5)), plan_shape(regex_find("ception", 5)))
+        self.assertNotEqual(plan_shape(regex_find("^Inc", 5)), plan_shape(regex_find("^Inc", 0)))
+        self.assertNotEqual(plan_shape("MATCH (m) RETURN m LIMIT 5"), plan_shape("MATCH (m) RETURN m LIMIT 50000"))
+        guard.estimate(connector, "MATCH (m:Movie) WHERE m.year = 1995 RETURN m.title LIMIT 50000")
+        self.assertEqual(connector.explains, 2)
+
+        # Reject mode: the plan summary is fed back to the LLM and nothing runs
+        rejecting = SmartPipeline(ExplainingConnector(db_type="neo4j"), FakeLLM(llm_response(ir, "MATCH (m) RETURN m")),
+                                  FakeRAG(), cost_guard=QueryCostGuard(max_examined=1_000, action="reject"))
+        result = rejecting.run("Everything")
+        self.assertFalse(result["success"])
+        self.assertEqual(rejecting.connector.executed, [])
+        self.assertIn("~50,000 examined", result["steps"][-1]["plan"])
+
+        # Mongo finds: the implicit 10-row limit is kept, only larger limits are capped
+        def find(**args):
+            return json.dumps({"collection": "movies", "operation": "find", "args": dict(filter={}, **args)})
+
+        class FakeDb:
+            def command(self, *args, **kwargs):
+                return {"queryPlanner": {"winningPlan": {"stage": "LIMIT", "inputStage": {"stage": "COLLSCAN"}}}}
+
+            def __getitem__(self, name):
+                return type("Collection", (), {"estimated_document_count": lambda self: 50_000})()
+
+        mongo = MongoConnector.__new__(MongoConnector)
+        mongo.db, mongo.connected, mongo.explain_verbosity = FakeDb(), True, "queryPlanner"
+        mongo.index_information = lambda collection: {}
+        scan = PlanEstimate(examined=50_000, stages=["COLLSCAN"], full_scan=True)
+        self.assertIsNone(mongo.bound_query(find(), scan, 100))
+        self.assertEqual(json.loads(mongo.bound_query(find(limit=500), scan, 100))["args"]["limit"], 100)
+        self.assertEqual(json.loads(mongo.bound_query(find(limit=0), scan, 100))["args"]["limit"], 100)
+        # A limited full scan stops early; an unlimited one reads the collection
+        self.assertEqual(mongo.explain(find()).examined, 10)
+        self.assertEqual(mongo.explain(find(limit=0)).examined, 50_000)
+
+    def test_text_match_rewrites_use_existing_indexes(self):
+        indexes = {
+            "_id_": {"key": [("_id", 1)]},
+            "title_text_genre_text": {"key": [("_fts", "text"), ("_ftsx", 1)], "weights": {"title": 1, "genre": 1}},
+            "director_ci": {"key": [("director", 1)], "collation": {"locale": "en", "strength": 2}},
+        }
+        def mongo(filter_):
+            return json.dumps({"collection": "movies", "operation": "find", "args": {"filter": filter_}})
+
+        exact, kind = rewrite_mongo(mongo({"director": {"$regex": "^christopher nolan$", "$options": "i"}}), indexes)
+        self.assertEqual(kind, "collation")
+        self.assertEqual(json.loads(exact)["args"]["filter"], {"director": "christopher nolan"})
+
+        text, kind = rewrite_mongo(mongo({"title": {"$regex": "Dark Knight", "$options": "i"}}), indexes)
+        self.assertEqual(json.loads(text)["args"]["filter"]["$text"], {"$search": '"Dark Knight"'})
+        self.assertIn("title", json.loads(text)["args"]["filter"])  # Regex kept: no false positives
+        # No matching index, stop words, or $or: left alone
+        self.assertIsNone(rewrite_mongo(mongo({"plot": {"$regex": "heist", "$options": "i"}}), indexes))
+        self.assertIsNone(rewrite_mongo(mongo({"title": {"$regex": "the", "$options": "i"}}), indexes))
+
+        fulltext = [{"name": "movie_title_fulltext", "labels": ["Movie"], "properties": ["title"]}]
+        cypher = "MATCH (m:Movie) WHERE toLower(m.title) CONTAINS toLower('Dark Knight') RETURN m.title"
+        rewritten, _ = rewrite_cypher(cypher, fulltext)
+        self.assertEqual(rewritten, "CALL db.index.fulltext.queryNodes('movie_title_fulltext', '*dark* AND *knight*') "
+                                    "YIELD node AS m " + cypher)
+        self.assertIsNone(rewrite_cypher("MATCH (m:Movie) WHERE m.title CONTAINS 'x' OR m.year = 1 RETURN m", fulltext))
+        self.assertIsNone(rewrite_cypher("MATCH (p:Person) WHERE p.name CONTAINS 'Nolan' RETURN p", fulltext))
+
+        # Containment on a sample, once per shape: capped counts would agree, the ids do not
+        class SampledConnector(FakeConnector):
+            def __init__(self, original, rewritten):
+                super().__init__(db_type="neo4j")
+                self.original, self.rewritten, self.samples = original, rewritten, []
+
+            def fulltext_indexes(self):
+                return fulltext
+
+            def sample_ids(self, query, limit, ids=None, key=None):
+                self.samples.append(key)
+                rows = self.rewritten if query.startswith("CALL") else self.original
+                return [r for r in rows if ids is None or r in ids][:limit]
+
+        heat = cypher.replace("Dark Knight", "Heat")
+        lossy = SampledConnector(list(range(200)), [i for i in range(200) if i != 7])  # e.g. 'night' misses 'Knight'
+        self.assertEqual(TextMatchRewriter(sample_size=100).rewrite(lossy, "neo4j", heat), (heat, None))
+        exact = SampledConnector(list(range(200)), list(range(200)))
+        rewriter = TextMatchRewriter(sample_size=100)
+        self.assertEqual(rewriter.rewrite(exact, "neo4j", heat)[1], "Rewritten to use a fulltext index")
+        self.assertEqual(exact.samples, ["m"] * 4)
+        rewriter.rewrite(exact, "neo4j", cypher.replace("Dark Knight", "Alien"))
+        self.assertEqual(len(exact.samples), 4)  # Same shape: verdict reused, no new scan
+        empty = SampledConnector([], [])
+        rewriter = TextMatchRewriter()
+        self.assertEqual(rewriter.rewrite(empty, "neo4j", heat), (heat, None))
+        rewriter.rewrite(empty, "neo4j", heat)
+        self.assertEqual(len(empty.samples), 2)  # Inconclusive: verified again next time
+
+        # The cost guard never hints an index next to $text (the server rejects it)
+        class IndexedMongo(FakeConnector):
+            bound_query = MongoConnector.bound_query
+
+            def index_information(self, collection):
+                return {"title_1": {"key": [("title", 1)]}}
+
+        plan = PlanEstimate(examined=50_000, stages=["COLLSCAN"], full_scan=True)
+        bounded = json.loads(IndexedMongo().bound_query(text, plan, 5))
+        self.assertNotIn("hint", bounded["args"])
+        self.assertEqual(json.loads(IndexedMongo().bound_query(mongo({"title": "Heat"}), plan, 5))["args"]["hint"],
+                         "title_1")
+
+    def test_workload_log_drives_index_advice(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            log = WorkloadLog(os.path.join(tmp, "workload.jsonl"))
+            ir = {"intent": "FIND", "target_collection": "movies", "sort_field": "rating", "sort_order": "DESC",
+                  "is_safe": True, "filters": [{"field": "year", "operator": ">=", "value": 2000},
+                              {"field": "director", "operator": "eq", "value": "Christopher Nolan"}]}
+            pipeline = SmartPipeline(FakeConnector(payload=[]), FakeLLM(llm_response(ir)), FakeRAG(), workload_log=log)
+            pipeline.run("Nolan movies since 2000 by rating")
+            pipeline.run("Nolan films after 2000, best first")  # IR cache hit: not logged again
+            log.record("neo4j", QueryIR(intent="FIND", target_collection="Movie", filters=[
+                {"field": "m.title", "operator": "CONTAINS", "value": "dark"}]), "MATCH ...", 40.0)
+            records = list(log.records())
+
+        self.assertEqual(len(records), 2)
+        recs = IndexAdvisor(records).recommend()
+        mongo = next(r for r in recs if r.db_type == "mongodb")
+        # Equality, Sort, Range key order
+        self.assertEqual(mongo.kind, "compound")
+        self.assertEqual(mongo.fields, [("director", 1), ("rating", -1), ("year", 1)])
+        neo4j = next(r for r in recs if r.db_type == "neo4j")
+        self.assertEqual((neo4j.kind, neo4j.fields, neo4j.benefit_ms), ("fulltext", [("title", 0)], 28.0))
+        self.assertIn("CREATE FULLTEXT INDEX movie_title_0_fulltext IF NOT EXISTS", neo4j.statement())
+        # Apply mode skips indexes an existing key pattern already serves
+        self.assertTrue(covered([("director", 1)], [[("director", 1), ("year", 1)]]))
+        self.assertFalse(covered([("year", 1)], [[("director", 1), ("year", 1)]]))
+
+        # ... and never creates collections, labels or properties the data does not have
+        db = mock.MagicMock()
+        db.list_collection_names.return_value = ["movies"]
+        db.__getitem__.return_value.find_one.side_effect = lambda f, p: {"_id": 1} if "director" in f else None
+        db.__getitem__.return_value.index_information.return_value = {}
+        session = mock.MagicMock()
+        session.run.side_effect = lambda q: [{"label": "Movie"}] if "labels" in q else \
+            [{"key": "title"}] if "propertyKeys" in q else mock.MagicMock()
+        driver = mock.MagicMock()
+        driver.session.return_value.__enter__.return_value = session
+        recs = [IndexRecommendation("mongodb", "movies", "single", [("director", 1)]),
+                IndexRecommendation("mongodb", "films", "single", [("director", 1)]),
+                IndexRecommendation("mongodb", "movies", "single", [("budget", 1)]),
+                IndexRecommendation("neo4j", "Film", "property", [("title", 1)]),
+                IndexRecommendation("neo4j", "Movie", "property", [("title", 1)])]
+        with mock.patch("src.optimization.setup_indexes.MongoClient") as client, \
+                mock.patch("src.optimization.setup_indexes.GraphDatabase.driver", return_value=driver):
+            client.return_value.movie_db = db
+            apply_recommendations(recs)
+        db.__getitem__.return_value.create_index.assert_called_once_with([("director", 1)])
+        created = [c.args[0] for c in session.run.call_args_list if c.args[0].startswith("CREATE")]
+        self.assertEqual(created, [recs[4].statement()])
+
+    def test_cypher_literals_become_parameters(self):
+        inception, params = parameterize_cypher("MATCH (m:Movie {title: 'Inception'})<-[:ACTED_IN*1..2]-(p) RETURN p LIMIT 5")
+        heat, _ = parameterize_cypher("MATCH (m:Movie {title: \"Heat\"})<-[:ACTED_IN*1..2]-(p) RETURN p LIMIT 10")
+        self.assertEqual(inception, heat)  # One plan-cache entry for both
+        self.assertEqual(inception, "MATCH (m:Movie {title: $lit0})<-[:ACTED_IN*1..2]-(p) RETURN p LIMIT $lit1")
+        self.assertEqual(params, {"lit0": "Inception", "lit1": 5})
+
+        class FakeSession:
+            calls = []
+            def __init__(self, **config):
+                self.config = config
+            def __enter__(self):
+                return self
+            def __exit__(self, *exc):
+                return False
+            def execute_read(self, work):
+                FakeSession.calls.append(("read", self.config))
+                return work(self)
+            def run(self, text, params):
+                FakeSession.calls.append((text, params))
+                class Result(list):
+                    def consume(self):
+                        return type("Summary", (), {"counters": None})()
+                return Result([{"n": 1}])
+
+        conn = Neo4jConnector(fetch_size=50)
+        conn.connected = True
+        conn.driver = type("Driver", (), {"session": lambda self, **config: FakeSession(**config)})()
+        result = conn.execute("MATCH (m:Movie) WHERE m.year = 1995 RETURN count(m) AS n")
+        self.assertEqual(result.payload, [{"n": 1}])
+        self.assertEqual(FakeSession.calls, [("read", {"fetch_size": 50}),
+                                             ("MATCH (m:Movie) WHERE m.year = $lit0 RETURN count(m) AS n", {"lit0": 1995})])
+
+        # Row cap and metrics
+        conn.max_rows = 0
+        capped = conn.execute("MATCH (m:Movie) RETURN m")
+        self.assertTrue(capped.truncated)
+        self.assertEqual(capped.payload, [])
+        metrics = conn.get_metrics()
+        self.assertEqual((metrics["reads"], metrics["truncated"]), (2, 1))
+        self.assertEqual(metrics["config"]["fetch_size"], 50)
+
+    def test_graph_cache_answers_short_traversals(self):
+        nodes = [("a1", ["Actor"], {"name": "Leonardo DiCaprio"}), ("a2", ["Actor"], {"name": "Tom Hardy"}),
+                 ("m1", ["Movie"], {"title": "Inception", "year": 2010}), ("m2", ["Movie"], {"title": "The Revenant", "year": 2015}),
+                 ("d1", ["Director"], {"name": "Christopher Nolan"})]
+        edges = [("a1", "ACTED_IN", "m1"), ("a1", "ACTED_IN", "m2"), ("a2", "ACTED_IN", "m1"),
+                 ("a2", "ACTED_IN", "m2"), ("d1", "DIRECTED", "m1")]
+        conn = Neo4jConnector(graph_cache=True)
+        conn.graph_cache.loader = lambda: (nodes, edges)
+        conn.graph_cache.refresh()
+        traversal = QueryIR(intent="TRAVERSAL", target_collection="Movie")
+
+        one_hop = conn.answer_locally("MATCH (a:Actor {name: 'Leonardo DiCaprio'})-[:ACTED_IN]->(m:Movie) "
+                                      "RETURN m.title AS title ORDER BY title", traversal)
+        self.assertEqual(one_hop.payload, [{"title": "Inception"}, {"title": "The Revenant"}])
+
+        # Co-stars: the path cannot reuse DiCaprio's own relationship
+        co_stars = conn.answer_locally("MATCH (a:Actor)-[:ACTED_IN]->(m)<-[:ACTED_IN]-(b:Actor) "
+                                       "WHERE a.name = 'Leonardo DiCaprio' RETURN DISTINCT b.name", traversal)
+        self.assertEqual(co_stars.payload, [{"b.name": "Tom Hardy"}])
+
+        director = conn.answer_locally("MATCH (d:Director)-[:DIRECTED]->(m:Movie) WHERE m.title = 'Inception' "
+                                       "RETURN d.name AS director", traversal)
+        self.assertEqual(director.payload, [{"director": "Christopher Nolan"}])
+
+        # Aggregations, 3 hops and non-TRAVERSAL IRs go to the database
+        self.assertIsNone(parse_traversal("MATCH (a:Actor)-[:ACTED_IN]->(m) RETURN count(m)"))
+        self.assertIsNone(conn.answer_locally("MATCH (a:Actor {name: 'x'})-[:ACTED_IN]->(m) RETURN m.title",
+                                              QueryIR(intent="FIND", target_collection="Movie")))
+        conn.graph_cache.invalidate()
+        self.assertIsNone(conn.graph_cache.snapshot)
+
+        # A write landing while a snapshot loads makes that snapshot stale: it is discarded
+        def racing_loader():
+            conn.graph_cache.invalidate()
+            return nodes, edges
+        conn.graph_cache.loader = racing_loader
+        self.assertFalse(conn.graph_cache.refresh())
+        self.assertIsNone(conn.graph_cache.snapshot)
+        conn.graph_cache.loader = lambda: (nodes, edges)
+        self.assertTrue(conn.graph_cache.refresh())
+        self.assertIsNotNone(conn.graph_cache.snapshot)
+
+    def test_redis_command_lists_run_in_one_pipeline(self):
+        client = FakeRedisClient({"movie:1:views": "10", "movie:2:views": "20", "movie:3:views": "5",
+                                  "movie:1:info": {"title": "Inception"}})
+        conn = RedisConnector()
+        conn.client, conn.connected = client, True
+
+        result = conn.execute('["GET movie:1:views", "GET movie:2:views", "HGETALL movie:1:info", "GET movie:3:views"]')
+        self.assertEqual(result.payload, ["10", "20", {"title": "Inception"}, "5"])
+        self.assertEqual(len(client.pipelines), 1)  # One round trip
+        self.assertEqual(client.pipelines[0].commands, [["MGET", "movie:1:views", "movie:2:views"],
+                                                        ["HGETALL", "movie:1:info"], ["GET", "movie:3:views"]])
+        self.assertFalse(client.pipelines[0].transaction)
+
+        conn.execute('{"commands": ["INCR movie:1:views", "INCR movie:2:views"], "transaction": true}', operation_type="write")
+        self.assertTrue(client.pipelines[-1].transaction)
+
+        conn.execute('HGET movie:1 "release date"')
+        self.assertEqual(client.single, [["HGET", "movie:1", "release date"]])
+        # Unbalanced quotes are an error result on both paths
+        for result in (conn.execute('GET "movie:1'), conn.execute_page('SCAN 0 MATCH "movie:*', page_size=10)):
+            self.assertEqual((result.status, result.error_message), ("error", "No closing quotation"))
+
+    def test_redis_keyspace_profiler_histogram(self):
+        store = {f"movie:{i}:views": "0" for i in range(1, 8)}
+        store.update({"movie:1:info": {"title": "Inception"}, "movie:2:info": {"title": "Heat"}, "config": "x"})
+        profiler = KeyspaceProfiler(FakeRedisClient(store, memory_disabled=["config"]), budget_ms=0, samples_per_pattern=2)
+        self.assertFalse(profiler.step())  # Budget exhausted after one SCAN page
+        partial = profiler.summary()
+        self.assertFalse(partial["complete"])
+        self.assertEqual(partial["patterns"]["movie:{id}:views"]["keys"], 4)
+
+        while not profiler.step():
+            pass
+        profile = profiler.summary()
+        self.assertTrue(profile["complete"])
+        views = profile["patterns"]["movie:{id}:views"]
+        self.assertEqual((views["keys"], views["type"], views["avg_bytes"]), (7, "string", 64))
+        self.assertEqual(views["examples"], ["movie:1:views", "movie:2:views"])
+        self.assertEqual(profile["patterns"]["movie:{id}:info"]["type"], "hash")
+        self.assertIsNone(profile["patterns"]["config"]["avg_bytes"])
+        self.assertEqual(list(profile["patterns"])[0], "movie:{id}:views")  # Largest first
+
+        # Lazy refresh: no scanning while the published pass is within its TTL
+        passes = profiler.passes
+        self.assertFalse(profiler.refresh())
+        profiler.published_at -= profiler.ttl
+        self.assertTrue(profiler.refresh())
+        while profiler.refresh():
+            pass
+        self.assertEqual(profiler.passes, passes + 1)
+        # The background thread is opt-in
+        connector = RedisConnector("redis://localhost:6379")
+        connector.client, connector.connected = FakeRedisClient(store), True
+        self.assertTrue(connector.get_metadata().schema_summary["key_patterns"])
+        self.assertIsNone(connector.profiler._thread)
+
+    @unittest.skipUnless(shutil.which("redis-server"), "redis-server not installed")
+    def test_redis_near_cache_invalidated_by_server(self):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        server = subprocess.Popen(["redis-server", "--port", str(port), "--save", "", "--appendonly", "no"],
+                                  stdout=subprocess.DEVNULL)
+        self.addCleanup(server.wait)
+        self.addCleanup(server.terminate)
+        uri = f"redis://127.0.0.1:{port}"
+        writer = RedisConnector(uri, profile=False)
+        for _ in range(50):
+            try:
+                writer.connect()
+                break
+            except Exception:
+                time.sleep(0.1)
+        self.addCleanup(writer.close)
+        connector = RedisConnector(uri, profile=False, near_cache=True, near_cache_size=2)
+        connector.connect()
+        self.addCleanup(connector.close)
+        if not connector.near_cache:
+            self.skipTest("redis-server too old for client tracking")
+
+        writer.execute("SET movie:1:views 10", "write")
+        self.assertEqual(connector.execute("GET movie:1:views").payload, "10")
+        self.assertEqual(connector.execute("GET movie:1:views").payload, "10")
+        self.assertEqual(connector.get_metrics()["near_cache"]["hits"], 1)
+
+        writer.execute("INCR movie:1:views", "write")
+        time.sleep(0.1)
+        self.assertEqual(connector.execute("GET movie:1:views").payload, "11")
+
+        for key in ("movie:2:views", "movie:3:views"):
+            connector.execute(f"GET {key}")
+        self.assertLessEqual(connector.get_metrics()["near_cache"]["entries"], 2)  # LRU bounded
+
+    def test_redis_tracked_keys(self):
+        self.assertEqual(tracked_keys(["GET", "movie:1:views"]), ["movie:1:views"])
+        self.assertEqual(tracked_keys(["MGET", "a", "b"]), ["a", "b"])
+        self.assertEqual(tracked_keys(["HGET", "movie:1", "title"]), ["movie:1"])
+        self.assertEqual(tracked_keys(["ZUNION", "2", "a", "b", "WITHSCORES"]), ["a", "b"])
+        self.assertEqual(tracked_keys(["XREAD", "COUNT", "2", "STREAMS", "s1", "s2", "0", "0"]), ["s1", "s2"])
+
+    def test_redis_near_cache_needs_client_side_caching(self):
+        # redis-py < 5.1 has no redis.cache: connect falls back to a plain client
+        with mock.patch("src.connectors.redis.CacheConfig", None), \
+                mock.patch("redis.Redis.from_url") as from_url:
+            connector = RedisConnector("redis://localhost:6379", profile=False, near_cache=True)
+            connector.connect()
+        self.assertTrue(connector.connected)
+        self.assertFalse(connector.near_cache)
+        from_url.assert_called_once_with("redis://localhost:6379", decode_responses=True)
+        self.assertEqual(connector.get_metrics(), {})
+
+    def test_hbase_pooled_connections_and_multi_row_get(self):
+        pool = FakeHBasePool(store={"movies": {b"1": {b"info:title": b"Inception"}, b"3": {b"info:title": b"Heat"}}})
+        connector = HBaseConnector(pool_size=4)
+        connector.connected, connector.pool = True, pool
+        result = connector.execute(json.dumps({"table": "movies", "operation": "rows",
+                                               "args": {"row_keys": [1, "2", "3"], "columns": ["info:title"]}}))
+        self.assertEqual(result.payload, [{"row_key": "1", "info:title": "Inception"},
+                                          {"row_key": "3", "info:title": "Heat"}])
+        self.assertEqual(pool.table("movies").multi_gets, [([b"1", b"2", b"3"], [b"info:title"])])  # One Thrift call
+        self.assertEqual((pool.borrowed, pool.lent), (1, 0))  # Returned to the pool
+        self.assertEqual(connector.pool_size, 4)
+
+        # close() closes the pool's idle connections (happybase keeps them in a queue)
+        class FakeConnection:
+            closed = False
+
+            def close(self):
+                self.closed = True
+        idle = [FakeConnection(), FakeConnection()]
+        pool._queue = queue.Queue()
+        for connection in idle:
+            pool._queue.put(connection)
+        connector.close()
+        self.assertTrue(all(c.closed for c in idle))
+        self.assertTrue(pool._queue.empty())
+        self.assertIsNone(connector.pool)
+
+    def test_hbase_scan_pushdown_and_projection(self):
+        pool = FakeHBasePool(store={"movies": {
+            b"m1": {b"info:title": b"Alien", b"info:genre": b"Sci-Fi", b"credits:director": b"Scott"},
+            b"m2": {b"info:title": b"Heat", b"info:genre": b"Crime", b"credits:director": b"Mann"}}})
+        table = pool.table("movies")
+        connector = HBaseConnector()
+        connector.connected = True
+        connector.pool = pool
+
+        query = json.dumps({"table": "movies", "operation": "scan", "args": {
+            "row_prefix": "m", "columns": ["info:title", "credits"], "batch_size": 500, "limit": 5,
+            "filter": "SingleColumnValueFilter('info', 'genre', =, 'binary:Sci-Fi')"}})
+        result = connector.execute(query)
+        self.assertEqual(result.status, "success")
+        self.assertEqual(table.scans[0], {"row_start": b"m", "row_stop": b"n", "columns": [b"info:title", b"credits"],
+                                          "filter": b"SingleColumnValueFilter('info', 'genre', =, 'binary:Sci-Fi')",
+                                          "batch_size": 500, "limit": 5})
+        # Only requested columns are decoded
+        self.assertEqual(result.payload[0], {"row_key": "m1", "info:title": "Alien", "credits:director": "Scott"})
+
+        result = connector.execute(json.dumps({"table": "movies", "operation": "get",
+                                               "args": {"row_key": "m1", "columns": ["info:title"]}}))
+        self.assertEqual(table.gets[0], (b"m1", [b"info:title"]))
+        self.assertEqual(result.payload, {"row_key": "m1", "info:title": "Alien"})
+
+        # Paging resumes inside the prefix range
+        page = connector.execute_page(query, page_size=1)
+        self.assertEqual(page.payload, [{"row_key": "m1", "info:title": "Alien", "credits:director": "Scott"}])
+        connector.execute_page(None, page_size=1, continuation=page.continuation)
+        self.assertEqual((table.scans[-1]["row_start"], table.scans[-1]["row_stop"]), (b"m2", b"n"))
+        self.assertIsNone(connector.execute(json.dumps({"table": "movies", "operation": "scan", "args": {
+            "row_prefix": "m", "row_start": "a"}})).payload)
+
+    def test_hbase_secondary_index_maintained_and_used(self):
+        pool = FakeHBasePool(["movies", "movies_by_director"])
+        connector = HBaseConnector()
+        connector.connected, connector.pool = True, pool
+
+        def put(row_key, **data):
+            return connector.execute(json.dumps({"table": "movies", "operation": "put",
+                                                 "args": {"row_key": row_key, "data": data}}), "write")
+        put("1", **{"info:title": "Inception", "credits:director": "Christopher Nolan"})
+        put("2", **{"info:title": "Heat", "credits:director": "Michael Mann"})
+        put("3", **{"info:title": "Memento", "credits:director": "Nolan"})
+        put("3", **{"credits:director": "Christopher Nolan"})  # Stale index entry removed
+        self.assertEqual(sorted(pool.store["movies_by_director"]),
+                         [b"Christopher Nolan\x001", b"Christopher Nolan\x003", b"Michael Mann\x002"])
+
+        scan = lambda column, value, flags=", true, true": json.dumps({"table": "movies", "operation": "scan", "args": {
+            "columns": ["info:title"],
+            "filter": f"SingleColumnValueFilter('{column.split(':')[0]}', '{column.split(':')[1]}', =, 'binary:{value}'{flags})"}})
+        # The index table predates these rows and was never backfilled: scans do not trust it
+        pool.store["movies_by_director"].pop(b"Michael Mann\x002")
+        connector.execute(scan("credits:director", "Michael Mann"))
+        self.assertIn("filter", pool.table("movies").scans.pop())
+        ensure_index_tables(pool, DEFAULT_INDEXES[:1])
+        self.assertEqual(sorted(pool.store["movies_by_director"]),
+                         [b"Christopher Nolan\x001", b"Christopher Nolan\x003", b"Michael Mann\x002", BUILT_MARKER])
+        pool.table("movies").scans.clear()
+
+        result = connector.execute(scan("credits:director", "Christopher Nolan"))
+        self.assertEqual(result.payload, [{"row_key": "1", "info:title": "Inception"},
+                                          {"row_key": "3", "info:title": "Memento"}])
+        self.assertEqual(len(pool.table("movies").multi_gets), 1)
+        self.assertEqual(pool.table("movies").scans, [])  # No primary table scan
+
+        # No index table for info:title: falls back to the server-side filter scan
+        connector.execute(scan("info:title", "Heat"))
+        self.assertIn("filter", pool.table("movies").scans[0])
+        # Without filterIfMissing HBase also returns rows lacking the column: the index cannot answer that
+        for flags in ("", ", false, true", ", true, false"):
+            connector.execute(scan("credits:director", "Nolan", flags))
+        self.assertEqual(len(pool.table("movies").scans), 4)
+
+    def test_rdf_store_bulk_loaded_from_streamed_records(self):
+        movies = [{"id": 1, "title": "Inception", "year": 2010, "genre": "Sci-Fi", "director": "Christopher Nolan",
+                   "actors": ["Leonardo DiCaprio"], "rating": 8.8},
+                  {"id": 2, "title": "Memento", "year": 2000, "genre": "Thriller", "director": "Christopher Nolan",
+                   "actors": ["Guy Pearce"], "rating": 8.4}]
+        with tempfile.TemporaryDirectory() as tmp:
+            array_path, lines_path = os.path.join(tmp, "movies.json"), os.path.join(tmp, "movies.jsonl")
+            with open(array_path, "w") as f:
+                json.dump(movies, f, indent=2)
+            with open(lines_path, "w") as f:
+                f.write("\n".join(json.dumps(m) for m in movies) + "\n")
+            self.assertEqual(list(iter_records(array_path, chunk_size=16)), movies)
+            self.assertEqual(list(iter_records(lines_path)), movies)
+            self.assertEqual(len(movie_triples(movies[0])), 13)
+
+            store = os.path.join(tmp, "store", "movies.nt")
+            load_rdf(lines_path, store, batch_size=5)
+            conn = RdfConnector(store)
+            res = conn.execute("""
+                PREFIX ex: <http://example.org/movies/>
+                SELECT ?title WHERE { ?m ex:director ?d . ?d ex:name "Christopher Nolan" . ?m ex:title ?title .
+                                      ?m ex:year ?y FILTER(?y > 2005) }""")
+            self.assertEqual(res.payload, [{"title": "Inception"}])
+            self.assertEqual(conn.get_metadata().version, "rdflib-file")
+            graph = conn.graph
+            conn.close()
+            # The snapshot is parsed once per process and file version
+            again = RdfConnector(store)
+            again.connect()
+            self.assertIs(again.graph, graph)
+            self.assertEqual(again.summary.triples, len(again.graph))
+            load_rdf(lines_path, store, batch_size=5)
+            os.utime(store, (0, 0))  # A reload within the mtime resolution still changes the stamp
+            self.assertIsNot(open_graph(store), again.graph)
+            with self.assertRaises(FileNotFoundError):
+                RdfConnector(os.path.join(tmp, "missing.nt")).connect()
+
+            # berkeleydb is optional: without it BerkeleyDB stores fail up front, pointing at the snapshot fallback
+            with mock.patch.dict("sys.modules", {"berkeleydb": None}):
+                with self.assertRaisesRegex(ImportError, "pip install berkeleydb.*RDF_STORE=data/movies.nt"):
+                    RdfConnector("berkeleydb://" + os.path.join(tmp, "bdb")).connect()
+                with self.assertRaises(ImportError):
+                    RdfSink("berkeleydb://" + os.path.join(tmp, "bdb"))
+            self.assertFalse(os.path.exists(os.path.join(tmp, "bdb")))
+
+    def test_rdf_prepared_queries_and_incremental_summary(self):
+        conn = RdfConnector("memory")
+        conn.connect()
+        ex = "http://example.org/movies/"
+        self.assertEqual(conn.get_metadata().schema_summary["type_counts"], {ex + "Movie": 1, ex + "Director": 1})
+
+        query = "PREFIX ex: <%s> SELECT ?m WHERE { ?m ex:title %s }"
+        self.assertEqual(len(conn.execute(query % (ex, '"Inception"')).payload), 1)
+        self.assertEqual(conn.execute(query % (ex, "'Heat'")).payload, [])
+        self.assertEqual(conn.get_metrics()["prepared_hits"], 1)  # Same template, other literal
+        self.assertEqual(parameterize_sparql("SELECT * WHERE { ?s ?p 'x' }")[1], {})  # Bindings would leak into *
+
+        # Summary follows adds and removes, duplicates counted once
+        movie = rdflib.URIRef(ex + "Heat")
+        for _ in range(2):
+            conn.graph.add((movie, rdflib.RDF.type, rdflib.URIRef(ex + "Movie")))
+        self.assertEqual(conn.get_metadata().schema_summary["type_counts"][ex + "Movie"], 2)
+        conn.graph.remove((None, rdflib.RDF.type, rdflib.URIRef(ex + "Director")))
+        meta = conn.get_metadata().schema_summary
+        self.assertNotIn(ex + "Director", meta["types"])
+        self.assertEqual(meta["predicates"][0], str(rdflib.RDF.type))
+
+    def test_rdf_queries_offloaded_to_process_pool(self):
+        query = "PREFIX ex: <http://example.org/movies/> SELECT ?m ?t WHERE { ?m ex:title ?t } ORDER BY ?t"
+        local = RdfConnector("memory")
+        pooled = RdfConnector("memory", processes=2)
+        self.addCleanup(pooled.close)
+        pooled.connect()
+        pooled.graph.add((rdflib.URIRef("http://example.org/movies/Heat"),
+                          rdflib.URIRef("http://example.org/movies/title"), rdflib.Literal("Heat")))
+        result = pooled.execute(query)
+        # Forked workers see the parent's graph as loaded when the pool started
+        self.assertEqual(result.payload, [{"m": "http://example.org/movies/Heat", "t": "Heat"}]
+                         + local.execute(query).payload)
+        page = pooled.execute_page(query, page_size=1)
+        self.assertEqual((len(page.payload), page.truncated), (1, True))
+        self.assertEqual(pooled.execute("SELECT ?s WHERE { ?s ?p }").status, "error")
+
+    def test_ingest_fans_out_batches_and_isolates_failing_store(self):
+        class ListSink(Sink):
+            def __init__(self, name, fail_on=None):
+                super().__init__()
+                self.name, self.fail_on, self.batches, self.closed = name, fail_on, [], False
+
+            def write(self, batch):
+                if len(self.batches) == self.fail_on:
+                    raise RuntimeError("store down")
+                self.batches.append([r["id"] for r in batch])
+
+            def close(self):
+                self.closed = True
+
+        with self.assertRaises(TypeError):
+            Sink()  # write() is abstract
+        good, bad = ListSink("good"), ListSink("bad", fail_on=1)
+        stats = ingest(({"id": i} for i in range(25)), [good, bad], batch_size=10, queue_size=1,
+                       progress_interval=0)
+        self.assertEqual(good.batches, [list(range(10)), list(range(10, 20)), list(range(20, 25))])
+        self.assertEqual((bad.written, bad.closed, good.closed), (10, True, True))
+        self.assertEqual(stats["read"], 25)
+        self.assertEqual(stats["stores"]["good"]["written"], 25)
+        self.assertIsNone(stats["stores"]["good"]["error"])
+        self.assertEqual(stats["stores"]["bad"]["error"], "store down")
+
+        def broken_source():
+            yield {"id": 1}
+            raise ValueError("truncated file")
+
+        sink = ListSink("partial")
+        with self.assertRaises(ValueError):
+            ingest(broken_source(), [sink], batch_size=1, progress_interval=0)
+        self.assertIsInstance(sink.failed, ValueError)
+        self.assertTrue(sink.closed)
+
+        # A load that does not rebuild the views drops them, so they never describe the previous catalog
+        client = FakeRedisClient({"mv:movies:genre:ready": "1", "mv:movies:genre:count": {"Drama": 3}})
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch("src.optimization.views.connect_views",
+                           return_value=MaterializedViews(client, [AggregateView("genre")])), \
+                mock.patch("src.ingest.pipeline.build_sinks", return_value=[ListSink("mongodb")]):
+            source = os.path.join(tmp, "movies.jsonl")
+            with open(source, "w") as f:
+                f.write('{"id": 1}\n')
+            ingest_main([source, "--stores", "mongodb", "--progress", "0"])
+        self.assertEqual(client.store, {})
+
+    def test_synthetic_catalog_is_seeded_skewed_and_answers_its_workload(self):
+        catalog = SyntheticCatalog(3000, seed=7)
+        movies = list(catalog)
+        self.assertEqual(movies[:20], list(SyntheticCatalog(3000, seed=7))[:20])
+        self.assertNotEqual(movies[:20], list(SyntheticCatalog(3000, seed=8))[:20])
+        self.assertEqual(set(movies[0]), {"id", "title", "year", "genre", "director", "actors", "rating"})
+        self.assertEqual(len({m["title"] for m in movies}), 3000)
+
+        appearances = {}
+        for m in movies:
+            for actor in m["actors"]:
+                appearances[actor] = appearances.get(actor, 0) + 1
+        counts = sorted(appearances.values(), reverse=True)
+        self.assertGreater(counts[0], 20 * counts[len(counts) // 2])  # Zipfian head
+
+        by_title = {m["title"]: m for m in movies}
+        workload = catalog.workload(60)
+        self.assertEqual(len(workload), 60)
+        for q in workload:
+            nlq, expected = q["nlq"], q["expected"]
+            if nlq.startswith("Who directed "):
+                self.assertEqual(by_title[nlq[len("Who directed "):-1]]["director"], expected)
+            elif nlq.startswith("Who acted in "):
+                self.assertEqual(sorted(by_title[nlq[len("Who acted in "):-1]]["actors"]), expected)
+            elif nlq.startswith("How many movies did "):
+                director = nlq[len("How many movies did "):-len(" direct?")]
+                self.assertEqual(sum(m["director"] == director for m in movies), expected)
+            elif nlq.startswith("What is the average rating of "):
+                genre = nlq[len("What is the average rating of "):-len(" movies?")]
+                ratings = [m["rating"] for m in movies if m["genre"] == genre]
+                self.assertAlmostEqual(sum(ratings) / len(ratings), expected, delta=0.006)
+        with self.assertRaises(ValueError):
+            SyntheticCatalog(10).workload()
+
+    def test_materialized_views_answer_aggregates_until_a_write(self):
+        movies = [
+            {"id": 1, "title": "Inception", "genre": "Sci-Fi", "director": "Christopher Nolan",
+             "actors": ["Leonardo DiCaprio"], "rating": 8.8},
+            {"id": 2, "title": "Interstellar", "genre": "Sci-Fi", "director": "Christopher Nolan",
+             "actors": ["Matthew McConaughey"], "rating": 8.6},
+            {"id": 3, "title": "Heat", "genre": "Crime", "director": "Michael Mann",
+             "actors": ["Al Pacino", "Robert De Niro"], "rating": 8.3},
+        ]
+        views = MaterializedViews(FakeRedisClient(), [AggregateView("genre"), AggregateView("director"),
+                                                 AggregateView("actors")])
+        views.reset()
+        views.apply(movies)
+        per_genre = {"intent": "AGGREGATE", "target_collection": "movies", "sort_field": "count", "sort_order": "DESC",
+                     "is_safe": True,
+                     "aggregations": [{"type": "count", "group_by": "genre"},
+                                      {"type": "avg", "field": "rating", "group_by": "genre"}]}
+        self.assertIsNone(views.answer(parse_ir(per_genre)))  # Not published until the load completes
+        views.mark_ready()
+
+        connector = FakeConnector(payload=[{"_id": "Sci-Fi", "count": 2}])
+        pipeline = SmartPipeline(connector, FakeLLM(llm_response(per_genre)), FakeRAG(), views=views)
+        result = pipeline.run("How many movies are there per genre?")
+        self.assertEqual(result["final_result"], [{"genre": "Sci-Fi", "count": 2, "avg_rating": 8.7},
+                                                  {"genre": "Crime", "count": 1, "avg_rating": 8.3}])
+        self.assertEqual(result["steps"][-1]["materialized_view"], "materialized view movies_by_genre")
+        self.assertEqual(connector.executed, [])
+
+        count = {"intent": "AGGREGATE", "target_collection": "Movie", "aggregations": [{"type": "count"}]}
+        nolan = parse_ir(dict(count, filters=[{"field": "m.director", "operator": "CONTAINS", "value": "nolan"}]))
+        self.assertEqual(views.answer(nolan).payload, [{"count": 2}])
+        total = parse_ir({"intent": "AGGREGATE", "target_collection": "movies",
+                          "aggregations": [{"type": "count"}, {"type": "sum", "field": "rating"}]})
+        self.assertEqual(views.answer(total).payload, [{"count": 3, "sum_rating": 25.7}])
+        # List fields (actors) are grouped per element: only the store answers grouped or filtered questions
+        self.assertIsNone(views.answer(parse_ir(dict(count, filters=[
+            {"field": "actors", "operator": "in", "value": ["Al Pacino", "Robert De Niro"]}]))))
+        self.assertIsNone(views.answer(parse_ir(dict(count, filters=[
+            {"field": "actors", "operator": "eq", "value": "Al Pacino"}]))))
+        self.assertIsNone(views.answer(parse_ir(dict(count, aggregations=[{"type": "count", "group_by": "actors"}]))))
+        self.assertEqual(views.match(parse_ir(dict(count, aggregations=[{"type": "count", "group_by": "actors"}]))).name,
+                         "movies_by_actors")
+        self.assertIsNone(views.match(parse_ir(dict(count, aggregations=[{"type": "avg", "field": "year"}]))))
+
+        views.apply(movies[2:], sign=-1)
+        self.assertEqual(views.answer(parse_ir(per_genre)).payload, [{"genre": "Sci-Fi", "count": 2, "avg_rating": 8.7}])
+
+        # A write through the pipeline invalidates the views over its target
+        write = {"intent": "MUTATION", "target_collection": "movies", "is_safe": False}
+        writer = SmartPipeline(FakeConnector(), FakeLLM(llm_response(write)), FakeRAG(), views=views)
+        writer.set_safety(True)
+        writer.run("Delete Heat")
+        pipeline = SmartPipeline(connector, FakeLLM(llm_response(per_genre)), FakeRAG(), views=views)
+        self.assertEqual(pipeline.run("Movies per genre")["final_result"], [{"_id": "Sci-Fi", "count": 2}])
+        self.assertEqual(len(connector.executed), 1)
+
+        logged = [{"intent": "AGGREGATE", "target": "movies", "filters": [],
+                   "aggregations": [{"type": "avg", "field": "year", "group_by": "director"}]}] * 3
+        logged += [{"intent": "AGGREGATE", "target": "Movie", "aggregations": [{"type": "count"}],
+                    "filters": [{"field": "m.genre", "operator": "eq"}]}] * 2
+        self.assertEqual(detect_views(logged), [AggregateView("director", ("rating", "year"))])
+
 if __name__ == '__main__':
     unittest.main()